@@ -1,58 +1,67 @@
-from typing import Dict, Any, Union
-from src.core.graph_builder.main_graph import MainGraphBuilder
-from src.tools.knowledge_tools import arxiv, wikipedia
-from src.tools.vqa_tool import vqa_tool
-from datasets import load_dataset
+import os
+from typing import Optional, Union
+from src.core.pipeline import VQAPipeline
+from src.utils.logging_utils import get_logger
 from PIL import Image
-from src.evaluation.evaluator.accuracy import evaluate_accuracy
-
-def setup_tools_registry() -> Dict[str, Any]:
-    return {
-        "vqa_tool": vqa_tool,
-        "arxiv": arxiv,
-        "wikipedia": wikipedia, 
-    }
-
-# 1) Tải về và sample 100 item
-dataset = load_dataset(
-    "Erland/VQAv2-sample",
-    split="test",
-    cache_dir="./DATA"
-)
-sampled = dataset.shuffle(seed=42).select(range(2))
-sampled = sampled.select([1])
+from src.evaluation.dataset import dataset_size, reservoir_sample, shard_sample, stream_vqa_samples
+from src.evaluation.runner import EvaluationRunner
 
-def run_visual_qa(question: str, image: Union[str, Image.Image]):
-    tools_registry = setup_tools_registry()
-    builder = MainGraphBuilder(tools_registry)
-    graph = builder.create_main_workflow()
+RESULTS_PATH = "./results/predictions.jsonl"
+MAX_CONCURRENCY = 4
+# Evaluation samples are streamed (never loading the whole split) and drawn by a
+# seeded hash of their position: keep a SAMPLE_RATE fraction, stop after MAX_SAMPLES.
+# Without SAMPLE_RATE the rate is MAX_SAMPLES / split size, so the samples are spread
+# over the whole split instead of being its first rows
+DATASET = "Erland/VQAv2-sample"
+DATASET_SPLIT = "test"
+MAX_SAMPLES = int(os.getenv("MA_KNOWLEDGE_EVAL_SAMPLES", 100))
+SAMPLE_RATE = os.getenv("MA_KNOWLEDGE_EVAL_SAMPLE_RATE")
+SAMPLE_SEED = 42
+# Threads decoding images ahead of the analysts
+PREFETCH_WORKERS = 4
+# Pipeline options come from MA_KNOWLEDGE_* environment variables (see VQAPipeline.from_env):
+# TRACE_PATH, VOTING_MODE, ROUTING, GATE_MIN_SCORE / GATE_MIN_MARGIN, CHECKPOINT_DB
 
-    initial_state = {"question": question, "image": image}
+logger = get_logger("main")
 
-    print(f"Q: {question}")
-    print(f"Image: {image}")
-    print("-" * 50)
+_pipeline: Optional[VQAPipeline] = None
 
-    result = graph.invoke(initial_state)
-    
-    return result["final_answer"]
+def get_pipeline() -> VQAPipeline:
+    """Return the shared pipeline, compiling the graph on first use"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = VQAPipeline.from_env()
+    return _pipeline
 
-def main():
-    predictions = []
-    references = []
+def run_visual_qa(question: str, image: Union[str, Image.Image]):
+    logger.info("question=%r image=%s", question, image)
 
-    for sample in sampled:
-        q = sample["question"]
-        img = sample["image"]
-        gold = sample["multiple_choice_answer"]
+    return get_pipeline().answer(question, image)
 
-        pred = run_visual_qa(question=q, image=img)
+def iter_samples():
+    # Reads the copy in ./DATA when there is one, otherwise streams from the Hub
+    def samples():
+        return stream_vqa_samples(DATASET, split=DATASET_SPLIT, cache_dir="./DATA")
 
-        predictions.append(pred)
-        references.append(gold)
+    if SAMPLE_RATE is not None:
+        return shard_sample(samples(), rate=float(SAMPLE_RATE), seed=SAMPLE_SEED, limit=MAX_SAMPLES)
+
+    size = dataset_size(DATASET, split=DATASET_SPLIT, cache_dir="./DATA")
+    if size is None:
+        # Unknown split size: exactly MAX_SAMPLES uniform samples, but only after
+        # a first pass over the whole split
+        return reservoir_sample(samples, MAX_SAMPLES, seed=SAMPLE_SEED)
+    rate = min(1.0, MAX_SAMPLES / size) if size else 1.0
+    return shard_sample(samples(), rate=rate, seed=SAMPLE_SEED, limit=MAX_SAMPLES)
+
+def main():
+    runner = EvaluationRunner(get_pipeline(), RESULTS_PATH, max_concurrency=MAX_CONCURRENCY,
+                              prefetch_workers=PREFETCH_WORKERS)
+    report = runner.run(iter_samples())
 
-    accuracy = evaluate_accuracy(predictions, references)
-    print(f"Accuracy: {accuracy}")
+    print(f"Accuracy: {report['accuracy']:.4f} ({report['num_evaluated']} samples, {report['num_failed']} failed)")
+    print(f"Throughput: {report['throughput_qps']:.2f} questions/s")
+    print(f"Latency p50: {report['latency_p50_s']:.2f}s | p95: {report['latency_p95_s']:.2f}s")
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,6 @@
 from typing import List
 from pydantic import BaseModel, Field
+from src.utils.prompt_utils import CompiledPrompt, compile_prompt
 
 
 class Analyst(BaseModel):
@@ -17,4 +18,13 @@ class Analyst(BaseModel):
     @property
     def persona(self) -> str:
         return f"Name: {self.affiliation}\nTools: {self.tools}\nDescription: {self.description}"
-    
\ No newline at end of file
+
+    @property
+    def system_template(self) -> CompiledPrompt:
+        """Planner prompt, compiled once per distinct prompt text"""
+        return compile_prompt(self.system_prompt)
+
+    @property
+    def final_template(self) -> CompiledPrompt:
+        """Final reasoning prompt, compiled once per distinct prompt text"""
+        return compile_prompt(self.final_system_prompt)
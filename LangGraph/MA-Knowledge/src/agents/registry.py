@@ -0,0 +1,24 @@
+from functools import lru_cache
+from typing import Callable, Dict
+
+from src.agents.base_agent import Analyst
+from src.agents.strategies.junior_agent import JuniorAgent
+from src.agents.strategies.senior_agent import SeniorAgent
+from src.agents.strategies.manager_agent import ManagerAgent
+
+# Analyst name (as stored in graph state) -> factory
+ANALYST_FACTORIES: Dict[str, Callable[[], Analyst]] = {
+    "Junior": JuniorAgent,
+    "Senior": SeniorAgent,
+    "Manager": ManagerAgent,
+}
+
+
+@lru_cache(maxsize=None)
+def get_analyst(name: str) -> Analyst:
+    """Shared analyst instance for a name; graph state only carries the name"""
+    try:
+        factory = ANALYST_FACTORIES[name]
+    except KeyError:
+        raise KeyError(f"Unknown analyst {name!r}, expected one of {list(ANALYST_FACTORIES)}") from None
+    return factory()
@@ -0,0 +1,195 @@
+import asyncio
+import base64
+import json
+import os
+import time
+from io import BytesIO
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from PIL import Image
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool
+
+from src.core.pipeline import VQAPipeline
+from src.utils.image_processing import (
+    ImageFetchTimeout,
+    ImageHandle,
+    fetch_image_bytes,
+    image_registry,
+)
+from src.utils.logging_utils import get_logger
+from src.utils.request_queue import QueueFullError, RequestQueue
+
+logger = get_logger("api")
+
+# Questions executed concurrently / admitted questions allowed to wait; beyond that -> 429
+MAX_IN_FLIGHT = int(os.getenv("MA_KNOWLEDGE_API_MAX_IN_FLIGHT", 4))
+MAX_WAITING = int(os.getenv("MA_KNOWLEDGE_API_MAX_WAITING", 32))
+MAX_BATCH_SIZE = int(os.getenv("MA_KNOWLEDGE_API_MAX_BATCH_SIZE", 16))
+# Image URLs are fetched server-side (public hosts only, with timeouts and a size cap); 0 disables them
+ALLOW_IMAGE_URLS = os.getenv("MA_KNOWLEDGE_API_ALLOW_IMAGE_URLS", "1") == "1"
+RETRY_AFTER_S = 1
+
+
+class InputVQA(BaseModel):
+    question: str
+    image: str = Field(description="Base64 image (optionally as a data: URL) or an http(s) URL.")
+
+
+class OutputVQA(BaseModel):
+    question: str
+    answer: str
+    latency_s: float
+
+
+class BatchInputVQA(BaseModel):
+    items: List[InputVQA] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BatchItemVQA(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchOutputVQA(BaseModel):
+    results: List[BatchItemVQA]
+    latency_s: float
+
+
+# --------- Pipeline ---------
+# One compiled graph shared by every request (options from MA_KNOWLEDGE_* env vars)
+pipeline = VQAPipeline.from_env()
+request_queue = RequestQueue(MAX_IN_FLIGHT, MAX_WAITING)
+
+# --------- App - FastAPI ---------
+app = FastAPI(
+    title="MA-Knowledge VQA Server",
+    version="1.0",
+    description="Multi-agent visual question answering over a single compiled LangGraph",
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["*"],
+)
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    logger.warning("rejected path=%s reason=%s", request.url.path, exc)
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": str(RETRY_AFTER_S)})
+
+
+def _decode_image(source: str) -> ImageHandle:
+    # Clients may send URLs or image bytes, never server-side file paths
+    if source.startswith(("http://", "https://")):
+        if not ALLOW_IMAGE_URLS:
+            raise ValueError("image URLs are disabled on this server, send base64 instead")
+        data = fetch_image_bytes(source, allow_private=False)
+    else:
+        data = base64.b64decode(source.split(",", 1)[-1] if source.startswith("data:") else source,
+                                validate=True)
+    return image_registry.register(Image.open(BytesIO(data)))
+
+
+async def _load_image(source: str) -> ImageHandle:
+    """Decode (or download) off the event loop; 504 when a URL times out, 400 on anything else"""
+    try:
+        return await asyncio.to_thread(_decode_image, source)
+    except ImageFetchTimeout as e:
+        raise HTTPException(status_code=504, detail=f"Image download timed out: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+
+
+async def _answer(item: InputVQA) -> str:
+    image = await _load_image(item.image)
+    async with request_queue.slot():
+        return await pipeline.aanswer(item.question, image)
+
+
+# --------- Routes - FastAPI ---------
+@app.get("/check")
+async def check():
+    return {"status": "ok", "queue": request_queue.stats()}
+
+
+@app.post("/answer", response_model=OutputVQA)
+async def answer(inputs: InputVQA):
+    start = time.perf_counter()
+    request_queue.admit()
+    try:
+        answer_text = await _answer(inputs)
+    finally:
+        request_queue.release()
+    return {"question": inputs.question, "answer": answer_text, "latency_s": time.perf_counter() - start}
+
+
+@app.post("/answer/batch", response_model=BatchOutputVQA)
+async def answer_batch(inputs: BatchInputVQA):
+    """Answer many (image, question) pairs; failures are reported per item"""
+    start = time.perf_counter()
+    size = len(inputs.items)
+    if size > request_queue.capacity:
+        raise HTTPException(status_code=413, detail=f"Batch of {size} exceeds queue capacity {request_queue.capacity}")
+    request_queue.admit(size)
+    try:
+        outcomes = await asyncio.gather(*(_answer(item) for item in inputs.items), return_exceptions=True)
+    finally:
+        request_queue.release(size)
+
+    results = []
+    for item, outcome in zip(inputs.items, outcomes):
+        if isinstance(outcome, BaseException):
+            error = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            logger.warning("batch_item_failed question=%r error=%s", item.question, error)
+            results.append({"question": item.question, "error": error})
+        else:
+            results.append({"question": item.question, "answer": outcome})
+    return {"results": results, "latency_s": time.perf_counter() - start}
+
+
+@app.post("/answer/stream")
+async def answer_stream(inputs: InputVQA):
+    """
+    NDJSON stream: one ``{"event": "analyst", ...}`` line per finished analyst,
+    then ``{"event": "final", "answer", "voting_details"}``.
+    """
+    request_queue.admit()
+    try:
+        image = await _load_image(inputs.image)
+    except HTTPException:
+        request_queue.release()
+        raise
+
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            request_queue.release()
+
+    async def events():
+        try:
+            async with request_queue.slot():
+                async for event in iterate_in_threadpool(pipeline.stream(inputs.question, image)):
+                    yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        except Exception as e:
+            logger.warning("stream_failed question=%r error=%s", inputs.question, e)
+            yield json.dumps({"event": "error", "error": str(e)}) + "\n"
+        finally:
+            release()
+
+    # The background task also covers clients that disconnect before the body starts
+    return StreamingResponse(events(), media_type="application/x-ndjson", background=BackgroundTask(release))
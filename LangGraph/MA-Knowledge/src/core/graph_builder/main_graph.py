@@ -1,17 +1,57 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END, START
 
 from src.core.nodes.caption_node import caption_node
-from src.core.state import ViReAgentState
+from src.core.state import ViReAgentState, AnalystInputState
 from src.core.graph_builder.sub_graph import SubGraphBuilder
 from src.core.nodes.voting_node import voting_node
+from src.core.nodes.streaming_voting_node import StreamingVotingNode
+from src.core.nodes.confidence_gate_node import ConfidenceGate
+from src.core.router import AdaptiveRouter, ANALYST_NODES
+
+VOTING_MODES = ("full", "streaming")
+ROUTING_MODES = ("all", "adaptive")
 
 class MainGraphBuilder:
-    """Builder for the main multi-agent workflow"""
+    """
+    Builder for the main multi-agent workflow
+
+    voting_mode="full" fans out to the three analyst subgraphs and votes once
+    all have finished; "streaming" runs them inside the voting node and stops
+    as soon as the weighted vote is decided (see StreamingVotingNode).
+
+    routing="all" sends every question to all analysts; "adaptive" adds a
+    question classifier after caption and lets AdaptiveRouter run Junior
+    alone on perceptual questions, escalating when it is not confident.
+    In streaming mode the voting node starts the routed analysts itself and
+    escalates the same way.
+
+    With a confidence_gate, VQA runs once after caption and questions whose
+    top candidate clears the gate are answered without any analyst.
+
+    With a checkpointer (see SessionMemory) the graph is checkpointed after
+    every step, keyed by the thread_id in the run config.
+    """
+
+    # Analysts read only references from the main state, never the image
+    analyst_input_state = AnalystInputState
     
-    def __init__(self, tools_registry: Dict[str, Any]):
+    def __init__(self, tools_registry: Dict[str, Any], voting_mode: str = "full",
+                 routing: str = "all", router: Optional[AdaptiveRouter] = None,
+                 confidence_gate: Optional[ConfidenceGate] = None,
+                 checkpointer: Optional[BaseCheckpointSaver] = None):
+        if voting_mode not in VOTING_MODES:
+            raise ValueError(f"voting_mode must be one of {VOTING_MODES}, got {voting_mode!r}")
+        if routing not in ROUTING_MODES:
+            raise ValueError(f"routing must be one of {ROUTING_MODES}, got {routing!r}")
         self.tools_registry = tools_registry
-        self.subgraph_builder = SubGraphBuilder(tools_registry)
+        self.voting_mode = voting_mode
+        self.routing = routing
+        self.router = router or AdaptiveRouter()
+        self.confidence_gate = confidence_gate
+        self.checkpointer = checkpointer
+        self.subgraph_builder = SubGraphBuilder(tools_registry, confidence_gate=confidence_gate)
         
     def create_main_workflow(self):
         """Create the main multi-agent workflow"""
@@ -19,28 +59,67 @@ class MainGraphBuilder:
         
         main_workflow = StateGraph(ViReAgentState)
 
+        def caption(state):
+            return caption_node(state, self.tools_registry)
+
         junior_node = self.subgraph_builder.create_junior_subgraph()
         senior_node = self.subgraph_builder.create_senior_subgraph()
         manager_node = self.subgraph_builder.create_manager_subgraph()
+
+        main_workflow.add_node("caption", caption)
+        main_workflow.add_edge(START, "caption")
     
+        if self.voting_mode == "streaming":
+            adaptive = self.routing == "adaptive"
+            main_workflow.add_node("voting", StreamingVotingNode({
+                "junior_analyst": junior_node,
+                "senior_analyst": senior_node,
+                "manager_analyst": manager_node,
+            }, router=self.router if adaptive else None))
+            if adaptive:
+                main_workflow.add_node("classify", self.router.classify_node)
+                self._add_entry(main_workflow, ["classify"])
+                main_workflow.add_edge("classify", "voting")
+            else:
+                self._add_entry(main_workflow, ["voting"])
+            main_workflow.add_edge("voting", END)
+            return main_workflow.compile(checkpointer=self.checkpointer)
+
         # Add nodes
-        main_workflow.add_node("caption", caption_node)
-        main_workflow.add_node("junior_analyst", junior_node)
-        main_workflow.add_node("senior_analyst", senior_node)
-        main_workflow.add_node("manager_analyst", manager_node)
+        main_workflow.add_node("junior_analyst", junior_node, input=self.analyst_input_state)
+        main_workflow.add_node("senior_analyst", senior_node, input=self.analyst_input_state)
+        main_workflow.add_node("manager_analyst", manager_node, input=self.analyst_input_state)
         main_workflow.add_node("voting", voting_node)
 
-        main_workflow.add_edge(START, "caption")
-        main_workflow.add_edge("caption", "junior_analyst")
-        main_workflow.add_edge("caption", "senior_analyst")
-        main_workflow.add_edge("caption", "manager_analyst")
+        if self.routing == "adaptive":
+            main_workflow.add_node("classify", self.router.classify_node)
+            main_workflow.add_node("escalate", self.router.escalate_node)
+            self._add_entry(main_workflow, ["classify"])
+            main_workflow.add_conditional_edges("classify", self.router.route_to_analysts, list(ANALYST_NODES))
+            main_workflow.add_conditional_edges("junior_analyst", self.router.route_after_junior, ["voting", "escalate"])
+            main_workflow.add_conditional_edges("escalate", self.router.route_to_analysts, ["senior_analyst", "manager_analyst"])
+        else:
+            self._add_entry(main_workflow, list(ANALYST_NODES))
+            main_workflow.add_edge("junior_analyst", "voting")
 
-        main_workflow.add_edge("junior_analyst", "voting")
         main_workflow.add_edge("senior_analyst", "voting")
         main_workflow.add_edge("manager_analyst", "voting")
 
         main_workflow.add_edge("voting", END)
         
-        return main_workflow.compile()
+        return main_workflow.compile(checkpointer=self.checkpointer)
+
+    def _add_entry(self, workflow: StateGraph, targets: List[str]) -> None:
+        """Connect caption to the first analyst-side nodes, through the confidence gate if any"""
+        if self.confidence_gate is None:
+            for target in targets:
+                workflow.add_edge("caption", target)
+            return
+
+        workflow.add_node("confidence_gate", self.confidence_gate)
+        workflow.add_edge("caption", "confidence_gate")
 
+        def after_gate(state):
+            return self.confidence_gate.route(state) or targets
 
+        workflow.add_conditional_edges("confidence_gate", after_gate, targets + [END])
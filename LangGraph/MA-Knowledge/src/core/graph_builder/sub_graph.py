@@ -1,72 +1,86 @@
-from typing import Dict, Any, Type
+from typing import Dict, Any, Optional, Type
 from langgraph.graph import StateGraph, END, START
 
 from src.core.nodes.subgraph_node import tool_node, call_agent_node, final_reasoning_node, should_continue
+from src.core.nodes.confidence_gate_node import ConfidenceGate, gated_answer_node
 from src.core.state import (    
     ViReJuniorState, 
     ViReSeniorState, 
     ViReManagerState,
     SubgraphOutputState
 )
-from src.agents.strategies.junior_agent import JuniorAgent
-from src.agents.strategies.senior_agent import SeniorAgent
-from src.agents.strategies.manager_agent import ManagerAgent
 
 class SubGraphBuilder:
     """Builder for individual agent subgraphs"""
+
+    # What a finished subgraph returns to the main graph
+    output_state = SubgraphOutputState
     
-    def __init__(self, tools_registry: Dict[str, Any]):
+    def __init__(self, tools_registry: Dict[str, Any], confidence_gate: Optional[ConfidenceGate] = None):
         self.tools_registry = tools_registry
+        self.confidence_gate = confidence_gate
     
-    def create_agent_subgraph(self, state_class: Type, analyst_instance) -> StateGraph:
-        """Create a subgraph for a specific agent type with analyst instance"""
-        workflow = StateGraph(state_class, output=SubgraphOutputState)
+    def create_agent_subgraph(self, state_class: Type, analyst_name: str) -> StateGraph:
+        """Create a subgraph for the analyst registered under analyst_name (see get_analyst)"""
+        workflow = StateGraph(state_class, output=self.output_state)
         
         def agent_node(state, config):
-            state["analyst"] = analyst_instance # Auto inject analyst instance into state in first time
-            return call_agent_node(state, config, self.tools_registry)
+            return self.agent_step(state, config, analyst_name)
+        
+        def tools_node(state, config):
+            return tool_node(state, self.tools_registry, config=config)
         
-        def tools_node(state):
-            return tool_node(state, self.tools_registry)
+        def final_reasoning_with_analyst(state, config):
+            return final_reasoning_node(state, config)
         
-        def final_reasoning_with_analyst(state):
-            return final_reasoning_node(state)
+        def route_agent(state, config):
+            decision = should_continue(state)
+            # Confident VQA-only evidence: skip the final-reasoning LLM call
+            if (decision == "final_reasoning" and self.confidence_gate is not None
+                    and self.confidence_gate.accepts(state, config)):
+                return "gated_answer"
+            return decision
         
         # Add nodes
         workflow.add_node("agent", agent_node)
         workflow.add_node("tools", tools_node)
         workflow.add_node("final_reasoning", final_reasoning_with_analyst)
+        workflow.add_node("gated_answer", gated_answer_node)
         
         # Set entry point
         workflow.set_entry_point("agent")
         
         # Add conditional edges
-        workflow.add_conditional_edges("agent", should_continue, {
+        workflow.add_conditional_edges("agent", route_agent, {
             "continue": "tools",
-            "final_reasoning": "final_reasoning"
+            "final_reasoning": "final_reasoning",
+            "gated_answer": "gated_answer"
         })
         
         # Add edges
         workflow.add_edge("tools", "agent")
         workflow.add_edge("final_reasoning", END)
+        workflow.add_edge("gated_answer", END)
         
         return workflow
     
+    def agent_step(self, state, config, analyst_name: str) -> Dict[str, Any]:
+        """One agent turn; only the analyst name goes into state (resolved through get_analyst)"""
+        state = {**state, "analyst_name": analyst_name}
+        return {**call_agent_node(state, config, self.tools_registry), "analyst_name": analyst_name}
+
     def create_junior_subgraph(self):
         """Create subgraph for Junior Analyst"""
-        junior_analyst = JuniorAgent()
-        workflow = self.create_agent_subgraph(ViReJuniorState, junior_analyst)
+        workflow = self.create_agent_subgraph(ViReJuniorState, "Junior")
         return workflow.compile()
     
     def create_senior_subgraph(self):
         """Create subgraph for Senior Analyst"""
-        senior_analyst = SeniorAgent()
-        workflow = self.create_agent_subgraph(ViReSeniorState, senior_analyst)
+        workflow = self.create_agent_subgraph(ViReSeniorState, "Senior")
         return workflow.compile()
     
     def create_manager_subgraph(self):
         """Create subgraph for Manager Analyst"""
-        manager_analyst = ManagerAgent()
-        workflow = self.create_agent_subgraph(ViReManagerState, manager_analyst)
+        workflow = self.create_agent_subgraph(ViReManagerState, "Manager")
         return workflow.compile()
 
@@ -1,18 +1,200 @@
-from typing import Dict, Any, Optional
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Union
+from PIL import Image
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.utils.image_processing import ImageHandle
+from src.utils.logging_utils import get_logger
+
+logger = get_logger("memory")
+
+DEFAULT_CHECKPOINT_PATH = os.getenv("MA_KNOWLEDGE_CHECKPOINT_DB", "./cache/checkpoints.sqlite")
+DEFAULT_MAX_THREADS = int(os.getenv("MA_KNOWLEDGE_CHECKPOINT_MAX_THREADS", 10000))
+
+
+def question_thread_id(question: str, image: Union[str, Image.Image, ImageHandle],
+                       settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Thread id keyed by image content, normalized question text and the
+    answer-affecting run settings, so changing e.g. the voting mode or gate
+    thresholds starts a new thread instead of returning a stored answer.
+    """
+    handle = ImageHandle.from_source(image)
+    key = f"{handle.content_hash}|{' '.join(question.lower().split())}"
+    if settings:
+        key += "|" + json.dumps(settings, sort_keys=True, default=str)
+    return "q-" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
 
 class SessionMemory:
-    
-    def __init__(self, checkpointer: Optional[BaseCheckpointSaver] = None):
+    """
+    Owner of the graph checkpointer and its retention policy.
+
+    With a durable saver (see ``SessionMemory.sqlite``) every superstep of a
+    question's run is checkpointed under its thread id, so a crashed run is
+    resumed from the last completed step and a finished one is answered from
+    its stored final state.
+
+    Pruning policy: when a thread finishes, its intermediate checkpoints and
+    pending writes are deleted and only the final checkpoint is kept. Every
+    ``prune_every`` finished threads, the least recently finished threads
+    beyond ``max_threads`` are deleted. Unfinished threads are never pruned,
+    so an interrupted run can still be resumed; with SQLite the finished
+    threads are recorded in the checkpoint DB itself (``finished_threads``).
+
+    Runs of the same thread id must go through ``thread_lock``: two
+    concurrent runs of one thread would interleave their checkpoints, and the
+    second could resume the first's unfinished run. The lock is per process;
+    processes sharing one checkpoint DB need distinct thread ids.
+
+    Args:
+        checkpointer: Saver to use; an in-memory MemorySaver when None
+        max_threads: Finished threads kept; None keeps all
+        prune_every: Finished threads between two pruning passes
+    """
+
+    def __init__(self, checkpointer: Optional[BaseCheckpointSaver] = None,
+                 max_threads: Optional[int] = None, prune_every: int = 100):
         self.checkpointer = checkpointer or MemorySaver()
-    
+        self.max_threads = max_threads
+        self.prune_every = max(1, prune_every)
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._since_prune = 0
+        self._lock = threading.Lock()
+        # thread_id -> [lock, number of runs holding or waiting for it]
+        self._thread_locks: Dict[str, List[Any]] = {}
+        sqlite = self._sqlite()
+        if sqlite is not None:
+            conn, lock = sqlite
+            with lock:
+                # rowid grows with every (re)insert, so it orders threads by finish time
+                conn.execute("CREATE TABLE IF NOT EXISTS finished_threads (thread_id TEXT PRIMARY KEY)")
+                conn.commit()
+
+    @classmethod
+    def sqlite(cls, path: str = DEFAULT_CHECKPOINT_PATH,
+               max_threads: Optional[int] = DEFAULT_MAX_THREADS,
+               prune_every: int = 100) -> "SessionMemory":
+        """SessionMemory over a SqliteSaver (requires langgraph-checkpoint-sqlite)"""
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        class CompactSqliteSaver(SqliteSaver):
+            def put(self, config, checkpoint, metadata, new_versions):
+                # Step writes duplicate the checkpoint and hold messages and results, which
+                # the JSON metadata encoder cannot store
+                metadata = {k: v for k, v in metadata.items() if k != "writes"}
+                return super().put(config, checkpoint, metadata, new_versions)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        # No pickle: the state only holds references and pydantic results, and
+        # unpickling a tampered or shared checkpoint file could run code
+        saver = CompactSqliteSaver(conn, serde=JsonPlusSerializer())
+        saver.setup()
+        return cls(saver, max_threads=max_threads, prune_every=prune_every)
+
     def create_thread_config(self, thread_id: str = "default") -> Dict[str, Any]:
         """Create thread configuration for session"""
         return {"configurable": {"thread_id": thread_id}}
-    
+
     def get_checkpointer(self) -> BaseCheckpointSaver:
         """Get the checkpointer instance"""
         return self.checkpointer
 
-session_memory = SessionMemory()
\ No newline at end of file
+    @contextlib.contextmanager
+    def thread_lock(self, thread_id: str) -> Iterator[None]:
+        """Hold while running (or resuming) thread_id; concurrent runs of it wait"""
+        with self._lock:
+            entry = self._thread_locks.setdefault(thread_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._thread_locks[thread_id]
+
+    def _sqlite(self):
+        # (connection, lock) of a SqliteSaver, None for other savers
+        conn = getattr(self.checkpointer, "conn", None)
+        return (conn, self.checkpointer.lock) if isinstance(conn, sqlite3.Connection) else None
+
+    def mark_finished(self, thread_id: str) -> None:
+        """Apply the retention policy after a thread produced its final answer"""
+        self.compact_thread(thread_id)
+        sqlite = self._sqlite()
+        if sqlite is not None:
+            conn, lock = sqlite
+            with lock:
+                conn.execute("INSERT OR REPLACE INTO finished_threads (thread_id) VALUES (?)", (thread_id,))
+                conn.commit()
+        with self._lock:
+            self._finished.pop(thread_id, None)
+            self._finished[thread_id] = None
+            self._since_prune += 1
+            due = self._since_prune >= self.prune_every
+            if due:
+                self._since_prune = 0
+        if due:
+            self.prune()
+
+    def compact_thread(self, thread_id: str) -> None:
+        """Keep only the latest top-level checkpoint of a finished thread"""
+        sqlite = self._sqlite()
+        if sqlite is None:
+            return
+        conn, lock = sqlite
+        with lock:
+            conn.execute(
+                """
+                DELETE FROM checkpoints WHERE thread_id = ? AND (checkpoint_ns != '' OR checkpoint_id != (
+                    SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''))
+                """,
+                (thread_id, thread_id),
+            )
+            conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            conn.commit()
+
+    def prune(self) -> int:
+        """Delete the oldest finished threads beyond max_threads; returns how many"""
+        if self.max_threads is None:
+            return 0
+        sqlite = self._sqlite()
+        if sqlite is not None:
+            conn, lock = sqlite
+            with lock:
+                # Only finished threads are candidates; see mark_finished
+                rows = conn.execute(
+                    "SELECT thread_id FROM finished_threads ORDER BY rowid DESC LIMIT -1 OFFSET ?",
+                    (self.max_threads,),
+                ).fetchall()
+                stale = [row[0] for row in rows]
+                conn.executemany("DELETE FROM finished_threads WHERE thread_id = ?", rows)
+                conn.commit()
+        else:
+            with self._lock:
+                excess = len(self._finished) - self.max_threads
+                stale = list(self._finished)[:max(0, excess)]
+
+        for thread_id in stale:
+            self.checkpointer.delete_thread(thread_id)
+        with self._lock:
+            for thread_id in stale:
+                self._finished.pop(thread_id, None)
+        if stale:
+            logger.info("pruned_threads count=%d max_threads=%d", len(stale), self.max_threads)
+        return len(stale)
+
+session_memory = SessionMemory()
@@ -1,6 +1,16 @@
-from src.tools.vqa_tool import caption_image
+from typing import Dict, Any
+from src.utils.image_processing import image_registry
 
 
-def caption_node(state):
-        caption = caption_image(state.get("image"))
-        return {"image_caption": caption}
\ No newline at end of file
+def caption_node(state, tools_registry: Dict[str, Any]):
+        if state.get("image_id"):
+            # Registered by the caller (VQAPipeline), who keeps it alive for the run
+            image = image_registry.get(state["image_id"])
+            updates = {}
+        else:
+            # Decode the raw input once; the state holds the handle so the
+            # registry entry lives as long as the run
+            image = image_registry.register(state.get("image"))
+            updates = {"image": image, "image_id": image.content_hash}
+        updates["image_caption"] = tools_registry["caption_image"](image)
+        return updates
@@ -0,0 +1,54 @@
+import re
+from typing import Tuple
+
+# Questions answerable from the pixels alone (dominant in VQAv2)
+PERCEPTUAL_PATTERNS = [
+    r"^what colou?rs?\b",
+    r"\bwhat colou?r\b",
+    r"^how many\b",
+    r"^(is|are|does|do|can|was|were|has|have) (there|the|this|that|these|those|it|he|she|they)\b",
+    r"^where (is|are)\b",
+    r"^what (is|are) (the|this|that) (\w+ )?(man|woman|person|people|boy|girl|child|dog|cat|animal)s? (doing|holding|wearing|eating|sitting|standing|looking)\b",
+    r"^what shape\b",
+    r"^what (number|letter|time)\b",
+    r"^which (side|direction|hand)\b",
+    r"\b(left|right|behind|in front of|on top of|next to)\b",
+    r"^what room\b",
+    r"^what is (on|in) the\b",
+]
+
+# Questions needing facts that are not in the image
+KNOWLEDGE_PATTERNS = [
+    r"^why\b",
+    r"^how (does|do|did|is|are) .* (work|made|called)\b",
+    r"^who\b",
+    r"^when\b",
+    r"\b(breed|species|brand|manufacturer|company|model|era|century|decade|year|country|city|capital|language)\b",
+    r"\b(used for|made of|made from|known for|famous|invented|originat\w*|named after|purpose)\b",
+    r"\bwhat does .* (mean|do)\b",
+    r"\b(history|historical|scientific|nutrient|vitamin|calories)\b",
+]
+
+_PERCEPTUAL = [re.compile(p) for p in PERCEPTUAL_PATTERNS]
+_KNOWLEDGE = [re.compile(p) for p in KNOWLEDGE_PATTERNS]
+
+
+def classify_question(question: str) -> Tuple[str, float]:
+    """
+    Classify a question as "perceptual", "knowledge" or "other".
+
+    Keyword rules only (microseconds, no LLM call). The returned confidence is
+    high when exactly one family of rules matches, lower when both or none do.
+    """
+    text = " ".join(str(question).lower().split())
+    perceptual = sum(1 for p in _PERCEPTUAL if p.search(text))
+    knowledge = sum(1 for p in _KNOWLEDGE if p.search(text))
+
+    if knowledge and not perceptual:
+        return "knowledge", 0.9
+    if perceptual and not knowledge:
+        return "perceptual", round(min(0.95, 0.8 + 0.05 * perceptual), 2)
+    if knowledge and perceptual:
+        # Mixed signals, e.g. "what breed is the dog on the left"
+        return "knowledge", 0.6
+    return "other", 0.5
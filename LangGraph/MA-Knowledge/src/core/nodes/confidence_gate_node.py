@@ -0,0 +1,104 @@
+from typing import Dict, Any, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END
+
+from src.tools.tool_results import AnalystAnswer, Candidate, parse_vqa_output
+from src.utils.image_processing import image_registry
+from src.utils.logging_utils import get_logger
+
+logger = get_logger("confidence_gate")
+
+# RunnableConfig["configurable"] keys overriding the gate thresholds per run
+MIN_SCORE_KEY = "gate_min_score"
+MIN_MARGIN_KEY = "gate_min_margin"
+
+
+class ConfidenceGate:
+    """
+    Short-circuit on confident VQA candidates.
+
+    A candidate list passes when the top score is at least ``min_score`` and
+    beats the runner-up by at least ``min_margin``. As a main-graph node the
+    gate asks vqa_tool once (results are cached, so analysts that run later
+    reuse them) and answers directly when the candidates pass, skipping the
+    analysts and every LLM call. Inside a subgraph it replaces the
+    final-reasoning LLM call of an analyst whose only evidence is VQA.
+
+    Thresholds can be overridden per run through
+    ``config["configurable"]["gate_min_score" / "gate_min_margin"]``.
+
+    Args:
+        tools_registry: Tools by name; must contain "vqa_tool"
+        min_score: Minimum top candidate probability
+        min_margin: Minimum gap between the top two candidates
+    """
+
+    def __init__(self, tools_registry: Dict[str, Any], min_score: float = 0.9, min_margin: float = 0.3):
+        self.tools_registry = tools_registry
+        self.min_score = min_score
+        self.min_margin = min_margin
+
+    def thresholds(self, config: Optional[RunnableConfig] = None) -> Tuple[float, float]:
+        configurable = (config or {}).get("configurable") or {}
+        return (
+            float(configurable.get(MIN_SCORE_KEY, self.min_score)),
+            float(configurable.get(MIN_MARGIN_KEY, self.min_margin)),
+        )
+
+    def check(self, candidates: List[Candidate],
+              config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """Gate decision with the numbers behind it, for voting_details"""
+        min_score, min_margin = self.thresholds(config)
+        top_answer, top_score = (candidates[0].answer, candidates[0].score) if candidates else ("", 0.0)
+        runner_up = candidates[1].score if len(candidates) > 1 else 0.0
+        return {
+            "passed": bool(candidates) and top_score >= min_score and top_score - runner_up >= min_margin,
+            "answer": top_answer,
+            "score": top_score,
+            "margin": top_score - runner_up,
+            "min_score": min_score,
+            "min_margin": min_margin,
+        }
+
+    def __call__(self, state, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        image = image_registry.get(state["image_id"])
+        try:
+            raw = self.tools_registry["vqa_tool"].invoke(
+                {"image": image, "question": state["question"]}, config)
+        except Exception as e:
+            logger.warning("gate_vqa_failed error=%s", e)
+            raw = ""
+        candidates = parse_vqa_output(raw)
+        decision = self.check(candidates, config)
+        logger.debug("gate passed=%s answer=%r score=%.2f margin=%.2f",
+                     decision["passed"], decision["answer"], decision["score"], decision["margin"])
+
+        updates = {"vqa_candidates": candidates}
+        if decision["passed"]:
+            updates["final_answer"] = decision["answer"]
+            updates["voting_details"] = {"final_answer": decision["answer"], "confidence_gate": decision}
+        return updates
+
+    @staticmethod
+    def route(state) -> str:
+        """END when the gate produced the final answer, otherwise None (run the analysts)"""
+        return END if state.get("final_answer") else None
+
+    def accepts(self, state, config: Optional[RunnableConfig] = None) -> bool:
+        """Whether an analyst may answer from its VQA candidates alone"""
+        if state.get("KBs_Knowledge") or state.get("LLM_Knowledge"):
+            return False
+        return self.check(state.get("vqa_candidates") or [], config)["passed"]
+
+
+def gated_answer_node(state) -> Dict[str, Any]:
+    """Analyst result taken from the top VQA candidate, without an LLM call"""
+    analyst_name = state["analyst_name"]
+    answer = state["vqa_candidates"][0].answer
+    logger.info("gated_answer analyst=%s answer=%r", analyst_name, answer)
+    return {
+        "results": [AnalystAnswer(analyst=analyst_name, answer=answer, content=f"Answer: {answer}")],
+        "candidates": {analyst_name: state["vqa_candidates"]},
+        "number_of_steps": state.get("number_of_steps", 0) + 1,
+    }
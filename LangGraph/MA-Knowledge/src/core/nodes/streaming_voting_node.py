@@ -0,0 +1,319 @@
+import threading
+import time
+from collections import Counter
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import StreamWriter
+
+from src.core.nodes.voting_node import AGENT_WEIGHTS, is_vote_decided, voting_function
+from src.core.router import AdaptiveRouter
+from src.core.tracing import ANALYST_METADATA_KEY
+from src.tools.tool_executor import CANCEL_EVENT_KEY
+from src.tools.tool_results import AnalystAnswer
+from src.utils.logging_utils import get_logger
+
+logger = get_logger("streaming_voting")
+
+# Main-graph node name -> agent name used in results / voting weights
+ANALYST_AGENTS = {
+    "junior_analyst": "Junior",
+    "senior_analyst": "Senior",
+    "manager_analyst": "Manager",
+}
+
+
+class _CancelEvent(threading.Event):
+    """Cancel flag of one analyst run that remembers when it was first set"""
+
+    def __init__(self):
+        super().__init__()
+        self.set_at: Optional[float] = None
+
+    def set(self) -> None:
+        if self.set_at is None:
+            self.set_at = time.perf_counter()
+        super().set()
+
+
+class StreamingVotingNode:
+    """
+    Voting node that runs the analyst subgraphs itself and votes as they finish.
+
+    Each subgraph is streamed step by step in its own thread. After every
+    completed analyst the weighted votes are tallied; once the leader cannot
+    be overtaken by the outstanding analysts (see is_vote_decided) those are
+    cancelled and the node returns. The cancel event is passed to the
+    subgraph's tools (see ToolExecutor): tool calls not started yet are
+    skipped and the analyst stops waiting for those in flight. Otherwise it
+    takes effect at the next subgraph step boundary: an LLM call in flight
+    (or a tool call already running) finishes in the background, its result
+    is discarded and no further step runs.
+
+    ``estimated_saved_time_s`` / ``estimated_saved_tool_calls`` are estimates
+    from the average wall time and tool calls of runs where the cancelled
+    analyst did complete. What cancelled runs actually did after their
+    cancel (seconds until they stopped, steps that still finished) is
+    measured when they stop, logged, and accumulated in ``cancel_stats()``;
+    ``early_exit["after_cancel"]`` is a snapshot of those totals. Until an
+    analyst has ``calibration_runs`` completed runs it may instead be left to
+    finish in the background (its answer is still ignored), so the estimates
+    exist after the first few questions. That background work is bounded: at
+    most ``max_background_calibrations`` such runs exist at once across all
+    questions (others are cancelled like calibrated analysts, without a
+    saving estimate), and each is cancelled after ``calibration_budget_s``.
+
+    Every finished analyst's answer is also written to the custom stream
+    (``stream_mode="custom"``) as soon as it arrives.
+
+    With a router (adaptive routing) only the analysts in
+    ``state["routed_analysts"]`` are started; when Junior ran alone and is not
+    confident, the router's escalation targets are started next and voted
+    on the same way.
+
+    Args:
+        subgraphs: Compiled subgraphs keyed by main-graph node name
+        calibration_runs: Completed runs per analyst needed for the saving estimates
+        max_background_calibrations: Calibrating runs allowed to outlive their question
+        calibration_budget_s: Seconds a calibrating run may keep running after the vote
+        router: AdaptiveRouter whose classify node ran before this node; all analysts run when None
+    """
+
+    def __init__(self, subgraphs: Dict[str, Any], calibration_runs: int = 1,
+                 max_background_calibrations: int = 1, calibration_budget_s: float = 60.0,
+                 router: Optional[AdaptiveRouter] = None):
+        self.subgraphs = subgraphs
+        self.router = router
+        self.calibration_runs = calibration_runs
+        self.calibration_budget_s = calibration_budget_s
+        self._calibration_slots = threading.BoundedSemaphore(max_background_calibrations) \
+            if max_background_calibrations > 0 else None
+        self._lock = threading.Lock()
+        # node name -> [completed runs, total wall seconds, total tool calls]
+        self._costs: Dict[str, list] = {name: [0, 0.0, 0] for name in subgraphs}
+        self._after_cancel = {"cancelled_runs": 0, "seconds": 0.0, "steps": 0}
+
+    def cancel_stats(self) -> Dict[str, Any]:
+        """Measured work of cancelled runs after their cancel, summed since start"""
+        with self._lock:
+            stats = dict(self._after_cancel)
+        runs = stats["cancelled_runs"]
+        stats["avg_seconds"] = stats["seconds"] / runs if runs else 0.0
+        return stats
+
+    def _record_after_cancel(self, name: str, cancel: _CancelEvent, steps: int) -> None:
+        seconds = time.perf_counter() - cancel.set_at
+        with self._lock:
+            self._after_cancel["cancelled_runs"] += 1
+            self._after_cancel["seconds"] += seconds
+            self._after_cancel["steps"] += steps
+        logger.info("cancelled_run_stopped analyst=%s after_cancel_s=%.3f steps_after_cancel=%d",
+                    ANALYST_AGENTS[name], seconds, steps)
+
+    def _record_cost(self, name: str, elapsed: float, tool_calls: int) -> None:
+        with self._lock:
+            cost = self._costs[name]
+            cost[0] += 1
+            cost[1] += elapsed
+            cost[2] += tool_calls
+
+    def _average_cost(self, name: str) -> Optional[tuple]:
+        with self._lock:
+            runs, wall, tool_calls = self._costs[name]
+        if runs < max(self.calibration_runs, 1):
+            return None
+        return wall / runs, tool_calls / runs
+
+    def _run_analyst(self, name: str, inputs: Dict[str, Any], config: RunnableConfig,
+                     cancel: _CancelEvent, progress: Dict[str, Any],
+                     candidates: Dict[str, Any]) -> Optional[List[AnalystAnswer]]:
+        """Stream one subgraph; returns its results list, or None when cancelled"""
+        start = time.perf_counter()
+        results = []
+        # Node updates, not full values: the transcript is not part of the subgraph output
+        for chunk in self.subgraphs[name].stream(inputs, config, stream_mode="updates"):
+            for update in chunk.values():
+                update = update or {}
+                progress[name] = progress.get(name, 0) + _count_tool_calls(update.get("messages", []))
+                results = update.get("results", results)
+                candidates.update(update.get("candidates") or {})
+            if cancel.is_set():
+                # The step that just finished was in flight when the cancel came
+                self._record_after_cancel(name, cancel, len(chunk))
+                return None
+        if cancel.is_set():
+            # Cancelled while its last step was running
+            self._record_after_cancel(name, cancel, 1)
+        self._record_cost(name, time.perf_counter() - start, progress.get(name, 0))
+        return results
+
+    def _keep_calibrating(self, cancel: threading.Event, future) -> bool:
+        """Leave an uncalibrated analyst running within the budget, if a slot is free"""
+        if self._calibration_slots is None or not self._calibration_slots.acquire(blocking=False):
+            return False
+        timer = threading.Timer(self.calibration_budget_s, cancel.set)
+        timer.daemon = True
+        timer.start()
+        future.add_done_callback(partial(self._end_calibration, timer))
+        return True
+
+    def _end_calibration(self, timer: threading.Timer, _future) -> None:
+        timer.cancel()
+        self._calibration_slots.release()
+
+    def _subgraph_config(self, name: str, config: Optional[RunnableConfig],
+                         cancel: threading.Event) -> RunnableConfig:
+        # Only callbacks/tags/metadata are forwarded: the subgraph runs as a
+        # standalone graph, not inside this node's checkpoint namespace
+        config = config or {}
+        return {
+            "callbacks": config.get("callbacks"),
+            "tags": list(config.get("tags") or []),
+            "metadata": {**(config.get("metadata") or {}), ANALYST_METADATA_KEY: name},
+            "run_name": name,
+            # Reaches ToolExecutor through the tools node's config
+            "configurable": {CANCEL_EVENT_KEY: cancel},
+        }
+
+    def __call__(self, state, config: Optional[RunnableConfig] = None,
+                 writer: StreamWriter = None) -> Dict[str, Any]:
+        inputs = {
+            "question": state["question"],
+            "image_id": state["image_id"],
+            "image_caption": state.get("image_caption", ""),
+            "messages": [],
+        }
+        routed = list(state.get("routed_analysts") or []) if self.router else list(self.subgraphs)
+        escalation: List[str] = []
+        cancel = {name: _CancelEvent() for name in self.subgraphs}
+        progress: Dict[str, int] = {}
+        candidates: Dict[str, Any] = {}
+        start = time.perf_counter()
+
+        executor = ThreadPoolExecutor(max_workers=len(self.subgraphs), thread_name_prefix="analyst")
+        futures = {}
+
+        def submit(names: List[str]) -> None:
+            for name in names:
+                future = executor.submit(self._run_analyst, name, inputs,
+                                         self._subgraph_config(name, config, cancel[name]),
+                                         cancel[name], progress, candidates)
+                futures[future] = name
+                pending.add(future)
+
+        results = []
+        answers: Dict[str, str] = {}
+        vote_counts: Counter = Counter()
+        pending = set()
+        decided = False
+        submit(routed)
+        try:
+            while pending and not decided:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures[future]
+                    agent = ANALYST_AGENTS[name]
+                    try:
+                        analyst_results = future.result() or []
+                    except Exception as e:
+                        logger.warning("analyst_failed analyst=%s error=%s", agent, e)
+                        analyst_results = []
+                    results.extend(analyst_results)
+                    answer = next((r.answer for r in analyst_results if r.analyst == agent), "")
+                    answers[agent.lower()] = answer
+                    if writer is not None:
+                        # Partial result for stream_mode="custom" consumers (VQAPipeline.stream)
+                        writer({"analyst": agent, "answer": answer})
+                    if answer:
+                        vote_counts[answer] += AGENT_WEIGHTS[agent.lower()]
+
+                if not pending and not escalation and self._should_escalate(routed, candidates):
+                    escalation = self.router.escalate_node(state)["routed_analysts"]
+                    submit(escalation)
+                remaining = sum(AGENT_WEIGHTS[ANALYST_AGENTS[futures[f]].lower()] for f in pending)
+                decided = bool(pending) and is_vote_decided(vote_counts, remaining)
+        finally:
+            # Averages are read before cancelling so this run's calibration decision is stable
+            averages = {futures[f]: self._average_cost(futures[f]) for f in pending}
+            calibrating_names = []
+            for future in pending:
+                name = futures[future]
+                if decided and averages[name] is None and self._keep_calibrating(cancel[name], future):
+                    calibrating_names.append(name)
+                else:
+                    cancel[name].set()
+            # Do not wait: cancelled subgraphs stop at their next step boundary
+            executor.shutdown(wait=False)
+
+        decided_at = time.perf_counter() - start
+        final_answer, vote_breakdown = voting_function(
+            answers.get("junior", ""), answers.get("senior", ""), answers.get("manager", "")
+        )
+
+        cancelled = sorted(ANALYST_AGENTS[name] for name in averages if name not in calibrating_names)
+        calibrating = sorted(ANALYST_AGENTS[name] for name in calibrating_names)
+        saved_time, saved_tool_calls = 0.0, 0.0
+        for name, average in averages.items():
+            # Cancelled before calibration: no estimate yet
+            if average is None or name in calibrating_names:
+                continue
+            avg_wall, avg_tool_calls = average
+            saved_time = max(saved_time, avg_wall - decided_at)
+            saved_tool_calls += max(0.0, avg_tool_calls - progress.get(name, 0))
+
+        voting_details = {
+            "agent_answers": {
+                agent: {"answer": answers[agent], "weight": weight}
+                for agent, weight in AGENT_WEIGHTS.items() if agent in answers
+            },
+            "vote_breakdown": vote_breakdown,
+            "final_answer": final_answer,
+            "total_votes": sum(vote_breakdown.values()) if vote_breakdown else 0,
+            "early_exit": {
+                "triggered": decided,
+                "cancelled": cancelled,
+                # Ignored by the vote but left running (bounded) to calibrate the estimates below
+                "calibrating": calibrating,
+                "decided_at_s": decided_at,
+                # Estimated from completed runs of the cancelled analysts, not measured
+                "estimated_saved_time_s": saved_time,
+                "estimated_saved_tool_calls": saved_tool_calls,
+                # Measured: work cancelled runs still did after their cancel (earlier
+                # questions; this question's runs are added when they stop)
+                "after_cancel": self.cancel_stats(),
+            },
+        }
+
+        update = {
+            "results": results,
+            "final_answer": final_answer,
+            "voting_details": voting_details,
+        }
+        if self.router is not None:
+            # Same shape as voting_node's routing details
+            voting_details["routing"] = {
+                "question_type": state.get("question_type"),
+                "classifier_confidence": state.get("classifier_confidence"),
+                "analysts": routed + escalation,
+                "escalated": bool(escalation),
+            }
+            if escalation:
+                # routed_analysts accumulates, as when escalate_node runs in full mode
+                update["routed_analysts"] = escalation
+                update["escalated"] = True
+
+        logger.info("vote_breakdown=%s final_answer=%r cancelled=%s", vote_breakdown, final_answer, cancelled)
+
+        return update
+
+    def _should_escalate(self, routed: List[str], candidates: Dict[str, Any]) -> bool:
+        """Junior ran alone and the router does not accept its answer"""
+        if self.router is None or routed != ["junior_analyst"]:
+            return False
+        return self.router.route_after_junior({"routed_analysts": routed, "candidates": candidates}) == "escalate"
+
+
+def _count_tool_calls(messages) -> int:
+    return sum(len(getattr(message, "tool_calls", None) or []) for message in messages)
@@ -1,54 +1,95 @@
-from typing import Union, Dict, Any
-import json
+from typing import Union, Dict, Any, Optional
 from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import ToolMessage, SystemMessage, HumanMessage
 from src.core.state import ViReJuniorState, ViReSeniorState, ViReManagerState
+from src.agents.registry import get_analyst
 from src.models.llm_provider import get_llm
-from src.utils.tools_utils import _process_knowledge_result
-import re
-from src.utils.image_processing import pil_to_base64
-from src.utils.text_processing import extract_answer_from_result
+from src.utils.image_processing import image_registry
+from src.tools.tool_executor import ToolExecutor, tool_executor
+from src.tools.tool_results import (
+    AnalystAnswer,
+    format_candidates,
+    format_knowledge,
+    parse_knowledge_output,
+    parse_vqa_output,
+)
+from src.utils.logging_utils import get_logger
+
+logger = get_logger("subgraph")
 
 def tool_node(state: Union[ViReJuniorState, ViReSeniorState, ViReManagerState], 
-              tools_registry: Dict[str, Any]) -> Dict[str, Any]:
-    """Process tool calls and update state"""
+              tools_registry: Dict[str, Any],
+              executor: ToolExecutor = tool_executor,
+              config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """
+    Process tool calls concurrently and update state in tool-call order.
+
+    Raw tool output is parsed here, once: VQA into Candidate lists and
+    knowledge tools into KnowledgeSnippets. The ToolMessage carries a
+    readable rendering as content and the parsed objects as its artifact.
+    """
     outputs = []
     tool_calls = getattr(state["messages"][-1], "tool_calls", [])
+    analyst_name = state["analyst_name"]
     
     updates = {"messages": outputs}
 
+    # Build call args without mutating the AIMessage, which is sent back to the LLM
+    calls = []
+    for tool_call in tool_calls:
+        tool_name = tool_call["name"]
+        args = dict(tool_call["args"])
+        if tool_name == "vqa_tool":
+            logger.debug("tool_call analyst=%s tool=vqa_tool", analyst_name)
+            # Pass the shared handle by reference instead of re-encoding per call
+            args["image"] = image_registry.get(state["image_id"])
+        elif tool_name in ["arxiv", "wikipedia"]:
+            logger.debug("tool_call analyst=%s tool=%s args=%s", analyst_name, tool_name, tool_call['args'])
+        if tool_name in tools_registry:
+            calls.append((tool_name, args))
+
+    outcomes = iter(executor.run(tools_registry, calls, config))
+
     for tool_call in tool_calls:
         tool_name = tool_call["name"]
+        if tool_name not in tools_registry:
+            ok, result = True, f"Unknown tool: {tool_name}"
+        else:
+            ok, result = next(outcomes)
+
         try:
+            if not ok:
+                raise result
+
+            artifact = None
             if tool_name == "vqa_tool":
-                print(f"Processing {state.get('analyst').name} calls vqa_tool")
-                
-                tool_call["args"]["image"] = pil_to_base64(state.get("image")) 
-                result = tools_registry[tool_name].invoke(tool_call["args"])
-                updates["answer_candidate"] = result
+                artifact = parse_vqa_output(result)
+                if artifact:
+                    updates["vqa_candidates"] = artifact
+                else:
+                    # Keep earlier candidates; the final prompt falls back to the raw text
+                    updates["vqa_raw"] = str(result)
+                content = f"Candidates: {format_candidates(artifact)}" if artifact else str(result)
                 
             elif tool_name in ["arxiv", "wikipedia"]:
-                print(f"Processing {state.get('analyst').name} calls {tool_name} with args: {tool_call['args']}")
-                raw_result = tools_registry[tool_name].invoke(tool_call["args"])
-                
-                # Process and format the result
-                processed_result = _process_knowledge_result(raw_result, tool_name)
-                print("Processed result for", state.get("analyst").name, ":", processed_result)
-                if "KBs_Knowledge" not in updates:
-                    updates["KBs_Knowledge"] = []
-                updates["KBs_Knowledge"].append(processed_result)
+                artifact = parse_knowledge_output(result, tool_name)
+                content = format_knowledge(artifact)
+                logger.debug("tool_result analyst=%s tool=%s result=%r", analyst_name, tool_name, content)
+                updates.setdefault("KBs_Knowledge", []).extend(artifact)
+
             else:
-                result = f"Unknown tool: {tool_name}"
+                content = str(result)
 
             outputs.append(
                 ToolMessage(
-                    content=json.dumps(processed_result if 'processed_result' in locals() else result),
+                    content=content,
+                    artifact=artifact,
                     name=tool_name,
                     tool_call_id=tool_call["id"],
                 )
             )
         except Exception as e:
-            print(f"Error processing tool {tool_name}: {e}")
+            logger.warning("tool_error analyst=%s tool=%s error=%s", analyst_name, tool_name, e)
             outputs.append(
                 ToolMessage(
                     content=f"Error: {str(e)}",
@@ -63,24 +104,15 @@ def call_agent_node(state: Union[ViReJuniorState, ViReSeniorState, ViReManagerSt
                    config: RunnableConfig,
                    tools_registry: Dict[str, Any]) -> Dict[str, Any]:
     """Call the agent with appropriate tools"""
-    tools = state["analyst"].tools
-    tools = [tools_registry[tool] for tool in tools if tool in tools_registry]
+    analyst = get_analyst(state["analyst_name"])
+    tools = [tools_registry[tool] for tool in analyst.tools if tool in tools_registry]
     
     llm = get_llm(tools)
-    # Auto-detect placeholders từ system prompt
-    base_prompt = state["analyst"].system_prompt
-    placeholders = re.findall(r'\{(\w+)\}', base_prompt)
-    
-    # Prepare available values
-    format_values = {
+    # Prompt is pre-parsed on the analyst; only its known placeholders are filled
+    formatted_prompt = analyst.system_template.render({
         'question': state.get('question', ''),
         'context': state.get('image_caption', ''),
-    }
-    
-    # Chỉ format với placeholders có trong prompt
-    format_dict = {key: format_values[key] for key in placeholders if key in format_values}
-    
-    formatted_prompt = base_prompt.format(**format_dict)
+    })
     
     system_prompt = SystemMessage(content=formatted_prompt)
     question_prompt = HumanMessage(content=f"question: {state['question']}")
@@ -89,48 +121,43 @@ def call_agent_node(state: Union[ViReJuniorState, ViReSeniorState, ViReManagerSt
 
     response = llm.invoke(sequence, config)
     
+    # add_messages appends; returning the whole history would copy it every step
     return {
-        "messages": state["messages"] + [response],
-        "analyst": state["analyst"],
+        "messages": [response],
         "number_of_steps": state.get("number_of_steps", 0) + 1
     }
 
 
-def final_reasoning_node(state: Union[ViReJuniorState, ViReSeniorState, ViReManagerState]) -> Dict[str, Any]:
+def final_reasoning_node(state: Union[ViReJuniorState, ViReSeniorState, ViReManagerState],
+                         config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """Final reasoning node to synthesize results"""
     
-    # Auto-detect placeholders từ final_system_prompt
-    base_prompt = state["analyst"].final_system_prompt
-    placeholders = re.findall(r'\{(\w+)\}', base_prompt)
-    
     # Prepare available values
     format_values = {
         'context': state.get("image_caption", ""),
         'question': state.get("question", ""),
-        'candidates': state.get("answer_candidate", ""),
-        'KBs_Knowledge': "\n".join(state.get("KBs_Knowledge", [])),
+        'candidates': format_candidates(state["vqa_candidates"]) if state.get("vqa_candidates")
+                      else state.get("vqa_raw", ""),
+        'KBs_Knowledge': format_knowledge(state.get("KBs_Knowledge", [])),
         'LLM_knowledge': state.get("LLM_Knowledge", "")
     }
     
-    # Chỉ format với placeholders có trong prompt
-    format_dict = {key: format_values[key] for key in placeholders if key in format_values}
-    
-    final_system_prompt = base_prompt.format(**format_dict)
+    analyst_name = state["analyst_name"]
+    final_system_prompt = get_analyst(analyst_name).final_template.render(format_values)
     
     llm = get_llm(temperature=0.1)
     
     system_msg = SystemMessage(content=final_system_prompt)
     human_msg = HumanMessage(content="Please provide your final answer.")
     
-    final_response = llm.invoke([system_msg, human_msg])
-    print("Answer candidate for ", state.get("analyst").name, ":", format_values.get("candidates", None))
-    print("KBs_Knowledge for ", state.get("analyst").name, ":", format_values.get("KBs_Knowledge", []))
-    print("LLM_Knowledge for ", state.get("analyst").name, ":", format_values.get("LLM_Knowledge", ""))
-    print(f"Final response for {state.get('analyst').name}:", final_response.content)
-    print("--------------------------------")
+    final_response = llm.invoke([system_msg, human_msg], config)
+    logger.debug("final_inputs analyst=%s candidates=%r KBs_Knowledge=%r",
+                 analyst_name, format_values["candidates"], format_values["KBs_Knowledge"])
+    logger.info("final_response analyst=%s content=%r", analyst_name, final_response.content)
     return {
         "messages": [final_response],
-        "results": [{state["analyst"].name: final_response.content}],
+        "results": [AnalystAnswer.from_response(analyst_name, final_response.content)],
+        "candidates": {analyst_name: state.get("vqa_candidates") or []},
         "number_of_steps": state.get("number_of_steps", 0) + 1
     }
 
@@ -146,10 +173,10 @@ def should_continue(state: Union[ViReJuniorState, ViReSeniorState, ViReManagerSt
         "Junior": 4,  
         "Senior": 6,     
         "Manager": 8    
-    }.get(state.get("analyst", {}).name)
+    }.get(state["analyst_name"])
     
     if number_of_steps >= max_steps:
-        print(f"Reached max steps ({max_steps}), stopping ReAct loop")
+        logger.warning("max_steps_reached analyst=%s max_steps=%s", state["analyst_name"], max_steps)
         return "final_reasoning"
     # If no tool calls, go to final reasoning  
     if not getattr(last_message, "tool_calls", None):
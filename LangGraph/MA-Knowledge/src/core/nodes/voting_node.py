@@ -1,40 +1,17 @@
 from typing import Dict, Any, List, Tuple
 from collections import Counter
-import re
-from src.utils.text_processing import extract_answer_from_result
+# Re-exported: answers are normalized once, when an analyst's response is parsed
+from src.utils.text_processing import normalize_answer_for_voting
+from src.utils.logging_utils import get_logger
 
-def normalize_answer_for_voting(answer: str) -> str:
-    """
-    Normalize answer for voting by extracting the core answer from various formats.
-    
-    Examples:
-    - "10(0.98)" -> "10"
-    - "Candidates: 10(0.99), 9(0.92)" -> "10"
-    - "The answer is 10" -> "10"
-    - "10" -> "10"
-    """
-    if not answer:
-        return ""
-    
-    answer = str(answer).strip()
-    
-    # Extract from VQA format: "10(0.98)" -> "10"
-    match = re.match(r'^(\w+)\s*\(\d+\.\d+\)', answer)
-    if match:
-        return match.group(1).strip()
-    
-    # Extract from candidates format: "Candidates: 10(0.99), 9(0.92)" -> "10"
-    candidates_match = re.search(r'Candidates:\s*(\w+)\s*\(\d+\.\d+\)', answer)
-    if candidates_match:
-        return candidates_match.group(1).strip()
-    
-    # Extract from "The answer is X" format
-    answer_match = re.search(r'the\s+answer\s+is\s+(\w+)', answer.lower())
-    if answer_match:
-        return answer_match.group(1).strip()
-    
-    # If it's just a simple answer, return as is
-    return answer
+logger = get_logger("voting")
+
+# Voting weights from the paper: AF = Voting(AJ[2], AS[3], AM[4])
+AGENT_WEIGHTS = {
+    'junior': 2,
+    'senior': 3,
+    'manager': 4
+}
 
 def voting_function(junior_answer: str, senior_answer: str, manager_answer: str) -> Tuple[str, Dict[str, int]]:
     """
@@ -48,13 +25,8 @@ def voting_function(junior_answer: str, senior_answer: str, manager_answer: str)
     Returns:
         Tuple of (final_answer, vote_breakdown)
     """
-    # Define weights according to paper
-    weights = {
-        'junior': 2,
-        'senior': 3,
-        'manager': 4
-    }
-    
+    weights = AGENT_WEIGHTS
+
     # Count votes for each unique answer
     vote_counts = Counter()
     
@@ -75,12 +47,26 @@ def voting_function(junior_answer: str, senior_answer: str, manager_answer: str)
     # Fallback if no valid answers
     return "", {}
 
+def is_vote_decided(vote_counts: Dict[str, int], remaining_weight: int) -> bool:
+    """
+    True when the leading answer wins however the outstanding agents vote.
+
+    The leader must beat the runner-up even if every remaining vote goes to
+    the runner-up; ties are not decided because voting_function breaks them
+    by agent order.
+    """
+    if not vote_counts:
+        return False
+    ranked = sorted(vote_counts.values(), reverse=True)
+    runner_up = ranked[1] if len(ranked) > 1 else 0
+    return ranked[0] > runner_up + remaining_weight
+
 def voting_node(state) -> Dict[str, Any]:
     """
     Voting node that implements weighted voting mechanism from paper.
     
     Process:
-    1. Extract answers from each agent's results
+    1. Read each agent's parsed answer (AnalystAnswer) from results
     2. Apply weighted voting: Junior(2), Senior(3), Manager(4)
     3. Select answer with highest vote count
     4. Return final answer and voting details
@@ -89,26 +75,24 @@ def voting_node(state) -> Dict[str, Any]:
     # Extract results from agents
     # Note: results are accumulated in order [junior, senior, manager]
     results = state.get("results", [])
+    # Adaptive routing may run only some analysts; all three otherwise
+    routed_analysts = state.get("routed_analysts") or []
+    expected = len(routed_analysts) or 3
     
-    if len(results) < 3:
-        print(f"Warning: Expected 3 agent results, got {len(results)}")
+    if len(results) < expected:
+        logger.warning("insufficient_results expected=%d got=%d", expected, len(results))
         return {
             "final_answer": "",
             "voting_details": {
-                "error": f"Insufficient results: expected 3, got {len(results)}"
+                "error": f"Insufficient results: expected {expected}, got {len(results)}"
             }
         }
     
-    # convert list of dict to dict
-    agent_results = {k: v for d in results for k, v in d.items()}
-        
-    # Extract answers from each agent by name
-    junior_result = agent_results.get("Junior", "")
-    senior_result = agent_results.get("Senior", "")
-    manager_result = agent_results.get("Manager", "")
-    junior_answer = normalize_answer_for_voting(extract_answer_from_result(junior_result))
-    senior_answer = normalize_answer_for_voting(extract_answer_from_result(senior_result))
-    manager_answer = normalize_answer_for_voting(extract_answer_from_result(manager_result))
+    # Answers were parsed once in final reasoning; index them by agent name
+    agent_answers = {result.analyst: result.answer for result in results}
+    junior_answer = agent_answers.get("Junior", "")
+    senior_answer = agent_answers.get("Senior", "")
+    manager_answer = agent_answers.get("Manager", "")
     
     # Apply weighted voting
     final_answer, vote_breakdown = voting_function(
@@ -118,21 +102,23 @@ def voting_node(state) -> Dict[str, Any]:
     # Create detailed voting information
     voting_details = {
         "agent_answers": {
-            "junior": {"answer": junior_answer, "weight": 2},
-            "senior": {"answer": senior_answer, "weight": 3},
-            "manager": {"answer": manager_answer, "weight": 4}
+            "junior": {"answer": junior_answer, "weight": AGENT_WEIGHTS['junior']},
+            "senior": {"answer": senior_answer, "weight": AGENT_WEIGHTS['senior']},
+            "manager": {"answer": manager_answer, "weight": AGENT_WEIGHTS['manager']}
         },
         "vote_breakdown": vote_breakdown,
         "final_answer": final_answer,
         "total_votes": sum(vote_breakdown.values()) if vote_breakdown else 0
     }
+    if routed_analysts:
+        voting_details["routing"] = {
+            "question_type": state.get("question_type"),
+            "classifier_confidence": state.get("classifier_confidence"),
+            "analysts": routed_analysts,
+            "escalated": bool(state.get("escalated")),
+        }
     
-    print("\nVOTING BREAKDOWN:")
-    for answer, votes in vote_breakdown.items():
-        print(f"  Answer '{answer}': {votes} votes")
-    
-    print(f"\nFINAL SELECTED ANSWER: '{final_answer}'")
-    print("=" * 50)
+    logger.info("vote_breakdown=%s final_answer=%r", vote_breakdown, final_answer)
     
     return {
         "final_answer": final_answer,
@@ -0,0 +1,236 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from PIL import Image
+
+from src.core.graph_builder.main_graph import MainGraphBuilder
+from src.core.router import ANALYST_NODES
+from src.core.memory_manager import SessionMemory, question_thread_id
+from src.core.nodes.confidence_gate_node import ConfidenceGate
+from src.core.tracing import GraphTracer
+from src.utils.image_processing import ImageHandle, image_registry
+
+
+def setup_tools_registry() -> Dict[str, Any]:
+    """Create the default registry backed by DAM and the knowledge tools"""
+    # Imported lazily so that building a pipeline with custom tools does not load the models
+    from src.tools.knowledge_tools import arxiv, wikipedia
+    from src.tools.vqa_tool import vqa_tool, caption_image
+
+    return {
+        "vqa_tool": vqa_tool,
+        "arxiv": arxiv,
+        "wikipedia": wikipedia,
+        "caption_image": caption_image,
+    }
+
+
+class VQAPipeline:
+    """
+    Long-lived visual QA pipeline.
+
+    Owns a single tools registry and a single compiled main graph (with its
+    three analyst subgraphs), so the per-question cost is only graph execution.
+
+    Args:
+        tools_registry: Tools by name; the DAM/knowledge registry when None
+        callbacks: Callback handlers (e.g. a GraphTracer) attached to every run
+        voting_mode: "full" waits for all analysts, "streaming" exits once the vote is decided
+        routing: "all" runs every analyst, "adaptive" routes by question type (see AdaptiveRouter)
+        gate_min_score: Enables the ConfidenceGate with this minimum top candidate score
+        gate_min_margin: Minimum gap between the top two candidates for the gate
+        session_memory: Checkpoints every question under its own thread (see SessionMemory);
+            unfinished runs resume from their last step, finished ones return the stored answer
+    """
+
+    def __init__(self, tools_registry: Optional[Dict[str, Any]] = None,
+                 callbacks: Optional[List[BaseCallbackHandler]] = None,
+                 voting_mode: str = "full",
+                 routing: str = "all",
+                 gate_min_score: Optional[float] = None,
+                 gate_min_margin: float = 0.3,
+                 session_memory: Optional[SessionMemory] = None):
+        self.tools_registry = tools_registry if tools_registry is not None else setup_tools_registry()
+        self.callbacks = list(callbacks or [])
+        confidence_gate = None
+        if gate_min_score is not None:
+            confidence_gate = ConfidenceGate(self.tools_registry, gate_min_score, gate_min_margin)
+        self.voting_mode = voting_mode
+        self.routing = routing
+        self.confidence_gate = confidence_gate
+        self.session_memory = session_memory
+        checkpointer = session_memory.get_checkpointer() if session_memory else None
+        self.builder = MainGraphBuilder(self.tools_registry, voting_mode=voting_mode, routing=routing,
+                                        confidence_gate=confidence_gate, checkpointer=checkpointer)
+        self.graph = self.builder.create_main_workflow()
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "VQAPipeline":
+        """
+        Pipeline configured from MA_KNOWLEDGE_* environment variables.
+
+        MA_KNOWLEDGE_TRACE_PATH (GraphTracer JSONL), _VOTING_MODE, _ROUTING,
+        _GATE_MIN_SCORE / _GATE_MIN_MARGIN (unset score disables the gate) and
+        _CHECKPOINT_DB (SQLite checkpoints). Keyword arguments take precedence.
+        """
+        trace_path = os.getenv("MA_KNOWLEDGE_TRACE_PATH")
+        gate_min_score = os.getenv("MA_KNOWLEDGE_GATE_MIN_SCORE")
+        checkpoint_path = os.getenv("MA_KNOWLEDGE_CHECKPOINT_DB")
+        config = {
+            "callbacks": [GraphTracer(trace_path, keep_spans=False)] if trace_path else None,
+            "voting_mode": os.getenv("MA_KNOWLEDGE_VOTING_MODE", "full"),
+            "routing": os.getenv("MA_KNOWLEDGE_ROUTING", "all"),
+            "gate_min_score": float(gate_min_score) if gate_min_score else None,
+            "gate_min_margin": float(os.getenv("MA_KNOWLEDGE_GATE_MIN_MARGIN", 0.3)),
+            "session_memory": SessionMemory.sqlite(checkpoint_path) if checkpoint_path else None,
+        }
+        config.update(kwargs)
+        return cls(**config)
+
+    def _config(self, config: Optional[RunnableConfig] = None) -> RunnableConfig:
+        config = dict(config or {})
+        if self.callbacks:
+            config["callbacks"] = list(config.get("callbacks") or []) + self.callbacks
+        return config
+
+    @staticmethod
+    def _inputs(question: str, image: Union[str, Image.Image, ImageHandle]) -> Tuple[ImageHandle, Dict[str, Any]]:
+        """
+        Register the image and build graph inputs referencing it by image_id.
+
+        The graph state (and its checkpoints) never holds pixels this way; the
+        caller must keep the returned handle alive until the run ends, since
+        image_registry only holds it weakly.
+        """
+        handle = image_registry.register(image)
+        return handle, {"question": question, "image_id": handle.content_hash}
+
+    def answer(self, question: str, image: Union[str, Image.Image],
+               config: Optional[RunnableConfig] = None) -> str:
+        """Answer a single question about an image"""
+        if self.session_memory is not None:
+            return self._answer_checkpointed(question, image, config)
+        image, inputs = self._inputs(question, image)
+        result = self.graph.invoke(inputs, self._config(config))
+        return result["final_answer"]
+
+    def _answer_checkpointed(self, question: str, image: Union[str, Image.Image],
+                             config: Optional[RunnableConfig] = None) -> str:
+        # Also re-registers the image when resuming in a new process
+        image, inputs = self._inputs(question, image)
+        config, thread_id = self._thread_config(question, image, config)
+
+        # A duplicate question arriving meanwhile waits, then reads the stored answer
+        with self.session_memory.thread_lock(thread_id):
+            snapshot = self.graph.get_state(config)
+            if snapshot.values and not snapshot.next:
+                # Finished earlier (possibly by a previous process)
+                return snapshot.values["final_answer"]
+            # Resume an interrupted run from its last checkpoint instead of starting over
+            result = self.graph.invoke(None if snapshot.next else inputs, config)
+            self.session_memory.mark_finished(thread_id)
+        return result["final_answer"]
+
+    def run_settings(self, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """Settings that change the answer, including per-run ``configurable`` gate overrides"""
+        return {
+            "voting_mode": self.voting_mode,
+            "routing": self.routing,
+            "gate": self.confidence_gate.thresholds(config) if self.confidence_gate else None,
+        }
+
+    def _thread_config(self, question: str, image: ImageHandle,
+                       config: Optional[RunnableConfig] = None) -> Tuple[RunnableConfig, str]:
+        """Run config with the question's checkpoint thread_id (unless one is given)"""
+        config = self._config(config)
+        configurable = dict(config.get("configurable") or {})
+        if "thread_id" not in configurable:
+            configurable["thread_id"] = question_thread_id(question, image, self.run_settings(config))
+        thread_id = configurable["thread_id"]
+        config["configurable"] = configurable
+        return config, thread_id
+
+    def stream(self, question: str, image: Union[str, Image.Image, ImageHandle],
+               config: Optional[RunnableConfig] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a single question, yielding partial results as they arrive.
+
+        Yields ``{"event": "analyst", "analyst", "answer"}`` once per finished
+        analyst (only those not yet done when resuming a checkpointed run),
+        then ``{"event": "final", "answer", "voting_details"}``.
+        """
+        image, inputs = self._inputs(question, image)
+        if self.session_memory is None:
+            final = yield from self._stream_analysts(inputs, self._config(config))
+        else:
+            config, thread_id = self._thread_config(question, image, config)
+            # Held for the whole run: a duplicate question waits, then reads the stored answer
+            with self.session_memory.thread_lock(thread_id):
+                snapshot = self.graph.get_state(config)
+                if snapshot.values and not snapshot.next:
+                    yield {"event": "final", "answer": snapshot.values["final_answer"],
+                           "voting_details": snapshot.values.get("voting_details", {})}
+                    return
+                final = yield from self._stream_analysts(None if snapshot.next else inputs, config)
+                self.session_memory.mark_finished(thread_id)
+        yield {"event": "final", "answer": final.get("final_answer", ""),
+               "voting_details": final.get("voting_details", {})}
+
+    def _stream_analysts(self, inputs: Optional[Dict[str, Any]],
+                         config: RunnableConfig) -> Iterator[Dict[str, Any]]:
+        """Yield analyst events of one run and return its final update"""
+        final: Dict[str, Any] = {}
+        # "custom" carries StreamingVotingNode's per-analyst answers, "updates" the analyst subgraph outputs
+        for mode, chunk in self.graph.stream(inputs, config, stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                yield {"event": "analyst", **chunk}
+                continue
+            for node, update in chunk.items():
+                update = update or {}
+                if node in ANALYST_NODES:
+                    for result in update.get("results") or []:
+                        yield {"event": "analyst", "analyst": result.analyst, "answer": result.answer}
+                if "final_answer" in update:
+                    final = update
+        return final
+
+    async def aanswer(self, question: str, image: Union[str, Image.Image],
+                      config: Optional[RunnableConfig] = None) -> str:
+        """Async variant of answer, for use under an event loop"""
+        if self.session_memory is not None:
+            # Durable savers (SqliteSaver) are synchronous; nodes are sync as well
+            return await asyncio.to_thread(self._answer_checkpointed, question, image, config)
+        image, inputs = self._inputs(question, image)
+        result = await self.graph.ainvoke(inputs, self._config(config))
+        return result["final_answer"]
+
+    def answer_many(self,
+                    samples: Iterable[Tuple[str, Union[str, Image.Image]]],
+                    max_concurrency: Optional[int] = None) -> List[str]:
+        """
+        Answer many (question, image) pairs with the same compiled graph.
+
+        Args:
+            samples: Iterable of (question, image) pairs
+            max_concurrency: Maximum number of questions run in parallel
+
+        Returns:
+            Final answers in the same order as ``samples``
+        """
+        samples = list(samples)
+        if not samples:
+            return []
+
+        if self.session_memory is not None:
+            # Each question needs its own thread id and resume check
+            with ThreadPoolExecutor(max_workers=max_concurrency or 4) as pool:
+                return list(pool.map(lambda sample: self.answer(*sample), samples))
+
+        # handles keep the registered images alive until the batch ends
+        handles, inputs = zip(*(self._inputs(question, image) for question, image in samples))
+        config = self._config({"max_concurrency": max_concurrency} if max_concurrency else None)
+        results = self.graph.batch(list(inputs), config=config)
+        return [result["final_answer"] for result in results]
@@ -1,27 +1,89 @@
 from typing import Dict, Any, List
 from langgraph.types import Send
 from src.core.state import ViReAgentState
+from src.core.nodes.classifier_node import classify_question
+from src.utils.logging_utils import get_logger
 
-def route_to_analysts(state: ViReAgentState) -> Dict[str, Any]:
-    """Router using Send API for parallel distribution"""
-    sends = []
-    
-    for analyst in state["analysts"]:
-        # Create separate state for each analyst
+logger = get_logger("router")
+
+ANALYST_NODES = ["junior_analyst", "senior_analyst", "manager_analyst"]
+
+# Relative cost of one analyst run (LLM calls + tool calls on the benchmark set);
+# Senior/Manager also pay for arxiv/wikipedia retrieval
+ANALYST_COSTS = {
+    "junior_analyst": 1.0,
+    "senior_analyst": 3.0,
+    "manager_analyst": 4.0,
+}
+
+
+class AdaptiveRouter:
+    """
+    Cost-aware router using the Send API.
+
+    The question classifier decides the first wave: confidently perceptual
+    questions go to Junior only, everything else to all three analysts.
+    When Junior ran alone, its top VQA candidate score decides whether the
+    answer is accepted or Senior/Manager are brought in (escalation).
+
+    Args:
+        min_classifier_confidence: Below this the question goes to all analysts
+        escalation_threshold: Junior-only answers whose top candidate scores below this are escalated
+    """
+
+    def __init__(self, min_classifier_confidence: float = 0.75, escalation_threshold: float = 0.8):
+        self.min_classifier_confidence = min_classifier_confidence
+        self.escalation_threshold = escalation_threshold
+
+    def plan(self, question_type: str, confidence: float) -> List[str]:
+        """Cheapest analyst set expected to answer this kind of question"""
+        if question_type == "perceptual" and confidence >= self.min_classifier_confidence:
+            return ["junior_analyst"]
+        return list(ANALYST_NODES)
+
+    def classify_node(self, state: ViReAgentState) -> Dict[str, Any]:
+        """Classify the question and record the first-wave analysts"""
+        question_type, confidence = classify_question(state.get("question", ""))
+        routed = self.plan(question_type, confidence)
+        logger.debug("question_type=%s confidence=%.2f routed=%s", question_type, confidence, routed)
+        return {
+            "question_type": question_type,
+            "classifier_confidence": confidence,
+            "routed_analysts": routed,
+        }
+
+    def route_to_analysts(self, state: ViReAgentState) -> List[Send]:
+        """Send the analysts planned by classify_node (or escalate_node) in parallel"""
         analyst_state = {
             "question": state["question"],
-            "image": state["image"],
-            "analyst": analyst,
-            "number_of_steps": 0,
-            "messages": []
+            "image_id": state["image_id"],
+            "image_caption": state.get("image_caption", ""),
+            "messages": [],
+        }
+        targets = state["routed_analysts"]
+        if state.get("escalated"):
+            # Junior already answered in the first wave
+            targets = [name for name in targets if name != "junior_analyst"]
+        return [Send(name, analyst_state) for name in targets]
+
+    def junior_confident(self, state: ViReAgentState) -> bool:
+        candidates = (state.get("candidates") or {}).get("Junior") or []
+        return bool(candidates) and candidates[0].score >= self.escalation_threshold
+
+    def route_after_junior(self, state: ViReAgentState) -> str:
+        """Junior-only runs go to voting when confident, otherwise escalate"""
+        if len(state.get("routed_analysts", [])) > 1 or self.junior_confident(state):
+            return "voting"
+        return "escalate"
+
+    def escalate_node(self, state: ViReAgentState) -> Dict[str, Any]:
+        """Add Senior and Manager after a low-confidence Junior answer"""
+        logger.info("escalate question_type=%s question=%r", state.get("question_type"), state.get("question"))
+        return {
+            "routed_analysts": ["senior_analyst", "manager_analyst"],
+            "escalated": True,
         }
-        
-        # Send to appropriate subgraph
-        if "junior" in analyst.name.lower():
-            sends.append(Send("junior_subgraph", analyst_state))
-        elif "senior" in analyst.name.lower():
-            sends.append(Send("senior_subgraph", analyst_state))
-        elif "manager" in analyst.name.lower():
-            sends.append(Send("manager_subgraph", analyst_state))
-
-    return {"send": sends}
+
+    @staticmethod
+    def routing_cost(routed_analysts: List[str]) -> float:
+        return sum(ANALYST_COSTS[name] for name in routed_analysts)
@@ -1,50 +1,75 @@
-from typing import Annotated, List, Dict, Any
+from typing import Annotated, List, Dict, Any, TypedDict
 from langgraph.graph import MessagesState
-from src.agents.strategies.junior_agent import JuniorAgent
-from src.agents.strategies.senior_agent import SeniorAgent
-from src.agents.strategies.manager_agent import ManagerAgent
 import operator
 from PIL import Image
 from typing import Union
+from src.utils.image_processing import ImageHandle
+from src.tools.tool_results import AnalystAnswer, Candidate, KnowledgeSnippet
 
 class ViReAgentState(MessagesState):
     question: str
-    image: Union[str, Image.Image]
+    # Raw image input; callers that register the image (VQAPipeline) pass image_id instead
+    image: Union[str, Image.Image, ImageHandle]
+    # Key of the image in image_registry; analyst subgraphs only receive this
+    image_id: str
     image_caption: str
-    results: Annotated[List[Dict[str, str]], operator.add]
+    results: Annotated[List[AnalystAnswer], operator.add]
+    # VQA candidates per analyst name, used by adaptive routing
+    candidates: Annotated[Dict[str, List[Candidate]], operator.or_]
+    # Parsed VQA candidates, best first, from the confidence gate
+    vqa_candidates: List[Candidate]
+    question_type: str
+    classifier_confidence: float
+    routed_analysts: Annotated[List[str], operator.add]
+    escalated: bool
     final_answer: str
     voting_details: Dict[str, Any]
 
 
+# Analyst states carry references (image_id, analyst_name) resolved through
+# image_registry / get_analyst, so per-step copies and checkpoints stay small
+
 class ViReJuniorState(MessagesState):
     question: str
-    image: Union[str, Image.Image]
-    analyst: JuniorAgent
+    image_id: str
+    analyst_name: str
     image_caption: str
     number_of_steps: int
-    answer_candidate: str
-    results: Dict[str, str]
+    vqa_candidates: List[Candidate]
+    vqa_raw: str
+    results: List[AnalystAnswer]
 
 class ViReSeniorState(MessagesState):
     question: str
-    image: Union[str, Image.Image]
-    analyst: SeniorAgent
+    image_id: str
+    analyst_name: str
     image_caption: str
     number_of_steps: int
-    answer_candidate: str
-    KBs_Knowledge: Annotated[List[str], operator.add]
-    results: Dict[str, str]
+    vqa_candidates: List[Candidate]
+    vqa_raw: str
+    KBs_Knowledge: Annotated[List[KnowledgeSnippet], operator.add]
+    results: List[AnalystAnswer]
 class ViReManagerState(MessagesState):
     question: str
-    image: Union[str, Image.Image]
-    analyst: ManagerAgent
+    image_id: str
+    analyst_name: str
     image_caption: str
     number_of_steps: int
-    answer_candidate: str
-    KBs_Knowledge: Annotated[List[str], operator.add]
+    vqa_candidates: List[Candidate]
+    vqa_raw: str
+    KBs_Knowledge: Annotated[List[KnowledgeSnippet], operator.add]
     LLM_Knowledge: str
-    results: Dict[str, str]
+    results: List[AnalystAnswer]
+
+
+class AnalystInputState(TypedDict):
+    # What an analyst subgraph reads from the main state (not the image itself)
+    question: str
+    image_id: str
+    image_caption: str
 
 
-class SubgraphOutputState(MessagesState):
-    results: Dict[str, str]
\ No newline at end of file
+class SubgraphOutputState(TypedDict):
+    # The analyst transcript stays inside the subgraph
+    results: List[AnalystAnswer]
+    candidates: Dict[str, List[Candidate]]
\ No newline at end of file
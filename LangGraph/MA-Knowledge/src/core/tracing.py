@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Run metadata naming the owning analyst when a subgraph runs outside the
+# main graph's namespace (streaming voting invokes subgraphs itself)
+ANALYST_METADATA_KEY = "ma_knowledge_analyst"
+
+
+class GraphTracer(BaseCallbackHandler):
+    """
+    Callback handler tracing graph nodes, tool calls and LLM calls.
+
+    Attach it through the RunnableConfig (``config={"callbacks": [tracer]}``);
+    the config reaches call_agent_node, tool_node and final_reasoning_node, so
+    every span is attributed to its analyst through the LangGraph checkpoint
+    namespace. Spans are kept in memory and, when ``path`` is given, appended
+    to a JSONL file using OpenTelemetry span field names.
+
+    Args:
+        path: JSONL file to export finished spans to
+        keep_spans: Keep finished spans in memory for summary()
+    """
+
+    def __init__(self, path: Optional[str] = None, keep_spans: bool = True):
+        self.path = path
+        self.keep_spans = keep_spans
+        self.spans: List[Dict[str, Any]] = []
+        self._open: Dict[UUID, Dict[str, Any]] = {}
+        # run_id -> (root run, nearest traced ancestor) for every run seen, traced or not
+        self._lineage: Dict[UUID, tuple] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    # ---- span bookkeeping -------------------------------------------------
+
+    def _register(self, run_id: UUID, parent_run_id: Optional[UUID], traced: bool) -> tuple:
+        with self._lock:
+            if parent_run_id is None or parent_run_id not in self._lineage:
+                root, traced_parent = parent_run_id or run_id, None
+            else:
+                root, traced_parent = self._lineage[parent_run_id]
+            self._lineage[run_id] = (root, run_id if traced else traced_parent)
+            return root, traced_parent
+
+    def _start(self, kind: str, name: str, run_id: UUID, parent_run_id: Optional[UUID],
+               metadata: Optional[Dict[str, Any]], attributes: Optional[Dict[str, Any]] = None) -> None:
+        metadata = metadata or {}
+        namespace = metadata.get("langgraph_checkpoint_ns") or metadata.get("checkpoint_ns") or ""
+        owner = metadata.get(ANALYST_METADATA_KEY) or namespace.split(":", 1)[0]
+        analyst = owner if owner.endswith("_analyst") else None
+
+        root, traced_parent = self._register(run_id, parent_run_id, traced=True)
+        with self._lock:
+            self._open[run_id] = {
+                "trace_id": root.hex,
+                "span_id": run_id.hex,
+                "parent_span_id": traced_parent.hex if traced_parent else None,
+                "name": name,
+                "kind": kind,
+                "analyst": analyst,
+                "node": metadata.get("langgraph_node"),
+                "start_time_unix_nano": time.time_ns(),
+                "_start": time.perf_counter(),
+                "attributes": dict(attributes or {}),
+            }
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None,
+             attributes: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            span = self._open.pop(run_id, None)
+            self._lineage.pop(run_id, None)
+            if span is None:
+                return
+            span["duration_ms"] = (time.perf_counter() - span.pop("_start")) * 1000
+            span["end_time_unix_nano"] = time.time_ns()
+            span["status"] = {"code": "ERROR", "message": str(error)} if error else {"code": "OK"}
+            span["attributes"].update(attributes or {})
+            if self.keep_spans:
+                self.spans.append(span)
+            if self._file is not None:
+                self._file.write(json.dumps(span, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+    # ---- graph nodes ------------------------------------------------------
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None,
+                       tags=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        name = kwargs.get("name")
+        if parent_run_id is None:
+            self._start("graph", name or "graph", run_id, None, metadata)
+        elif node is not None and name == node:
+            self._start("node", node, run_id, parent_run_id, metadata)
+        elif name is not None and name == (metadata or {}).get(ANALYST_METADATA_KEY):
+            self._start("node", name, run_id, parent_run_id, metadata)
+        else:
+            self._register(run_id, parent_run_id, traced=False)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # ---- tools ------------------------------------------------------------
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None,
+                      tags=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "tool")
+        self._start("tool", name, run_id, parent_run_id, metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # ---- LLM calls --------------------------------------------------------
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None,
+                            tags=None, metadata=None, **kwargs):
+        self._start("llm", kwargs.get("name") or "chat_model", run_id, parent_run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None,
+                     tags=None, metadata=None, **kwargs):
+        self._start("llm", kwargs.get("name") or "llm", run_id, parent_run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id, attributes=_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # ---- reporting --------------------------------------------------------
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate kept spans per analyst (or 'main' for top-level nodes)"""
+        totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            if span["kind"] == "graph":
+                continue
+            bucket = totals[span["analyst"] or "main"]
+            if span["kind"] == "node" and span["name"] == span["analyst"]:
+                # The analyst subgraph itself: wall time, not a sum of inner nodes
+                bucket["wall_ms"] += span["duration_ms"]
+                continue
+            kind = span["kind"]
+            bucket[f"{kind}_calls"] += 1
+            bucket[f"{kind}_ms"] += span["duration_ms"]
+            for key in ("prompt_tokens", "completion_tokens", "cached_prompt_tokens"):
+                bucket[key] += span["attributes"].get(key, 0)
+        return {owner: dict(values) for owner, values in totals.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _token_usage(response) -> Dict[str, int]:
+    """Prompt/completion/cached token counts from an LLMResult"""
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0}
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                found = True
+                usage["prompt_tokens"] += metadata.get("input_tokens", 0)
+                usage["completion_tokens"] += metadata.get("output_tokens", 0)
+                usage["cached_prompt_tokens"] += (metadata.get("input_token_details") or {}).get("cache_read", 0)
+
+    if not found:
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        usage["prompt_tokens"] = token_usage.get("prompt_tokens", 0)
+        usage["completion_tokens"] = token_usage.get("completion_tokens", 0)
+        usage["cached_prompt_tokens"] = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    return usage
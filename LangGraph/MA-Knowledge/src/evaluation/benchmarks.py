@@ -0,0 +1,449 @@
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Union
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import MessagesState
+from PIL import Image
+
+from src.agents.base_agent import Analyst
+from src.agents.registry import get_analyst
+from src.core.graph_builder.main_graph import MainGraphBuilder
+from src.core.graph_builder.sub_graph import SubGraphBuilder
+from src.core.memory_manager import SessionMemory
+from src.core.pipeline import VQAPipeline, setup_tools_registry
+from src.core.tracing import GraphTracer
+from src.evaluation.fakes import FakeAnalystLLM, make_fake_tools_registry
+from src.evaluation.evaluator.accuracy import evaluate_accuracy
+from src.evaluation.runner import percentile
+from src.core.state import ViReAgentState, ViReManagerState
+from src.models.llm_provider import set_llm_factory
+from src.tools.tool_results import AnalystAnswer, Candidate
+from src.utils.image_processing import ImageHandle, image_registry
+from src.utils.logging_utils import set_log_level
+
+ANALYST_NODES = ("junior_analyst", "senior_analyst", "manager_analyst")
+
+# VQAv2/OK-VQA style questions with the VQA candidates the fake tool returns
+ROUTING_BENCHMARK_SET = [
+    {"question": "What color is the car?", "answer": "red",
+     "candidates": "Candidates: red(0.97), orange(0.40), maroon(0.10)"},
+    {"question": "How many people are in the photo?", "answer": "3",
+     "candidates": "Candidates: 3(0.91), 2(0.45), 4(0.30)"},
+    {"question": "Is there a dog in the picture?", "answer": "yes",
+     "candidates": "Candidates: yes(0.95), no(0.20)"},
+    {"question": "Where is the cat sitting?", "answer": "couch",
+     "candidates": "Candidates: couch(0.88), chair(0.35), bed(0.20)"},
+    {"question": "What is the man holding?", "answer": "umbrella",
+     "candidates": "Candidates: umbrella(0.62), cane(0.55), bag(0.20)"},
+    {"question": "What color is the bus on the left?", "answer": "yellow",
+     "candidates": "Candidates: yellow(0.93), white(0.30), orange(0.25)"},
+    {"question": "What shape is the sign?", "answer": "octagon",
+     "candidates": "Candidates: octagon(0.70), circle(0.50), square(0.10)"},
+    {"question": "What breed is this dog?", "answer": "beagle",
+     "candidates": "Candidates: beagle(0.66), basset(0.50), terrier(0.20)"},
+    {"question": "Why is the man wearing a helmet?", "answer": "safety",
+     "candidates": "Candidates: safety(0.80), protection(0.60), biking(0.40)"},
+    {"question": "Which country is this flag from?", "answer": "japan",
+     "candidates": "Candidates: japan(0.85), china(0.30), korea(0.20)"},
+    {"question": "What is this fruit known for?", "answer": "vitamin c",
+     "candidates": "Candidates: vitamin c(0.58), sweetness(0.40), juice(0.30)"},
+    {"question": "Who invented this device?", "answer": "edison",
+     "candidates": "Candidates: edison(0.72), tesla(0.45), bell(0.15)"},
+]
+
+
+def _node_durations(tracer: GraphTracer) -> Dict[str, List[float]]:
+    """Node span durations (seconds) keyed ``node`` or ``analyst/node``"""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    for span in tracer.spans:
+        if span["kind"] != "node":
+            continue
+        owner = span["analyst"]
+        key = span["name"] if owner in (None, span["name"]) else f"{owner}/{span['name']}"
+        durations[key].append(span["duration_ms"] / 1000)
+    return durations
+
+
+def _summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "max_ms": max(values) * 1000,
+    }
+
+
+def _use_fake_llm(answer: str, latency: float) -> None:
+    set_llm_factory(lambda temperature=0: FakeAnalystLLM(answer=answer, latency=latency))
+
+
+def benchmark_graph(num_questions: int = 20,
+                    llm_latency: float = 0.0,
+                    vqa_latency: float = 0.0,
+                    knowledge_latency: float = 0.0,
+                    warmup: int = 2,
+                    voting_mode: str = "full") -> Dict[str, Any]:
+    """
+    Drive MainGraphBuilder with deterministic fake backends.
+
+    Reports end-to-end latency, per-node time (caption, each analyst subgraph
+    and its inner nodes, voting), ReAct steps per analyst per question, the
+    GraphTracer per-analyst summary (LLM/tool calls and tokens) and peak
+    traced Python memory for one question.
+    """
+    _use_fake_llm("yes", llm_latency)
+    set_log_level("WARNING")
+    try:
+        graph = MainGraphBuilder(make_fake_tools_registry(
+            vqa_latency=vqa_latency, knowledge_latency=knowledge_latency),
+            voting_mode=voting_mode).create_main_workflow()
+        image = Image.new("RGB", (640, 480), (255, 0, 0))
+        inputs = {"question": "What color is the image?", "image": image}
+
+        for _ in range(warmup):
+            graph.invoke(inputs)
+
+        tracer = GraphTracer()
+        latencies = []
+        for _ in range(num_questions):
+            start = time.perf_counter()
+            result = graph.invoke(inputs, config={"callbacks": [tracer]})
+            latencies.append(time.perf_counter() - start)
+
+        # Memory pass is separate: tracemalloc slows allocation-heavy code
+        tracemalloc.start()
+        graph.invoke(inputs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        set_llm_factory(None)
+        set_log_level("INFO")
+
+    durations = _node_durations(tracer)
+    react_steps = {
+        analyst: len(durations.get(f"{analyst}/agent", [])) / num_questions
+        for analyst in ANALYST_NODES
+    }
+    return {
+        "config": {
+            "num_questions": num_questions,
+            "llm_latency_s": llm_latency,
+            "vqa_latency_s": vqa_latency,
+            "knowledge_latency_s": knowledge_latency,
+            "voting_mode": voting_mode,
+        },
+        "end_to_end": _summarize(latencies),
+        "throughput_qps": num_questions / sum(latencies) if latencies else 0.0,
+        "nodes": {key: _summarize(values) for key, values in sorted(durations.items())},
+        "react_steps_per_question": react_steps,
+        "analysts": tracer.summary(),
+        "peak_memory_mb": peak / (1024 * 1024),
+        "final_answer": result["final_answer"],
+    }
+
+
+def compare_routing(pipelines: Dict[str, VQAPipeline],
+                    samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Accuracy-vs-cost of routing strategies on the same samples.
+
+    For each named pipeline reports accuracy, mean latency, analysts run, LLM
+    and tool calls and tokens per question (from GraphTracer), and for adaptive
+    routing the question-type mix and escalation rate.
+    """
+    report = {}
+    for name, pipeline in pipelines.items():
+        tracer = GraphTracer()
+        predictions, latencies = [], []
+        analysts, escalated, gated, question_types = 0, 0, 0, defaultdict(int)
+        for sample in samples:
+            start = time.perf_counter()
+            result = pipeline.graph.invoke(
+                {"question": sample["question"], "image": sample["image"]},
+                pipeline._config({"callbacks": [tracer]}),
+            )
+            latencies.append(time.perf_counter() - start)
+            predictions.append(result["final_answer"])
+            routing = result.get("voting_details", {}).get("routing")
+            if result.get("voting_details", {}).get("confidence_gate"):
+                gated += 1
+            elif routing:
+                analysts += len(routing["analysts"])
+                escalated += routing["escalated"]
+                question_types[routing["question_type"]] += 1
+            else:
+                analysts += len(ANALYST_NODES)
+
+        totals = defaultdict(float)
+        for owner, values in tracer.summary().items():
+            for key in ("llm_calls", "tool_calls", "prompt_tokens", "completion_tokens"):
+                totals[key] += values.get(key, 0)
+        n = len(samples) or 1
+        report[name] = {
+            **evaluate_accuracy(predictions, [sample["answer"] for sample in samples]),
+            "latency_mean_s": sum(latencies) / n,
+            "analysts_per_question": analysts / n,
+            "llm_calls_per_question": totals["llm_calls"] / n,
+            "tool_calls_per_question": totals["tool_calls"] / n,
+            "tokens_per_question": (totals["prompt_tokens"] + totals["completion_tokens"]) / n,
+            "escalation_rate": escalated / n,
+            "gated_rate": gated / n,
+            "question_types": dict(question_types),
+        }
+    return report
+
+
+def benchmark_routing(llm_latency: float = 0.0,
+                      vqa_latency: float = 0.0,
+                      knowledge_latency: float = 0.0) -> Dict[str, Any]:
+    """
+    compare_routing on ROUTING_BENCHMARK_SET with fake backends.
+
+    The fake analysts answer with the top VQA candidate, so accuracy only
+    moves with routing decisions; use --routing-samples for real accuracy.
+    """
+    set_llm_factory(lambda temperature=0: FakeAnalystLLM(answer=None, latency=llm_latency))
+    set_log_level("WARNING")
+    try:
+        image = Image.new("RGB", (64, 64), (255, 0, 0))
+        samples = [{**sample, "image": image} for sample in ROUTING_BENCHMARK_SET]
+        registry = make_fake_tools_registry(
+            vqa_latency=vqa_latency, knowledge_latency=knowledge_latency,
+            candidates={sample["question"]: sample["candidates"] for sample in samples})
+        return compare_routing({
+            "all": VQAPipeline(registry, routing="all"),
+            "adaptive": VQAPipeline(registry, routing="adaptive"),
+            "adaptive_gated": VQAPipeline(registry, routing="adaptive", gate_min_score=0.9),
+        }, samples)
+    finally:
+        set_llm_factory(None)
+        set_log_level("INFO")
+
+
+def benchmark_pipeline_reuse(num_questions: int = 20) -> Dict[str, Any]:
+    """
+    Compare per-question cost of rebuilding the graph for every sample (old
+    ``run_visual_qa`` behaviour) against reusing one VQAPipeline.
+
+    Uses a fake LLM and fake VQA/knowledge tools with zero latency, so the
+    numbers isolate graph construction and orchestration overhead.
+    """
+    _use_fake_llm("yes", 0.0)
+    set_log_level("WARNING")
+    try:
+        image = Image.new("RGB", (64, 64), (255, 0, 0))
+        question = "What color is the image?"
+
+        start = time.perf_counter()
+        for _ in range(num_questions):
+            graph = MainGraphBuilder(make_fake_tools_registry()).create_main_workflow()
+            graph.invoke({"question": question, "image": image})
+        rebuild_total = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pipeline = VQAPipeline(make_fake_tools_registry())
+        for _ in range(num_questions):
+            pipeline.answer(question, image)
+        reuse_total = time.perf_counter() - start
+    finally:
+        set_llm_factory(None)
+        set_log_level("INFO")
+
+    rebuild_per_question = rebuild_total / num_questions
+    reuse_per_question = reuse_total / num_questions
+    return {
+        "num_questions": num_questions,
+        "rebuild_ms_per_question": rebuild_per_question * 1000,
+        "reuse_ms_per_question": reuse_per_question * 1000,
+        "saved_ms_per_question": (rebuild_per_question - reuse_per_question) * 1000,
+    }
+
+
+class _CountingSerializer(JsonPlusSerializer):
+    """Checkpoint serializer that counts what it writes"""
+
+    def __init__(self, pickle_fallback: bool = False):
+        super().__init__(pickle_fallback=pickle_fallback)
+        self.calls = 0
+        self.bytes = 0
+
+    def dumps_typed(self, obj):
+        type_, data = super().dumps_typed(obj)
+        self.calls += 1
+        self.bytes += len(data)
+        return type_, data
+
+
+class _LegacyAnalystState(ViReManagerState):
+    # Previous analyst state shape: the image and the analyst object themselves
+    image: Union[str, Image.Image, ImageHandle]
+    analyst: Analyst
+
+
+class _LegacyOutputState(MessagesState):
+    # Previous output shape: the transcript was copied back into the main state
+    results: List[AnalystAnswer]
+    candidates: Dict[str, List[Candidate]]
+
+
+class _LegacySubGraphBuilder(SubGraphBuilder):
+    """Analyst subgraphs with the previous state shape, the baseline of benchmark_state_memory"""
+
+    output_state = _LegacyOutputState
+
+    def create_agent_subgraph(self, state_class, analyst_name):
+        return super().create_agent_subgraph(_LegacyAnalystState, analyst_name)
+
+    def agent_step(self, state, config, analyst_name):
+        update = super().agent_step(state, config, analyst_name)
+        # The whole history was returned (and checkpointed) on every turn
+        return {**update, "messages": state["messages"] + update["messages"],
+                "analyst": get_analyst(analyst_name)}
+
+
+class _LegacyGraphBuilder(MainGraphBuilder):
+    """Main graph whose analysts receive the whole main state, image included"""
+
+    analyst_input_state = ViReAgentState
+
+    def __init__(self, tools_registry: Dict[str, Any], **kwargs):
+        super().__init__(tools_registry, **kwargs)
+        self.subgraph_builder = _LegacySubGraphBuilder(tools_registry)
+
+
+def _measure_state_memory(graph, serde: _CountingSerializer, images: List[Image.Image],
+                          question: str, legacy: bool, prefix: str) -> Dict[str, float]:
+    def run(i, image):
+        handle = image_registry.register(image)
+        inputs = {"question": question, "image_id": handle.content_hash}
+        if legacy:
+            inputs["image"] = image
+        graph.invoke(inputs, {"configurable": {"thread_id": f"{prefix}-{i}"}})
+
+    # Warm-up question, not counted
+    run(len(images) - 1, images[-1])
+    calls, written, peaks = [], [], []
+    for i, image in enumerate(images[:-1]):
+        serde.calls = serde.bytes = 0
+        tracemalloc.start()
+        run(i, image)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        calls.append(serde.calls)
+        written.append(serde.bytes)
+        peaks.append(peak)
+
+    num_questions = len(calls)
+    return {
+        "serialized_values_per_question": sum(calls) / num_questions,
+        "checkpoint_kb_per_question": sum(written) / num_questions / 1024,
+        "peak_memory_mb_per_question": sum(peaks) / num_questions / (1024 * 1024),
+    }
+
+
+def benchmark_state_memory(num_questions: int = 5,
+                           image_size: tuple = (640, 480)) -> Dict[str, Any]:
+    """
+    Per-question cost of the graph state under checkpointing, before and after
+    analysts carried references instead of objects.
+
+    Runs the full graph twice with an in-memory SqliteSaver (fake backends):
+    "before" with the previous state shape (PIL image and Analyst object in
+    the analyst state, the whole transcript returned every turn and copied
+    back to the main state; only checkpointable with pickle), "after" with
+    the current graph. Reports, per question, how many values and bytes were
+    serialized into checkpoints and the peak traced Python memory, and the
+    reduction of each. Every question uses a distinct image so nothing is
+    answered from a previous thread.
+    """
+    _use_fake_llm("yes", 0.0)
+    set_log_level("WARNING")
+    try:
+        registry = make_fake_tools_registry()
+        question = "What color is the image?"
+        # Noise compresses like a photo, unlike a flat colour
+        images = [Image.effect_noise(image_size, 32 + i).convert("RGB") for i in range(num_questions + 1)]
+
+        results = {}
+        for name, legacy in (("before", True), ("after", False)):
+            serde = _CountingSerializer(pickle_fallback=legacy)
+            memory = SessionMemory.sqlite(":memory:")
+            memory.checkpointer.serde = serde
+            builder_class = _LegacyGraphBuilder if legacy else MainGraphBuilder
+            graph = builder_class(registry, checkpointer=memory.get_checkpointer()).create_main_workflow()
+            results[name] = _measure_state_memory(graph, serde, images, question, legacy, name)
+    finally:
+        set_llm_factory(None)
+        set_log_level("INFO")
+
+    before, after = results["before"], results["after"]
+    return {
+        "num_questions": num_questions,
+        "image_size": list(image_size),
+        "before": before,
+        "after": after,
+        "reduction": {metric: before[metric] - after[metric] for metric in before},
+        "reduction_pct": {
+            metric: 100 * (before[metric] - after[metric]) / before[metric] if before[metric] else 0.0
+            for metric in before
+        },
+    }
+
+
+def run_benchmarks(num_questions: int = 20,
+                   llm_latency: float = 0.0,
+                   vqa_latency: float = 0.0,
+                   knowledge_latency: float = 0.0,
+                   output: Optional[str] = None,
+                   voting_mode: str = "full") -> Dict[str, Any]:
+    """Run every benchmark and optionally write the report as JSON"""
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "graph": benchmark_graph(num_questions, llm_latency, vqa_latency, knowledge_latency,
+                                 voting_mode=voting_mode),
+        "pipeline_reuse": benchmark_pipeline_reuse(num_questions),
+        "routing": benchmark_routing(llm_latency, vqa_latency, knowledge_latency),
+        "state_memory": benchmark_state_memory(),
+    }
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MA-Knowledge performance benchmarks (fake backends)")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per fake LLM call")
+    parser.add_argument("--vqa-latency", type=float, default=0.0, help="seconds per fake caption/VQA call")
+    parser.add_argument("--knowledge-latency", type=float, default=0.0, help="seconds per fake arxiv/wikipedia call")
+    parser.add_argument("--voting-mode", choices=["full", "streaming"], default="full")
+    parser.add_argument("--routing-samples", default=None,
+                        help="JSONL of {question, image, answer}: compare routing with the real models only")
+    parser.add_argument("--output", default=None, help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    if args.routing_samples:
+        with open(args.routing_samples, "r", encoding="utf-8") as f:
+            samples = [json.loads(line) for line in f if line.strip()]
+        registry = setup_tools_registry()
+        report = compare_routing({
+            "all": VQAPipeline(registry, routing="all"),
+            "adaptive": VQAPipeline(registry, routing="adaptive"),
+            "adaptive_gated": VQAPipeline(registry, routing="adaptive", gate_min_score=0.9),
+        }, samples)
+        print(json.dumps(report, indent=2))
+        raise SystemExit(0)
+
+    report = run_benchmarks(args.questions, args.llm_latency, args.vqa_latency,
+                            args.knowledge_latency, args.output, args.voting_mode)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,238 @@
+import glob
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Set
+
+from src.utils.image_processing import image_registry
+from src.utils.logging_utils import get_logger
+
+logger = get_logger("dataset")
+
+
+def _cached_info_dir(path: str, cache_dir: Optional[str]) -> Optional[str]:
+    # Latest prepared copy of the dataset in load_dataset's cache layout
+    from datasets.naming import camelcase_to_snakecase
+
+    if not cache_dir:
+        return None
+    namespace, _, name = path.rpartition("/")
+    folder = camelcase_to_snakecase(name)
+    if namespace:
+        folder = f"{namespace}___{folder}"
+    infos = glob.glob(os.path.join(cache_dir, folder, "*", "*", "*", "dataset_info.json"))
+    return os.path.dirname(max(infos, key=os.path.getmtime)) if infos else None
+
+
+def cached_split_files(path: str, split: str, cache_dir: Optional[str]) -> List[str]:
+    """Arrow files of a split prepared in cache_dir by load_dataset; empty if not cached"""
+    directory = _cached_info_dir(path, cache_dir)
+    if directory is None:
+        return []
+    with open(os.path.join(directory, "dataset_info.json"), "r", encoding="utf-8") as f:
+        dataset_name = json.load(f).get("dataset_name") or os.path.basename(os.path.dirname(directory))
+    prefix = os.path.join(directory, f"{dataset_name}-{split}")
+    return sorted(glob.glob(prefix + ".arrow") + glob.glob(prefix + "-*-of-*.arrow"))
+
+
+def stream_vqa_samples(path: str = "Erland/VQAv2-sample",
+                       split: str = "test",
+                       cache_dir: Optional[str] = "./DATA",
+                       streaming: Optional[bool] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a HF VQA split as runner samples, without materializing it.
+
+    With ``streaming=None`` a split already prepared in cache_dir (by a
+    previous ``load_dataset``) is read from its memory-mapped Arrow files
+    through ``to_iterable_dataset()``, without contacting the Hub; otherwise
+    the split is streamed from the Hub. True / False force one way.
+
+    Images are not decoded here (``Image(decode=False)``); samples carry the
+    encoded bytes and prefetch_images decodes them off the main thread.
+    Ids are stream positions, stable for a given split.
+    """
+    from datasets import Dataset, Image as ImageFeature, concatenate_datasets, load_dataset
+
+    files = [] if streaming else cached_split_files(path, split, cache_dir)
+    if files:
+        dataset = concatenate_datasets([Dataset.from_file(file) for file in files]).to_iterable_dataset()
+    elif streaming is False:
+        dataset = load_dataset(path, split=split, cache_dir=cache_dir).to_iterable_dataset()
+    else:
+        dataset = load_dataset(path, split=split, cache_dir=cache_dir, streaming=True)
+    dataset = dataset.cast_column("image", ImageFeature(decode=False))
+    for idx, sample in enumerate(dataset):
+        image = sample["image"]
+        yield {
+            "id": idx,
+            "question": sample["question"],
+            "image": image.get("bytes") or image.get("path"),
+            "answer": sample["multiple_choice_answer"],
+        }
+
+
+def dataset_size(path: str = "Erland/VQAv2-sample",
+                 split: str = "test",
+                 cache_dir: Optional[str] = "./DATA") -> Optional[int]:
+    """Number of rows in a split from the dataset info (no data download); None if unknown"""
+    from datasets import load_dataset_builder
+
+    directory = _cached_info_dir(path, cache_dir)
+    if directory is not None:
+        with open(os.path.join(directory, "dataset_info.json"), "r", encoding="utf-8") as f:
+            splits = json.load(f).get("splits") or {}
+        if split in splits:
+            return splits[split]["num_examples"]
+    try:
+        splits = load_dataset_builder(path, cache_dir=cache_dir).info.splits or {}
+        return splits[split].num_examples if split in splits else None
+    except Exception as e:
+        logger.warning("dataset_size_unknown path=%s split=%s error=%s", path, split, e)
+        return None
+
+
+def reservoir_sample(make_samples: Callable[[], Iterable[Dict[str, Any]]], k: int,
+                     seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """
+    Exactly k uniform samples (Algorithm R) from a stream of unknown length.
+
+    The first pass over ``make_samples()`` keeps only the chosen positions
+    (memory O(k) integers, no samples); a second pass yields the chosen rows
+    in stream order as they are read. The first pass reads the whole split,
+    so nothing is yielded before that: prefer shard_sample when the split
+    size is known.
+    """
+    rng = random.Random(seed)
+    reservoir: List[int] = []
+    for position, _ in enumerate(make_samples()):
+        if position < k:
+            reservoir.append(position)
+            continue
+        slot = rng.randint(0, position)
+        if slot < k:
+            reservoir[slot] = position
+    if not reservoir:
+        return
+
+    chosen: Set[int] = set(reservoir)
+    last = max(chosen)
+    for position, sample in enumerate(make_samples()):
+        if position in chosen:
+            yield sample
+        if position >= last:
+            return
+
+
+def _unit_hash(seed: int, sample_id: Any) -> float:
+    digest = hashlib.sha1(f"{seed}:{sample_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def shard_sample(samples: Iterable[Dict[str, Any]],
+                 rate: float = 1.0,
+                 seed: int = 42,
+                 num_shards: int = 1,
+                 shard_index: int = 0,
+                 limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Seeded streaming sampler, memory O(1).
+
+    A sample is kept when the hash of (seed, id) falls below ``rate``; the
+    kept samples are split across ``num_shards`` workers by the same hash.
+    Decisions depend only on the id, so a restarted or distributed run sees
+    exactly the same subset, and samples are yielded as they stream in.
+    """
+    kept = 0
+    for sample in samples:
+        h = _unit_hash(seed, sample["id"])
+        if h >= rate or int(h / rate * num_shards) != shard_index:
+            continue
+        yield sample
+        kept += 1
+        if limit is not None and kept >= limit:
+            return
+
+
+_END = object()
+
+
+def _decode(sample: Dict[str, Any]) -> Dict[str, Any]:
+    # The handle (decoded RGB + content hash) is what the pipeline registers again, for free
+    return {**sample, "image": image_registry.register(sample["image"])}
+
+
+def prefetch_images(samples: Iterable[Dict[str, Any]],
+                    max_workers: int = 4,
+                    buffer_size: int = 16) -> Iterator[Dict[str, Any]]:
+    """
+    Read samples and decode their images in the background, ``buffer_size`` ahead.
+
+    A reader thread pulls from ``samples`` (dataset I/O) and hands each image
+    to a decoding thread pool; samples are yielded in input order with
+    ``image`` replaced by a registered ImageHandle. At most ``buffer_size``
+    samples are held, so memory stays flat however long the stream is. A
+    sample whose image fails to decode is yielded unchanged; the pipeline
+    then reports the error.
+    """
+    ready: queue.Queue = queue.Queue(maxsize=max(2, buffer_size))
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+
+    def put(item) -> bool:
+        # Never block once the consumer is gone: nobody would drain the buffer
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for sample in samples:
+                if stop.is_set():
+                    break
+                try:
+                    future = executor.submit(_decode, sample)
+                except RuntimeError:
+                    # Pool shut down by the consumer between the check and the submit
+                    break
+                if not put((sample, future)):
+                    break
+        except Exception as e:
+            put((None, e))
+        finally:
+            put(_END)
+
+    threading.Thread(target=read, name="prefetch-reader", daemon=True).start()
+    try:
+        while True:
+            item = ready.get()
+            if item is _END:
+                return
+            sample, future = item
+            if sample is None:
+                raise future
+            yield _result(sample, future)
+    finally:
+        stop.set()
+        # Unblock a reader waiting on a full buffer; it exits at its next sample
+        while True:
+            try:
+                ready.get_nowait()
+            except queue.Empty:
+                break
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _result(sample: Dict[str, Any], future) -> Dict[str, Any]:
+    try:
+        return future.result()
+    except Exception as e:
+        logger.warning("prefetch_failed id=%s error=%s", sample.get("id"), e)
+        return sample
@@ -0,0 +1,118 @@
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import StructuredTool
+
+from src.utils.text_processing import parse_candidates
+
+
+class FakeAnalystLLM(BaseChatModel):
+    """
+    Deterministic chat model standing in for the LM Studio endpoint.
+
+    When tools are bound it requests every bound tool once, then stops calling
+    tools; without tools it answers with ``Answer: <answer>``. With
+    ``answer=None`` it answers with the top VQA candidate of its prompt.
+    """
+    answer: Optional[str] = "yes"
+    latency: float = 0.0
+    tool_names: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-analyst"
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any) -> "FakeAnalystLLM":
+        return self.model_copy(update={"tool_names": [t.name for t in tools]})
+
+    def _generate(self,
+                  messages: List[BaseMessage],
+                  stop: Optional[List[str]] = None,
+                  run_manager: Any = None,
+                  **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+
+        question = next(
+            (m.content.replace("question: ", "", 1) for m in messages if isinstance(m, HumanMessage)),
+            ""
+        )
+        already_called = any(isinstance(m, ToolMessage) for m in messages)
+
+        if self.tool_names and not already_called:
+            tool_calls = [
+                {"name": name, "args": _fake_tool_args(name, question), "id": f"call_{i}"}
+                for i, name in enumerate(self.tool_names)
+            ]
+            message = AIMessage(content="", tool_calls=tool_calls)
+        elif self.tool_names:
+            message = AIMessage(content="Done.")
+        else:
+            message = AIMessage(content=f"Answer: {self._final_answer(messages)}")
+
+        # Rough whitespace token counts so tracing/benchmarks see usage like a real server
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        completion_tokens = len(str(message.content).split())
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+    def _final_answer(self, messages: List[BaseMessage]) -> str:
+        if self.answer is not None:
+            return self.answer
+        # The last "Candidates:" line is the task's; earlier ones are prompt examples
+        prompt = "\n".join(str(m.content) for m in messages)
+        candidates = parse_candidates(prompt.rsplit("Candidates:", 1)[-1].split("\n", 1)[0])
+        return candidates[0][0] if candidates else "unanswerable"
+
+
+def _fake_tool_args(tool_name: str, question: str) -> Dict[str, Any]:
+    if tool_name == "vqa_tool":
+        return {"question": question}
+    return {"query": question}
+
+
+def make_fake_tools_registry(answer: str = "yes",
+                             vqa_latency: float = 0.0,
+                             knowledge_latency: float = 0.0,
+                             candidates: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Build a tools registry with the same names and signatures as the real one,
+    returning canned outputs after an optional simulated latency.
+
+    ``candidates`` maps a question to the VQA output returned for it.
+    """
+    def vqa(image: Any, question: str) -> str:
+        time.sleep(vqa_latency)
+        if candidates and question in candidates:
+            return candidates[question]
+        return f"Candidates: {answer}(0.98), no(0.40), maybe(0.10), unknown(0.05), unanswerable(0.01)"
+
+    def arxiv(query: str) -> str:
+        time.sleep(knowledge_latency)
+        return f"Published: 2020-01-01\nTitle: A study of {query}\nSummary: Background on {query}."
+
+    def wikipedia(query: str) -> str:
+        time.sleep(knowledge_latency)
+        return f"Page: {query}\nSummary: Encyclopedic background on {query}."
+
+    def caption_image(image: Any) -> str:
+        time.sleep(vqa_latency)
+        return "A photo used for benchmarking."
+
+    return {
+        "vqa_tool": StructuredTool.from_function(
+            vqa, name="vqa_tool", description="return the candidate answer with probability of the question"),
+        "arxiv": StructuredTool.from_function(
+            arxiv, name="arxiv", description="Search arXiv for papers"),
+        "wikipedia": StructuredTool.from_function(
+            wikipedia, name="wikipedia", description="Search for information on a given topic using Wikipedia"),
+        "caption_image": caption_image,
+    }
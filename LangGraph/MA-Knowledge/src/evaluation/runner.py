@@ -0,0 +1,178 @@
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+from src.core.nodes.confidence_gate_node import MIN_MARGIN_KEY, MIN_SCORE_KEY
+from src.core.pipeline import VQAPipeline
+from src.evaluation.dataset import prefetch_images
+from src.evaluation.evaluator.accuracy import evaluate_accuracy
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class EvaluationRunner:
+    """
+    Concurrent, resumable evaluation over (question, image, answer) samples.
+
+    Each sample is a dict with ``id``, ``question``, ``image`` and ``answer``.
+    Predictions are appended to a JSONL file as soon as they finish, and samples
+    already present in that file are skipped, so a crashed run can be restarted
+    with the same arguments.
+
+    ``gate_min_score`` / ``gate_min_margin`` override the pipeline's
+    ConfidenceGate thresholds for this run (the gate must be enabled).
+
+    Samples may be a lazy stream (see src.evaluation.dataset): they are pulled
+    off the event loop, and with ``prefetch_workers`` their images are decoded
+    ``prefetch_buffer`` samples ahead in a thread pool, so workers do not wait
+    on dataset I/O and memory does not grow with the number of samples.
+    """
+
+    def __init__(self, pipeline: VQAPipeline, results_path: str, max_concurrency: int = 4,
+                 gate_min_score: Optional[float] = None, gate_min_margin: Optional[float] = None,
+                 prefetch_workers: int = 0, prefetch_buffer: Optional[int] = None):
+        self.pipeline = pipeline
+        self.results_path = results_path
+        self.max_concurrency = max(1, max_concurrency)
+        self.prefetch_workers = prefetch_workers
+        self.prefetch_buffer = prefetch_buffer or self.max_concurrency * 4
+        configurable = {}
+        if gate_min_score is not None:
+            configurable[MIN_SCORE_KEY] = gate_min_score
+        if gate_min_margin is not None:
+            configurable[MIN_MARGIN_KEY] = gate_min_margin
+        self.config = {"configurable": configurable} if configurable else None
+
+    def load_results(self) -> List[Dict[str, Any]]:
+        """Read successful records from the results file, ignoring a torn last line"""
+        if not os.path.exists(self.results_path):
+            return []
+
+        records = []
+        with open(self.results_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "error" not in record:
+                    records.append(record)
+        return records
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.results_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    async def _worker(self, queue: "asyncio.Queue", out, latencies: List[float],
+                      input_wait: List[float]) -> None:
+        while True:
+            wait_start = time.perf_counter()
+            sample = await queue.get()
+            # Idle time waiting for the next sample (dataset I/O not keeping up)
+            input_wait.append(time.perf_counter() - wait_start)
+            try:
+                record = {
+                    "id": sample["id"],
+                    "question": sample["question"],
+                    "reference": sample["answer"],
+                }
+                start = time.perf_counter()
+                try:
+                    record["prediction"] = await self.pipeline.aanswer(
+                        sample["question"], sample["image"], self.config)
+                except Exception as e:
+                    record["error"] = str(e)
+                record["latency_s"] = time.perf_counter() - start
+
+                if "error" not in record:
+                    latencies.append(record["latency_s"])
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            finally:
+                queue.task_done()
+
+    async def arun(self, samples: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Evaluate all samples not yet in the results file and return a report"""
+        done_ids: Set[Any] = {record["id"] for record in self.load_results()}
+
+        directory = os.path.dirname(self.results_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency * 2)
+        latencies: List[float] = []
+        input_wait: List[float] = []
+        submitted = 0
+
+        # Skip finished samples before their images are decoded
+        pending = (sample for sample in samples if sample["id"] not in done_ids)
+        if self.prefetch_workers:
+            pending = prefetch_images(pending, self.prefetch_workers, self.prefetch_buffer)
+
+        start = time.perf_counter()
+        read: Optional[asyncio.Future] = None
+        with open(self.results_path, "a", encoding="utf-8") as out:
+            # Terminate a line torn by a crash so the next record starts cleanly
+            if out.tell() > 0 and not self._ends_with_newline():
+                out.write("\n")
+
+            workers = [
+                asyncio.create_task(self._worker(queue, out, latencies, input_wait))
+                for _ in range(self.max_concurrency)
+            ]
+            try:
+                while True:
+                    # Dataset reads and decoding must not block the event loop
+                    # (shielded: cancelling the run must not lose track of a read in flight)
+                    read = asyncio.ensure_future(asyncio.to_thread(next, pending, None))
+                    sample = await asyncio.shield(read)
+                    if sample is None:
+                        break
+                    await queue.put(sample)
+                    submitted += 1
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                # A read interrupted by cancellation is still running in its thread;
+                # closing the generator before it returns would fail
+                if read is not None and not read.done():
+                    await asyncio.wait({read})
+                # Stops the prefetch reader and pool
+                pending.close()
+        elapsed = time.perf_counter() - start
+
+        records = self.load_results()
+        accuracy = evaluate_accuracy(
+            [record["prediction"] for record in records],
+            [record["reference"] for record in records],
+        )
+
+        return {
+            **accuracy,
+            "num_evaluated": len(records),
+            "num_skipped": len(done_ids),
+            "num_submitted": submitted,
+            "num_failed": submitted - len(latencies),
+            "elapsed_s": elapsed,
+            "throughput_qps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+            "latency_p50_s": percentile(latencies, 50),
+            "latency_p95_s": percentile(latencies, 95),
+            "input_wait_s": sum(input_wait),
+        }
+
+    def run(self, samples: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Synchronous wrapper around arun"""
+        return asyncio.run(self.arun(samples))
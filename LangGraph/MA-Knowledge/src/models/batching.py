@@ -0,0 +1,119 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+MAX_BATCH_SIZE_ENV = "MA_KNOWLEDGE_BATCH_SIZE"
+MAX_WAIT_MS_ENV = "MA_KNOWLEDGE_BATCH_WAIT_MS"
+
+
+class MicroBatcher:
+    """
+    Collect concurrent requests into batches for a single model worker.
+
+    Callers (e.g. the parallel analyst subgraphs) block on submit(); a
+    background thread waits up to ``max_wait_ms`` after the first queued
+    request, takes at most ``max_batch_size`` requests, groups them by key
+    (requests with different generation settings cannot share a batch) and
+    resolves every caller's future from one ``batch_fn`` call per group.
+
+    Args:
+        batch_fn: Takes a list of payloads and returns results in the same order
+        max_batch_size: Maximum number of requests per batch
+        max_wait_ms: How long to wait for more requests once one is queued
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.batch_fn = batch_fn
+        self._queue: "queue.Queue[Tuple[Hashable, Any, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.configure(max_batch_size, max_wait_ms)
+        self.reset_stats()
+
+    def configure(self, max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None) -> None:
+        self.max_batch_size = max(1, int(max_batch_size or os.getenv(MAX_BATCH_SIZE_ENV, 8)))
+        self.max_wait_ms = float(max_wait_ms if max_wait_ms is not None else os.getenv(MAX_WAIT_MS_ENV, 10))
+
+    def submit(self, payload: Any, key: Hashable = None) -> Future:
+        """Queue one request and return a future for its result"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((key, payload, future))
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+        return future
+
+    def __call__(self, payload: Any, key: Hashable = None) -> Any:
+        return self.submit(payload, key).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and batch occupancy metrics since the last reset"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch_size"] = stats["batched_requests"] / batches if batches else 0.0
+        stats["avg_occupancy"] = stats["avg_batch_size"] / self.max_batch_size
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._stats = {
+                "requests": 0,
+                "batches": 0,
+                "batched_requests": 0,
+                "max_queue_depth": 0,
+                "max_batch_size_seen": 0,
+            }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[Tuple[Hashable, Any, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+
+            groups: Dict[Hashable, List[Tuple[Any, Future]]] = {}
+            for key, payload, future in batch:
+                groups.setdefault(key, []).append((payload, future))
+
+            for items in groups.values():
+                with self._stats_lock:
+                    self._stats["batches"] += 1
+                    self._stats["batched_requests"] += len(items)
+                    self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], len(items))
+                try:
+                    results = list(self.batch_fn([payload for payload, _ in items]))
+                    if len(results) != len(items):
+                        # Otherwise the callers without a result would wait forever
+                        raise ValueError(f"batch_fn returned {len(results)} results for {len(items)} requests")
+                    for (_, future), result in zip(items, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
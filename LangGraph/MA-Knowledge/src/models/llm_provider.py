@@ -1,26 +1,165 @@
+import os
+import threading
 from langchain_openai import ChatOpenAI
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Callable, Dict, Tuple
 from pydantic import SecretStr
+import httpx
 
+DEFAULT_BASE_URL = os.getenv("MA_KNOWLEDGE_LLM_BASE_URL", "http://127.0.0.1:1234/v1")
+DEFAULT_MODEL = os.getenv("MA_KNOWLEDGE_LLM_MODEL")
 
-def get_llm(with_tools: Optional[List[Any]] = None, temperature: float = 0):
+# Optional override used by benchmarks/tests to swap in a fake chat model
+_llm_factory: Optional[Callable[..., Any]] = None
+
+
+class PooledHTTPClients:
+    """
+    One keep-alive httpx connection pool (sync + async) shared by every
+    ChatOpenAI client, with counters for requests and newly opened connections.
+
+    Pool limits come from MA_KNOWLEDGE_LLM_MAX_CONNECTIONS,
+    MA_KNOWLEDGE_LLM_MAX_KEEPALIVE and MA_KNOWLEDGE_LLM_KEEPALIVE_EXPIRY.
+    """
+
+    def __init__(self):
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("MA_KNOWLEDGE_LLM_MAX_CONNECTIONS", 32)),
+            max_keepalive_connections=int(os.getenv("MA_KNOWLEDGE_LLM_MAX_KEEPALIVE", 16)),
+            keepalive_expiry=float(os.getenv("MA_KNOWLEDGE_LLM_KEEPALIVE_EXPIRY", 30)),
+        )
+        self._sync: Optional[httpx.Client] = None
+        self._async: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    # httpcore reports connection lifecycle through the "trace" request extension
+    def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.new_connections += 1
+
+    async def _atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._trace(event_name, info)
+
+    def _on_request(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self._trace
+        with self._lock:
+            self.requests += 1
+
+    async def _aon_request(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self._atrace
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync is None:
+                self._sync = httpx.Client(limits=self.limits, event_hooks={"request": [self._on_request]})
+            return self._sync
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async is None:
+                self._async = httpx.AsyncClient(limits=self.limits, event_hooks={"request": [self._aon_request]})
+            return self._async
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests, new_connections = self.requests, self.new_connections
+        reused = max(0, requests - new_connections)
+        return {
+            "http_requests": requests,
+            "new_connections": new_connections,
+            "reused_connections": reused,
+            "connection_reuse_ratio": reused / requests if requests else 0.0,
+        }
+
+
+http_clients = PooledHTTPClients()
+
+_base_clients: Dict[Tuple[str, Optional[str], float], ChatOpenAI] = {}
+_bound_clients: Dict[Tuple[Any, ...], Any] = {}
+_clients_lock = threading.Lock()
+_client_stats = {"client_cache_hits": 0, "client_cache_misses": 0}
+
+
+def set_llm_factory(factory: Optional[Callable[..., Any]]) -> None:
     """
-    Factory function to create ChatOpenAI instance with consistent configuration
-    
+    Override the chat model created by get_llm.
+
+    Args:
+        factory: Callable taking ``temperature`` and returning a chat model,
+            or None to restore the default ChatOpenAI client
+    """
+    global _llm_factory
+    _llm_factory = factory
+
+
+def _get_base_client(base_url: str, model: Optional[str], temperature: float) -> ChatOpenAI:
+    key = (base_url, model, temperature)
+    with _clients_lock:
+        client = _base_clients.get(key)
+        if client is not None:
+            _client_stats["client_cache_hits"] += 1
+            return client
+
+        _client_stats["client_cache_misses"] += 1
+        kwargs = {"model": model} if model else {}
+        client = ChatOpenAI(
+            base_url=base_url,
+            temperature=temperature,
+            api_key=SecretStr("lm_studio"),
+            http_client=http_clients.sync_client,
+            http_async_client=http_clients.async_client,
+            **kwargs
+        )
+        _base_clients[key] = client
+        return client
+
+
+def get_llm(with_tools: Optional[List[Any]] = None, temperature: float = 0,
+            base_url: str = DEFAULT_BASE_URL, model: Optional[str] = DEFAULT_MODEL):
+    """
+    Factory function returning a cached ChatOpenAI instance with consistent configuration
+
+    Base clients are cached per (base_url, model, temperature) and share one
+    pooled HTTP client; tool-bound variants are cached per tool set.
+
     Args:
         with_tools: List of tools to bind to the LLM
         temperature: Temperature setting for the LLM
-        
+        base_url: OpenAI-compatible endpoint
+        model: Model name; the server default when None
+
     Returns:
         ChatOpenAI instance, optionally bound with tools
     """
-    llm = ChatOpenAI(
-        base_url="http://127.0.0.1:1234/v1",
-        temperature=temperature,
-        api_key=SecretStr("lm_studio")
-    )
-    
-    if with_tools:
-        llm = llm.bind_tools(with_tools)
-    
-    return llm
\ No newline at end of file
+    if _llm_factory is not None:
+        llm = _llm_factory(temperature=temperature)
+        return llm.bind_tools(with_tools) if with_tools else llm
+
+    llm = _get_base_client(base_url, model, temperature)
+    if not with_tools:
+        return llm
+
+    key = (base_url, model, temperature) + tuple((tool.name, id(tool)) for tool in with_tools)
+    with _clients_lock:
+        bound = _bound_clients.get(key)
+        if bound is None:
+            bound = llm.bind_tools(with_tools)
+            _bound_clients[key] = bound
+    return bound
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    """Client cache and HTTP connection reuse statistics"""
+    with _clients_lock:
+        stats = {
+            **_client_stats,
+            "base_clients": len(_base_clients),
+            "bound_clients": len(_bound_clients),
+        }
+    return {**stats, **http_clients.stats()}
@@ -0,0 +1,229 @@
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+# Environment overrides, so CPU-only boxes and CI can switch without code changes
+DEVICE_ENV = "MA_KNOWLEDGE_DEVICE"
+DTYPE_ENV = "MA_KNOWLEDGE_DTYPE"
+BACKEND_ENV = "MA_KNOWLEDGE_MODEL_BACKEND"
+
+
+class StubDAM:
+    """
+    Lightweight stand-in for the describe-anything model.
+
+    Returns canned, well-formed outputs instantly so the graph can be imported
+    and exercised without torch, transformers or a GPU.
+    """
+
+    def __init__(self, candidates: str = "yes(0.50), no(0.30), unknown(0.10), maybe(0.05), unanswerable(0.05)",
+                 caption: str = "An image."):
+        self.candidates = candidates
+        self.caption = caption
+
+    def get_description(self, image, mask, prompt: str, **kwargs) -> str:
+        if "Candidates:" in prompt:
+            return f"Candidates: {self.candidates}"
+        return self.caption
+
+    def get_description_batch(self, images, masks, prompts, **kwargs):
+        return [self.get_description(image, mask, prompt, **kwargs)
+                for image, mask, prompt in zip(images, masks, prompts)]
+
+
+class BatchedDAM:
+    """
+    Adds a padded ``get_description_batch`` to the describe-anything model.
+
+    DAM's own ``get_description`` runs one prompt per ``generate`` call. Here
+    each request is prepared the same way (conversation prompt, image + mask
+    tensors for both crops), the prompts are left-padded to a common length,
+    the image tensors are stacked along the batch dimension and a single
+    ``generate`` call decodes every request; outputs are split per row.
+    Everything else is delegated to the wrapped model.
+    """
+
+    def __init__(self, dam):
+        self.dam = dam
+        # Helpers imported by DAM's remote code (tokenizer_image_token, conv_templates, ...)
+        self._helpers = sys.modules[type(dam).__module__]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.dam, name)
+
+    def get_description(self, image, mask, prompt: str, **kwargs) -> str:
+        return self.dam.get_description(image, mask, prompt, **kwargs)
+
+    def _image_tensor(self, image, mask):
+        import torch
+
+        crop_mode, crop_mode2 = self.dam.prompt_mode.split("+")
+        tensors = self.dam.get_image_tensor(image, mask, crop_mode=crop_mode, crop_mode2=crop_mode2)
+        # Full image and focal crop, each with its mask channel, as in get_description
+        return torch.cat(tensors, dim=1) if isinstance(tensors, (tuple, list)) else tensors
+
+    def _stop_str(self) -> Optional[str]:
+        conv_templates = getattr(self._helpers, "conv_templates", None)
+        if conv_templates is None:
+            return None
+        conv = conv_templates[self.dam.conv_mode]
+        two = getattr(getattr(self._helpers, "SeparatorStyle", None), "TWO", None)
+        return conv.sep2 if conv.sep_style == two else conv.sep
+
+    def get_description_batch(self, images, masks, prompts, streaming: bool = False,
+                              temperature: float = 0.2, top_p: float = 0.5, num_beams: int = 1,
+                              max_new_tokens: int = 512, **kwargs) -> List[str]:
+        if len(prompts) == 1:
+            return [self.get_description(images[0], masks[0], prompts[0], streaming=streaming,
+                                         temperature=temperature, top_p=top_p, num_beams=num_beams,
+                                         max_new_tokens=max_new_tokens, **kwargs)]
+
+        import torch
+
+        tokenizer = self.dam.tokenizer
+        device = self.dam.model.device
+        input_ids = [
+            self._helpers.tokenizer_image_token(
+                self.dam.get_prompt(prompt), tokenizer, self._helpers.IMAGE_TOKEN_INDEX, return_tensors="pt")
+            for prompt in prompts
+        ]
+
+        # Left padding: every row ends at the same position, where generation starts
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        length = max(len(ids) for ids in input_ids)
+        padded = torch.full((len(input_ids), length), pad_id, dtype=input_ids[0].dtype)
+        attention_mask = torch.zeros((len(input_ids), length), dtype=torch.long)
+        for row, ids in enumerate(input_ids):
+            padded[row, length - len(ids):] = ids
+            attention_mask[row, length - len(ids):] = 1
+
+        image_tensor = torch.cat([self._image_tensor(image, mask) for image, mask in zip(images, masks)], dim=0)
+
+        with torch.inference_mode():
+            output_ids = self.dam.model.generate(
+                padded.to(device),
+                attention_mask=attention_mask.to(device),
+                images=[image_tensor],
+                do_sample=temperature > 0,
+                temperature=temperature,
+                top_p=top_p,
+                num_beams=num_beams,
+                max_new_tokens=max_new_tokens,
+                pad_token_id=pad_id,
+                use_cache=True,
+                **kwargs,
+            )
+
+        stop_str = self._stop_str()
+        outputs = []
+        for text in tokenizer.batch_decode(output_ids, skip_special_tokens=True):
+            text = text.strip()
+            if stop_str and stop_str in text:
+                text = text[:text.index(stop_str)].strip()
+            outputs.append(text)
+        return outputs
+
+
+class ModelRegistry:
+    """
+    Registry of heavy model backends that are loaded on first use.
+
+    Args:
+        device: Torch device string ("cuda", "cuda:1", "cpu"); defaults to
+            cuda when available, else cpu
+        dtype: Torch dtype name ("float16", "bfloat16", "float32"); defaults to
+            float16 on GPU and float32 on CPU
+        backend: "real" to load the actual models, "stub" to use registered stubs
+    """
+
+    def __init__(self, device: Optional[str] = None, dtype: Optional[str] = None,
+                 backend: Optional[str] = None):
+        self._loaders: Dict[str, Callable[["ModelRegistry"], Any]] = {}
+        self._stubs: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.configure(device=device, dtype=dtype, backend=backend)
+
+    def configure(self, device: Optional[str] = None, dtype: Optional[str] = None,
+                  backend: Optional[str] = None) -> None:
+        """Change loading settings; already loaded models are dropped"""
+        with self._lock:
+            self.device = device or os.getenv(DEVICE_ENV)
+            self.dtype = dtype or os.getenv(DTYPE_ENV)
+            self.backend = backend or os.getenv(BACKEND_ENV, "real")
+            self._models.clear()
+
+    def register(self, name: str, loader: Callable[["ModelRegistry"], Any],
+                 stub: Optional[Callable[[], Any]] = None) -> None:
+        """Register a loader (called with this registry) and an optional stub factory"""
+        self._loaders[name] = loader
+        if stub is not None:
+            self._stubs[name] = stub
+
+    def get(self, name: str) -> Any:
+        """Return the model registered under name, loading it on first call"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if name not in self._models:
+                if name not in self._loaders:
+                    raise KeyError(f"Unknown model: {name}")
+                if self.backend == "stub":
+                    if name not in self._stubs:
+                        raise KeyError(f"No stub registered for model: {name}")
+                    self._models[name] = self._stubs[name]()
+                else:
+                    self._models[name] = self._loaders[name](self)
+            return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def unload(self, name: Optional[str] = None) -> None:
+        """Drop one (or every) loaded model so it can be garbage collected"""
+        with self._lock:
+            if name is None:
+                self._models.clear()
+            else:
+                self._models.pop(name, None)
+
+    def resolve_device(self):
+        import torch
+
+        if self.device:
+            return torch.device(self.device)
+        return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    def resolve_dtype(self):
+        import torch
+
+        if self.dtype:
+            return getattr(torch, self.dtype.replace("torch.", ""))
+        return torch.float16 if self.resolve_device().type == "cuda" else torch.float32
+
+
+def _load_dam(registry: ModelRegistry):
+    from transformers import AutoModel
+
+    model = AutoModel.from_pretrained(
+        'nvidia/DAM-3B-Self-Contained',
+        trust_remote_code=True,
+        torch_dtype=registry.resolve_dtype()
+    ).to(registry.resolve_device())
+    return BatchedDAM(model.init_dam(conv_mode='v1', prompt_mode='full+focal_crop'))
+
+
+def _load_sam(registry: ModelRegistry):
+    from transformers import SamModel, SamProcessor
+
+    sam_model = SamModel.from_pretrained("facebook/sam-vit-base").to(registry.resolve_device())
+    sam_processor = SamProcessor.from_pretrained("facebook/sam-vit-base")
+    return sam_model, sam_processor
+
+
+model_registry = ModelRegistry()
+model_registry.register("dam", _load_dam, stub=StubDAM)
+model_registry.register("sam", _load_sam)
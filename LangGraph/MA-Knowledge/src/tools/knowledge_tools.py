@@ -1,3 +1,4 @@
+from typing import Iterable, Dict, Any
 from langchain_community.tools import (
     ArxivQueryRun,
     WikipediaQueryRun,
@@ -6,27 +7,60 @@ from langchain_community.utilities import (
     ArxivAPIWrapper,
     WikipediaAPIWrapper,
 )
+from src.tools.tool_cache import SQLiteToolCache, cached_tool
+from src.utils.logging_utils import get_logger
+
+logger = get_logger("knowledge_tools")
 
 arxiv_wrapper = ArxivAPIWrapper(
-    top_k_results=2, 
+    top_k_results=2,
     arxiv_search=None,
     arxiv_exceptions=None
 )
-arxiv = ArxivQueryRun(api_wrapper=arxiv_wrapper)
 
 wikipedia_wrapper = WikipediaAPIWrapper(top_k_results=2, wiki_client=None)
-wikipedia = WikipediaQueryRun(
-    api_wrapper=wikipedia_wrapper,
-    description="Search for information on a given topic using Wikipedia"
+
+# Results are cached on disk; see src/tools/tool_cache.py for TTL, size and offline settings
+knowledge_cache = SQLiteToolCache()
+
+arxiv = cached_tool(ArxivQueryRun(api_wrapper=arxiv_wrapper), knowledge_cache)
+wikipedia = cached_tool(
+    WikipediaQueryRun(
+        api_wrapper=wikipedia_wrapper,
+        description="Search for information on a given topic using Wikipedia"
+    ),
+    knowledge_cache
 )
 
 
 def search_arxiv(query: str) -> str:
     """Search for information on a given topic using Arxiv"""
-    return arxiv.run(query)
+    return arxiv.invoke({"query": query})
 
 def search_wikipedia(query: str) -> str:
     """Search for information on a given topic using Wikipedia"""
-    return wikipedia.invoke(query)
+    return wikipedia.invoke({"query": query})
+
+
+def warm_cache(queries: Iterable[str]) -> Dict[str, Any]:
+    """Fetch every query from arxiv and wikipedia so later runs hit the cache"""
+    failures = 0
+    for query in queries:
+        query = query.strip()
+        if not query:
+            continue
+        for tool in (arxiv, wikipedia):
+            try:
+                tool.invoke({"query": query})
+            except Exception as e:
+                failures += 1
+                logger.warning("warm_failed tool=%s query=%r error=%s", tool.name, query, e)
+    return {**knowledge_cache.stats(), "failures": failures}
+
 
+if __name__ == "__main__":
+    import sys
 
+    # python -m src.tools.knowledge_tools queries.txt  (one query per line)
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        print(warm_cache(f))
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool
+
+CACHE_PATH_ENV = "MA_KNOWLEDGE_TOOL_CACHE"
+CACHE_TTL_ENV = "MA_KNOWLEDGE_TOOL_CACHE_TTL"
+CACHE_MAX_ENTRIES_ENV = "MA_KNOWLEDGE_TOOL_CACHE_MAX_ENTRIES"
+OFFLINE_ENV = "MA_KNOWLEDGE_OFFLINE"
+
+# Error / empty results the arxiv and wikipedia wrappers return instead of raising
+UNCACHEABLE_PREFIXES = (
+    "Arxiv exception:",
+    "No good Arxiv Result",
+    "No good Wikipedia Search Result",
+)
+
+
+class ToolCacheMiss(LookupError):
+    """Raised in offline mode when a tool result is not in the cache"""
+
+
+def normalize_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize tool args so trivially different queries share a cache entry"""
+    normalized = {}
+    for key, value in args.items():
+        if isinstance(value, str):
+            value = " ".join(value.lower().split())
+        normalized[key] = value
+    return normalized
+
+
+class SQLiteToolCache:
+    """
+    Content-addressed, on-disk cache of tool results.
+
+    Entries are keyed on sha256(tool name + normalized args). Entries older than
+    ``ttl_seconds`` are treated as misses, and once more than ``max_entries``
+    are stored the least recently used ones are deleted. With ``offline=True``
+    only cached results are served and misses raise ToolCacheMiss.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None, offline: Optional[bool] = None):
+        self.path = path or os.getenv(CACHE_PATH_ENV, "./cache/tool_cache.sqlite")
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None
+                                 else os.getenv(CACHE_TTL_ENV, 7 * 24 * 3600))
+        self.max_entries = int(max_entries if max_entries is not None
+                               else os.getenv(CACHE_MAX_ENTRIES_ENV, 10000))
+        self.offline = offline if offline is not None else os.getenv(OFFLINE_ENV, "0") == "1"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS tool_cache (
+                       key TEXT PRIMARY KEY,
+                       tool TEXT NOT NULL,
+                       args TEXT NOT NULL,
+                       value TEXT NOT NULL,
+                       created_at REAL NOT NULL,
+                       last_access REAL NOT NULL
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tool_cache_access ON tool_cache(last_access)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(tool_name: str, args: Dict[str, Any]) -> str:
+        payload = json.dumps([tool_name, normalize_args(args)], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, tool_name: str, args: Dict[str, Any]) -> Optional[str]:
+        key = self.make_key(tool_name, args)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT value, created_at FROM tool_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            value, created_at = row
+            if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM tool_cache WHERE key = ?", (key,))
+                conn.commit()
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            conn.execute("UPDATE tool_cache SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, tool_name: str, args: Dict[str, Any], value: str) -> None:
+        key = self.make_key(tool_name, args)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, tool, args, value, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, tool_name, json.dumps(normalize_args(args), ensure_ascii=False), value, now, now),
+            )
+            if self.max_entries > 0:
+                (count,) = conn.execute("SELECT COUNT(*) FROM tool_cache").fetchone()
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM tool_cache WHERE key IN "
+                        "(SELECT key FROM tool_cache ORDER BY last_access ASC LIMIT ?)",
+                        (overflow,),
+                    )
+                    self._stats["evictions"] += overflow
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            (stats["size"],) = self._connection().execute("SELECT COUNT(*) FROM tool_cache").fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def is_cacheable(result: Any) -> bool:
+    """Only real results are cached; errors and "no result" answers are retried next time"""
+    text = str(result).strip()
+    return bool(text) and not text.startswith(UNCACHEABLE_PREFIXES)
+
+
+def cached_tool(tool: BaseTool, cache: SQLiteToolCache) -> StructuredTool:
+    """
+    Wrap a tool so results are served from, and stored in, the disk cache.
+
+    Exceptions propagate uncached, and so do the error strings of
+    UNCACHEABLE_PREFIXES, so a transient failure is not replayed for the TTL.
+    """
+
+    def _run(*args: Any, config: RunnableConfig, **kwargs: Any) -> str:
+        # Plain string input (tool.run("query")) arrives positionally
+        kwargs = {**dict(zip(tool.args, args)), **kwargs}
+        cached = cache.get(tool.name, kwargs)
+        if cached is not None:
+            return cached
+        if cache.offline:
+            raise ToolCacheMiss(f"{tool.name} result not cached for {kwargs} (offline mode)")
+        # The caller's config keeps callbacks/tracing on the inner tool run
+        result = tool.invoke(kwargs, config)
+        if is_cacheable(result):
+            cache.set(tool.name, kwargs, str(result))
+        return result
+
+    return StructuredTool.from_function(
+        func=_run,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
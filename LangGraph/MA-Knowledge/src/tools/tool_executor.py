@@ -0,0 +1,168 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+# Per-tool defaults: arXiv asks clients to throttle, VQA is bounded by the GPU
+DEFAULT_CONCURRENCY_LIMITS = {"vqa_tool": 4, "arxiv": 2, "wikipedia": 4}
+DEFAULT_TIMEOUTS = {"vqa_tool": 120.0, "arxiv": 30.0, "wikipedia": 30.0}
+
+# configurable key of a threading.Event that cancels the calls of a run (see StreamingVotingNode)
+CANCEL_EVENT_KEY = "cancel_event"
+# How often a waiting run checks its cancel event
+CANCEL_POLL_S = 0.05
+
+
+class ToolCallCancelled(Exception):
+    """The run that made the call was cancelled before the call returned"""
+
+
+class _CallSlot:
+    """
+    One call's claim on its tool's semaphore.
+
+    A call that times out is abandoned: its slot is given back at once (or
+    never taken, if it was still queued), and the release when the call
+    eventually returns becomes a no-op, so hung calls do not use up the limit.
+    """
+
+    def __init__(self, semaphore: threading.BoundedSemaphore):
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+        self._held = False
+        self._abandoned = False
+
+    def acquire(self) -> bool:
+        """Wait for the slot; False if the call was abandoned meanwhile"""
+        self._semaphore.acquire()
+        with self._lock:
+            if self._abandoned:
+                self._semaphore.release()
+                return False
+            self._held = True
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            if self._held:
+                self._held = False
+                self._semaphore.release()
+
+    def abandon(self) -> None:
+        with self._lock:
+            self._abandoned = True
+        self.release()
+
+
+class ToolExecutor:
+    """
+    Run the tool calls of one LLM turn concurrently.
+
+    Calls are submitted to a shared thread pool (the graph is driven both
+    through invoke and ainvoke, so nodes stay synchronous). Each tool has its
+    own concurrency limit across all analysts and its own timeout. Outcomes
+    are returned in the order of the submitted calls.
+
+    If the run config's ``configurable`` holds a threading.Event under
+    CANCEL_EVENT_KEY, setting it stops the wait: calls not started yet never
+    run, and the run gets ToolCallCancelled outcomes at once instead of
+    waiting for calls still in flight.
+
+    Limitation: Python threads cannot be interrupted, so a call that times
+    out keeps running in its pool thread until the underlying client returns
+    (the arxiv/wikipedia clients have no request timeout). It no longer
+    counts against its tool's concurrency limit, but it still occupies one
+    of the ``max_workers`` threads while it hangs.
+
+    Args:
+        max_workers: Size of the shared thread pool
+        concurrency_limits: Max in-flight calls per tool name
+        timeouts: Seconds to wait per tool name before giving up
+        default_limit: Limit for tools not in concurrency_limits
+        default_timeout: Timeout for tools not in timeouts
+    """
+
+    def __init__(self, max_workers: int = 16,
+                 concurrency_limits: Optional[Dict[str, int]] = None,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 default_limit: int = 4,
+                 default_timeout: float = 60.0):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self.concurrency_limits = {**DEFAULT_CONCURRENCY_LIMITS, **(concurrency_limits or {})}
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.default_limit = default_limit
+        self.default_timeout = default_timeout
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, tool_name: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if tool_name not in self._semaphores:
+                limit = self.concurrency_limits.get(tool_name, self.default_limit)
+                self._semaphores[tool_name] = threading.BoundedSemaphore(limit)
+            return self._semaphores[tool_name]
+
+    def _invoke(self, tool: Any, slot: _CallSlot, args: Dict[str, Any], config: Optional[Dict[str, Any]]) -> Any:
+        if not slot.acquire():
+            return None  # timed out while queued; nobody waits for the result
+        try:
+            return tool.invoke(args, config)
+        finally:
+            slot.release()
+
+    def run(self, tools_registry: Dict[str, Any],
+            calls: List[Tuple[str, Dict[str, Any]]],
+            config: Optional[Dict[str, Any]] = None) -> List[Tuple[bool, Any]]:
+        """
+        Execute (tool_name, args) calls concurrently.
+
+        ``config`` is passed to every tool explicitly: worker threads do not
+        inherit the node's context, so callbacks would otherwise be lost.
+
+        Returns:
+            One (ok, result_or_exception) pair per call, in call order
+        """
+        cancel = ((config or {}).get("configurable") or {}).get(CANCEL_EVENT_KEY)
+        if cancel is not None and cancel.is_set():
+            return [(False, ToolCallCancelled(f"{tool_name} cancelled")) for tool_name, _ in calls]
+
+        start = time.monotonic()
+        slots = [_CallSlot(self._semaphore(tool_name)) for tool_name, _ in calls]
+        futures = [
+            self._pool.submit(self._invoke, tools_registry[tool_name], slot, args, config)
+            for (tool_name, args), slot in zip(calls, slots)
+        ]
+
+        outcomes = []
+        for (tool_name, _), slot, future in zip(calls, slots, futures):
+            timeout = self.timeouts.get(tool_name, self.default_timeout)
+            try:
+                outcomes.append((True, self._result(future, start + timeout, cancel)))
+            except FutureTimeoutError:
+                future.cancel()
+                slot.abandon()
+                outcomes.append((False, TimeoutError(f"{tool_name} timed out after {timeout:.0f}s")))
+            except ToolCallCancelled:
+                future.cancel()
+                slot.abandon()
+                outcomes.append((False, ToolCallCancelled(f"{tool_name} cancelled")))
+            except Exception as e:
+                outcomes.append((False, e))
+        return outcomes
+
+    @staticmethod
+    def _result(future, deadline: float, cancel: Optional[threading.Event]) -> Any:
+        if cancel is None:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        while True:
+            if cancel.is_set():
+                raise ToolCallCancelled()
+            remaining = deadline - time.monotonic()
+            try:
+                return future.result(timeout=max(0.0, min(remaining, CANCEL_POLL_S)))
+            except FutureTimeoutError:
+                if remaining <= CANCEL_POLL_S:
+                    raise
+
+
+tool_executor = ToolExecutor()
@@ -0,0 +1,92 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+from src.utils.text_processing import (
+    extract_answer_from_result,
+    normalize_answer_for_voting,
+    parse_candidates,
+)
+
+
+class Candidate(BaseModel):
+    """One VQA candidate answer with its probability"""
+    answer: str
+    score: float
+
+    def __str__(self) -> str:
+        return f"{self.answer}({self.score:.2f})"
+
+
+class KnowledgeSnippet(BaseModel):
+    """One arxiv paper or wikipedia page returned by a knowledge tool"""
+    source: str = Field(description="Tool the snippet came from: arxiv or wikipedia.")
+    title: str
+    summary: str
+    published: Optional[str] = None
+
+    def to_prompt(self, max_chars: int = 300) -> str:
+        summary = self.summary[:max_chars]
+        if self.source == "arxiv":
+            return f"Paper: {self.title}\nSummary: {summary}..."
+        if self.source == "wikipedia":
+            return f"Wikipedia - {self.title}: {summary}..."
+        return summary
+
+
+class AnalystAnswer(BaseModel):
+    """Final answer of one analyst, parsed once from its final LLM response"""
+    analyst: str
+    answer: str = Field(description="Normalized answer used for voting.")
+    content: str = Field(default="", description="Raw final response.")
+
+    @classmethod
+    def from_response(cls, analyst: str, content: str) -> "AnalystAnswer":
+        return cls(
+            analyst=analyst,
+            answer=normalize_answer_for_voting(extract_answer_from_result(content)),
+            content=content,
+        )
+
+
+def parse_vqa_output(raw: str) -> List[Candidate]:
+    """``Candidates: a(0.98), b(0.75)`` -> candidates, best first"""
+    return [Candidate(answer=answer, score=score) for answer, score in parse_candidates(raw)]
+
+
+def format_candidates(candidates: List[Candidate]) -> str:
+    return ", ".join(str(candidate) for candidate in candidates)
+
+
+def parse_knowledge_output(raw: str, source: str, limit: int = 2) -> List[KnowledgeSnippet]:
+    """Split raw arxiv/wikipedia tool output into at most ``limit`` snippets"""
+    # arxiv: "Published:/Title:/Summary:" blocks, wikipedia: "Page:/Summary:" blocks
+    starts = {"arxiv": "Published:", "wikipedia": "Page:"}
+    start = starts.get(source)
+    if start is None:
+        return [KnowledgeSnippet(source=source, title="", summary=str(raw).strip())]
+
+    entries = []
+    current = None
+    for line in str(raw).strip().split('\n'):
+        if line.startswith(start):
+            if current:
+                entries.append(current)
+            current = {"source": source, "title": "Unknown", "summary": "No summary"}
+            if source == "arxiv":
+                current["published"] = line.replace("Published: ", "")
+            else:
+                current["title"] = line.replace("Page: ", "")
+        elif current is None:
+            continue
+        elif line.startswith("Title:"):
+            current["title"] = line.replace("Title: ", "")
+        elif line.startswith("Summary:"):
+            current["summary"] = line.replace("Summary: ", "")
+
+    if current:
+        entries.append(current)
+    return [KnowledgeSnippet(**entry) for entry in entries[:limit]]
+
+
+def format_knowledge(snippets: List[KnowledgeSnippet]) -> str:
+    return "\n\n".join(snippet.to_prompt() for snippet in snippets)
@@ -1,30 +1,57 @@
-import torch
+import os
 import numpy as np
 from PIL import Image
-from transformers import SamModel, SamProcessor, AutoModel
-import cv2
-import requests
-from io import BytesIO
 from langchain_core.tools import tool
 from typing import Union
-import base64
 
-device = torch.device("cpu")
-sam_model = SamModel.from_pretrained("facebook/sam-vit-base").to(device)
-sam_processor = SamProcessor.from_pretrained("facebook/sam-vit-base")
+from src.models.batching import MicroBatcher
+from src.models.model_registry import model_registry
+from src.utils.cache_utils import CoalescingLRUCache
+from src.utils.image_processing import ImageHandle
 
-model = AutoModel.from_pretrained(
-    'nvidia/DAM-3B-Self-Contained',
-    trust_remote_code=True,
-    torch_dtype='torch.float16'
-).to("cuda")
-dam = model.init_dam(conv_mode='v1', prompt_mode='full+focal_crop')
+# Models are loaded on first use through model_registry ("dam", "sam"); set
+# MA_KNOWLEDGE_MODEL_BACKEND=stub to run without torch or a GPU.
+
+DAM_GENERATION_KWARGS = {
+    "streaming": False,
+    "temperature": 0.2,
+    "top_p": 0.5,
+    "num_beams": 1,
+    "max_new_tokens": 512,
+}
+
+
+def _run_dam_batch(batch):
+  """Run (image, mask, prompt, gen_kwargs) requests that share gen_kwargs"""
+  dam = model_registry.get("dam")
+  gen_kwargs = dict(batch[0][3])
+  images, masks, prompts, _ = zip(*batch)
+  return dam.get_description_batch(list(images), list(masks), list(prompts), **gen_kwargs)
+
+
+# Caption and VQA calls from the parallel analysts are micro-batched in front of DAM
+# (one padded generate per batch, see BatchedDAM); tune with MA_KNOWLEDGE_BATCH_SIZE / MA_KNOWLEDGE_BATCH_WAIT_MS or dam_batcher.configure()
+dam_batcher = MicroBatcher(_run_dam_batch)
+
+
+# Junior, Senior and Manager all start with the same vqa_tool call: identical
+# (image, question, params) requests share one inference and results are kept LRU
+vqa_cache = CoalescingLRUCache(maxsize=int(os.getenv("MA_KNOWLEDGE_VQA_CACHE_SIZE", 256)))
+
+
+def describe(img, mask, prompt, **gen_kwargs) -> str:
+  """Submit one DAM request through the micro-batcher and wait for its result"""
+  gen_kwargs = {**DAM_GENERATION_KWARGS, **gen_kwargs}
+  key = tuple(sorted(gen_kwargs.items()))
+  return dam_batcher((img, mask, prompt, gen_kwargs), key=key)
 
 
 # def apply_sam(image, input_points=None, input_boxes=None, input_labels=None):
+#   sam_model, sam_processor = model_registry.get("sam")
 #   inputs = sam_processor(image, input_points=input_points, input_boxes=input_boxes,
-#                          input_labels=input_labels, return_tensors="pt").to(device)
+#                          input_labels=input_labels, return_tensors="pt").to(model_registry.resolve_device())
 
+#   import torch
 #   with torch.no_grad():
 #     outputs = sam_model(**inputs)
 
@@ -41,6 +68,8 @@ dam = model.init_dam(conv_mode='v1', prompt_mode='full+focal_crop')
 
 
 def add_contour(img, mask, input_points=None, input_boxes=None):
+  import cv2
+
   img = img.copy()
   mask = mask.astype(np.uint8) * 255
   contours, _ = cv2.findContours(
@@ -71,26 +100,15 @@ def print_streaming(text):
 
 
 def candidate_answers(
-    image: Union[str, Image.Image],
+    image: Union[str, Image.Image, ImageHandle],
     question: str,
 ) -> str:
-    # Xử lý hình ảnh từ base64 hoặc URL hoặc PIL Image
-  if isinstance(image, str):
-      if image.startswith('http'):
-            # Nếu là URL
-            resp = requests.get(image)
-            resp.raise_for_status()
-            img = Image.open(BytesIO(resp.content)).convert('RGB')
-      else:
-            # Nếu là base64 string
-            img_data = base64.b64decode(image)
-            img = Image.open(BytesIO(img_data)).convert('RGB')
-  else:
-        # Nếu là PIL Image
-        img = image
+  # Xử lý hình ảnh từ ImageHandle, base64, URL hoặc PIL Image (decode một lần)
+  handle = ImageHandle.from_source(image)
+  img = handle.pil
 
   # 2. Tạo full‐mask
-  full_mask = Image.new("L", img.size, 255)
+  full_mask = handle.full_mask()
 
   # 4. Tạo prompt
   prompt = f"""<image>
@@ -113,33 +131,26 @@ def candidate_answers(
               Answer:
             """
 
-  result = dam.get_description(
-      img,
-      full_mask,
-      prompt,
-      streaming=False,
-      temperature=0.2,
-      top_p=0.5,
-      num_beams=1,
-      max_new_tokens=512
+  key = (
+      handle.content_hash,
+      " ".join(question.split()),
+      model_registry.backend,
+      tuple(sorted(DAM_GENERATION_KWARGS.items())),
   )
+  result = vqa_cache.get_or_compute(key, lambda: describe(img, full_mask, prompt))
   return result
 
 
 
 def caption_image(
-    image: Union[str, Image.Image],
+    image: Union[str, Image.Image, ImageHandle],
 ) -> str:
 
-    if isinstance(image, str):
-        resp = requests.get(image)
-        resp.raise_for_status()
-        img = Image.open(BytesIO(resp.content)).convert("RGB")
-    else:
-        img = image
+    handle = ImageHandle.from_source(image)
+    img = handle.pil
 
     # 2. Tạo full‐mask (toàn ảnh)
-    full_mask = Image.new("L", img.size, 255)
+    full_mask = handle.full_mask()
 
     # 3. Xây prompt
     prompt = """<image>
@@ -160,16 +171,7 @@ def caption_image(
       Caption:"""
 
     # 4. Gọi DAM để sinh caption
-    result = dam.get_description(
-        img,
-        full_mask,
-        prompt,
-        streaming=False,
-        temperature=0.2,
-        top_p=0.5,
-        num_beams=1,
-        max_new_tokens=512
-    )
+    result = describe(img, full_mask, prompt)
     return result
 
 
@@ -180,6 +182,6 @@ def caption_image(
 #   result = caption_image(URL)
 #   print(result)
 @tool
-def vqa_tool(image: Union[str, Image.Image], question: str) -> str:
+def vqa_tool(image: Union[str, Image.Image, ImageHandle], question: str) -> str:
     """return the candidate answer with probability of the question"""
     return candidate_answers(image, question)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class CoalescingLRUCache:
+    """
+    LRU cache that also coalesces concurrent identical requests.
+
+    The first caller for a key computes the value; callers arriving while it
+    is still in flight wait on the same future instead of recomputing.
+    Failures are propagated to every waiter and are not cached.
+
+    Args:
+        maxsize: Maximum number of completed results kept
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = max(0, maxsize)
+        self._cache: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._cache[key]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                owner = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self._stats["misses"] += 1
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if self.maxsize:
+                self._cache[key] = value
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+                    self._stats["evictions"] += 1
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._cache)
+            stats["inflight"] = len(self._inflight)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["saved_calls"] = stats["hits"] + stats["coalesced"]
+        stats["hit_ratio"] = stats["saved_calls"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            for key in self._stats:
+                self._stats[key] = 0
@@ -1,8 +1,217 @@
 import base64
+import hashlib
+import ipaddress
+import os
+import socket
+import threading
+import time
+import weakref
 from io import BytesIO
+from typing import Any, Callable, Dict, Tuple, Union
+from urllib.parse import urljoin, urlparse
 from PIL import Image
 
+# Limits for downloading images given by URL
+MAX_IMAGE_BYTES = int(os.getenv("MA_KNOWLEDGE_MAX_IMAGE_BYTES", 20 * 1024 * 1024))
+FETCH_TIMEOUT = (5.0, 15.0)  # connect, read (seconds)
+FETCH_TOTAL_TIMEOUT = 30.0
+MAX_REDIRECTS = 3
+
+
+class ImageFetchError(ValueError):
+    """An image URL could not be fetched (refused, too large, HTTP error)"""
+
+
+class ImageFetchTimeout(ImageFetchError):
+    """An image URL did not answer within the fetch timeouts"""
+
+
+def _check_public_host(host: str, port: int) -> None:
+    try:
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise ImageFetchError(f"Cannot resolve {host}: {e}") from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not address.is_global:
+            raise ImageFetchError(f"Refusing to fetch {host}: {address} is not a public address")
+
+
+def fetch_image_bytes(url: str,
+                      timeout: Tuple[float, float] = FETCH_TIMEOUT,
+                      total_timeout: float = FETCH_TOTAL_TIMEOUT,
+                      max_bytes: int = MAX_IMAGE_BYTES,
+                      allow_private: bool = True) -> bytes:
+    """
+    Download an image with connect/read timeouts, an overall deadline and a size cap.
+
+    With ``allow_private=False`` (client-supplied URLs) hosts resolving to
+    private, loopback, link-local or reserved addresses are refused, also
+    after redirects, which are followed manually for that reason.
+    """
+    import requests
+
+    deadline = time.monotonic() + total_timeout
+    for _ in range(MAX_REDIRECTS + 1):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ImageFetchError(f"Unsupported image URL: {url!r}")
+        if not allow_private:
+            _check_public_host(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+        try:
+            with requests.get(url, timeout=timeout, stream=True, allow_redirects=False) as resp:
+                if resp.is_redirect:
+                    url = urljoin(url, resp.headers["location"])
+                    continue
+                resp.raise_for_status()
+                length = resp.headers.get("content-length")
+                if length and length.isdigit() and int(length) > max_bytes:
+                    raise ImageFetchError(f"Image is larger than {max_bytes} bytes")
+                data = bytearray()
+                for chunk in resp.iter_content(64 * 1024):
+                    data += chunk
+                    if len(data) > max_bytes:
+                        raise ImageFetchError(f"Image is larger than {max_bytes} bytes")
+                    if time.monotonic() > deadline:
+                        raise ImageFetchTimeout(f"Image download exceeded {total_timeout:.0f}s")
+                return bytes(data)
+        except requests.Timeout as e:
+            raise ImageFetchTimeout(f"Image URL timed out: {e}") from e
+        except requests.RequestException as e:
+            raise ImageFetchError(f"Image URL failed: {e}") from e
+    raise ImageFetchError(f"Too many redirects for image URL (max {MAX_REDIRECTS})")
+
+
 def pil_to_base64(img: Image.Image) -> str:
     buf = BytesIO()
     img.save(buf, format="JPEG")
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
\ No newline at end of file
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+class ImageHandle:
+    """
+    Per-run handle around one decoded RGB image.
+
+    The image is decoded once; its content hash and every derived form (JPEG
+    bytes, base64, full mask, model-specific tensors) are computed on first
+    request and memoized, so caption, VQA and tool calls share the same work.
+    Safe to use from the parallel analyst subgraphs.
+    """
+
+    def __init__(self, image: Image.Image):
+        self.pil = image if image.mode == "RGB" else image.convert("RGB")
+        self._cache: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_source(cls, source: Union[str, bytes, Image.Image, "ImageHandle"]) -> "ImageHandle":
+        """Build a handle from a URL, file path, base64 string, encoded bytes or PIL image"""
+        if isinstance(source, ImageHandle):
+            return source
+        if isinstance(source, Image.Image):
+            return cls(source)
+
+        if isinstance(source, (bytes, bytearray)):
+            data = bytes(source)
+        elif source.startswith("http"):
+            data = fetch_image_bytes(source)
+        elif os.path.exists(source):
+            with open(source, "rb") as f:
+                data = f.read()
+        else:
+            data = base64.b64decode(source)
+
+        handle = cls(Image.open(BytesIO(data)))
+        if data[:3] == b"\xff\xd8\xff":
+            handle._cache["jpeg"] = data
+        return handle
+
+    def memo(self, key: str, compute: Callable[[Image.Image], Any]) -> Any:
+        """Return the cached value for key, computing it from the image once"""
+        if key in self._cache:
+            return self._cache[key]
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = compute(self.pil)
+            return self._cache[key]
+
+    @property
+    def size(self):
+        return self.pil.size
+
+    @property
+    def content_hash(self) -> str:
+        return self.memo("hash", lambda img: hashlib.sha1(
+            f"{img.mode}{img.size}".encode() + img.tobytes()).hexdigest())
+
+    def jpeg_bytes(self) -> bytes:
+        def encode(img: Image.Image) -> bytes:
+            buf = BytesIO()
+            img.save(buf, format="JPEG")
+            return buf.getvalue()
+        return self.memo("jpeg", encode)
+
+    def base64(self) -> str:
+        return self.memo("base64", lambda img: base64.b64encode(self.jpeg_bytes()).decode("utf-8"))
+
+    def png_bytes(self) -> bytes:
+        """Lossless encoding, used when the handle is checkpointed"""
+        def encode(img: Image.Image) -> bytes:
+            buf = BytesIO()
+            img.save(buf, format="PNG", compress_level=1)
+            return buf.getvalue()
+        return self.memo("png", encode)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Locks and derived forms are not picklable/worth storing; PNG keeps the hash stable
+        return {"png": self.png_bytes(), "hash": self.content_hash}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(Image.open(BytesIO(state["png"])))
+        self._cache.update(png=state["png"], hash=state["hash"])
+
+    def full_mask(self) -> Image.Image:
+        """Mask covering the whole image, as used by DAM for full-image prompts"""
+        return self.memo("full_mask", lambda img: Image.new("L", img.size, 255))
+
+    def __repr__(self) -> str:
+        return f"ImageHandle(size={self.size})"
+
+
+class ImageRegistry:
+    """
+    Live ImageHandles by id (content hash), so graph state can carry the id
+    instead of the image.
+
+    Entries are weak: a handle stays resolvable while something (the main
+    graph state, the caller of the pipeline) holds it, and disappears with
+    the run. Registering an image already present returns the existing
+    handle, so concurrent runs on the same image share one decode.
+    """
+
+    def __init__(self):
+        self._handles: "weakref.WeakValueDictionary[str, ImageHandle]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def register(self, image: Union[str, bytes, Image.Image, ImageHandle]) -> ImageHandle:
+        """Return the registered handle for image; its id is ``handle.content_hash``"""
+        handle = ImageHandle.from_source(image)
+        image_id = handle.content_hash
+        with self._lock:
+            existing = self._handles.get(image_id)
+            if existing is not None:
+                return existing
+            self._handles[image_id] = handle
+        return handle
+
+    def get(self, image_id: str) -> ImageHandle:
+        handle = self._handles.get(image_id)
+        if handle is None:
+            raise KeyError(f"Image {image_id!r} is not registered (was it released before the run ended?)")
+        return handle
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+
+image_registry = ImageRegistry()
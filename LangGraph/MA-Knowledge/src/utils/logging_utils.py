@@ -0,0 +1,31 @@
+import logging
+import os
+from typing import Union
+
+LOG_LEVEL_ENV = "MA_KNOWLEDGE_LOG_LEVEL"
+ROOT_LOGGER = "ma_knowledge"
+
+
+def _root_logger() -> logging.Logger:
+    root = logging.getLogger(ROOT_LOGGER)
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(os.getenv(LOG_LEVEL_ENV, "INFO").upper())
+        root.propagate = False
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Logger under the ``ma_knowledge`` namespace.
+
+    Messages use ``key=value`` pairs with lazy %-formatting, so disabled
+    levels cost almost nothing; set MA_KNOWLEDGE_LOG_LEVEL=WARNING for hot runs.
+    """
+    return _root_logger().getChild(name)
+
+
+def set_log_level(level: Union[int, str]) -> None:
+    _root_logger().setLevel(level.upper() if isinstance(level, str) else level)
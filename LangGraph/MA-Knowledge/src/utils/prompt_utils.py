@@ -0,0 +1,45 @@
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class CompiledPrompt:
+    """
+    Prompt template parsed once into literal segments and placeholders.
+
+    Rendering is a single join over the precomputed segments (no regex or
+    str.format parsing per call). Everything before the first placeholder is
+    exposed as ``static_prefix``: it is byte-identical for every question, so
+    a local server's prefix/KV cache can reuse it.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self._segments: List[Tuple[str, Optional[str]]] = [
+            (literal, field_name) for literal, field_name, _, _ in Formatter().parse(template)
+        ]
+        self.placeholders: Tuple[str, ...] = tuple(
+            dict.fromkeys(name for _, name in self._segments if name is not None)
+        )
+        self.static_prefix = self._segments[0][0] if self._segments else ""
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """Fill placeholders from values; placeholders without a value render empty"""
+        return "".join(
+            literal + (str(values.get(name, "")) if name is not None else "")
+            for literal, name in self._segments
+        )
+
+    def render_segments(self, values: Dict[str, Any]) -> Tuple[str, str]:
+        """Return (static_prefix, dynamic_suffix) whose concatenation equals render()"""
+        rendered = self.render(values)
+        return self.static_prefix, rendered[len(self.static_prefix):]
+
+    def __repr__(self) -> str:
+        return f"CompiledPrompt(placeholders={self.placeholders})"
+
+
+@lru_cache(maxsize=None)
+def compile_prompt(template: str) -> CompiledPrompt:
+    """Compile a template once; analysts of the same class share the result"""
+    return CompiledPrompt(template)
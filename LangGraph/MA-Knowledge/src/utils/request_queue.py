@@ -0,0 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Any
+
+
+class QueueFullError(Exception):
+    """Raised when a request cannot be admitted; HTTP callers map it to 429"""
+
+
+class RequestQueue:
+    """
+    Bounded admission queue for questions.
+
+    At most ``max_in_flight`` questions run at once and up to ``max_waiting``
+    more wait for a slot. A request is admitted (or rejected) as a whole
+    before any work starts, so a full queue answers immediately instead of
+    piling up latency; a batch needs one place per question.
+
+    Args:
+        max_in_flight: Questions executed concurrently
+        max_waiting: Admitted questions allowed to wait for a free slot
+    """
+
+    def __init__(self, max_in_flight: int = 4, max_waiting: int = 32):
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._admitted = 0
+        self._running = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_in_flight + self.max_waiting
+
+    def admit(self, n: int = 1) -> None:
+        """Reserve n places or raise QueueFullError; pair with release(n)"""
+        # No await between check and update: atomic on the event loop
+        if self._admitted + n > self.capacity:
+            self._rejected += 1
+            raise QueueFullError(
+                f"Queue full ({self._admitted}/{self.capacity} admitted, {n} requested)")
+        self._admitted += n
+
+    def release(self, n: int = 1) -> None:
+        self._admitted -= n
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for an execution slot for one admitted question"""
+        async with self._slots:
+            self._running += 1
+            try:
+                yield
+            finally:
+                self._running -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._running,
+            "waiting": self._admitted - self._running,
+            "capacity": self.capacity,
+            "rejected": self._rejected,
+        }
@@ -1,3 +1,6 @@
+import re
+from typing import List, Tuple
+
 def extract_answer_from_result(result: str) -> str:
     """
     Extract the actual answer from agent result text.
@@ -25,4 +28,56 @@ def extract_answer_from_result(result: str) -> str:
     if len(result.split()) <= 3:
         return result.lower().strip('.,!?;:"')
     
-    return ""
\ No newline at end of file
+    return ""
+
+_CANDIDATE_PATTERN = re.compile(r'([^,()]+?)\s*\(\s*(\d*\.?\d+)\s*\)')
+
+def parse_candidates(text: str) -> List[Tuple[str, float]]:
+    """
+    Parse VQA candidates into (answer, score) pairs, best first.
+
+    Example: "Candidates: red(0.98), orange(0.75)" -> [("red", 0.98), ("orange", 0.75)]
+    """
+    if not text:
+        return []
+    text = str(text).split("Candidates:", 1)[-1]
+    candidates = [
+        (answer.strip().lower(), float(score))
+        for answer, score in _CANDIDATE_PATTERN.findall(text)
+        if answer.strip()
+    ]
+    return sorted(candidates, key=lambda c: c[1], reverse=True)
+
+
+def normalize_answer_for_voting(answer: str) -> str:
+    """
+    Normalize answer for voting by extracting the core answer from various formats.
+    
+    Examples:
+    - "10(0.98)" -> "10"
+    - "Candidates: 10(0.99), 9(0.92)" -> "10"
+    - "The answer is 10" -> "10"
+    - "10" -> "10"
+    """
+    if not answer:
+        return ""
+    
+    answer = str(answer).strip()
+    
+    # Extract from VQA format: "10(0.98)" -> "10"
+    match = re.match(r'^(\w+)\s*\(\d+\.\d+\)', answer)
+    if match:
+        return match.group(1).strip()
+    
+    # Extract from candidates format: "Candidates: 10(0.99), 9(0.92)" -> "10"
+    candidates_match = re.search(r'Candidates:\s*(\w+)\s*\(\d+\.\d+\)', answer)
+    if candidates_match:
+        return candidates_match.group(1).strip()
+    
+    # Extract from "The answer is X" format
+    answer_match = re.search(r'the\s+answer\s+is\s+(\w+)', answer.lower())
+    if answer_match:
+        return answer_match.group(1).strip()
+    
+    # If it's just a simple answer, return as is
+    return answer
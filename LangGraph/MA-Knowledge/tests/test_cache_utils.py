@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.utils.cache_utils import CoalescingLRUCache
+
+
+def test_concurrent_identical_keys_compute_once():
+    cache = CoalescingLRUCache()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_compute, "key", compute) for _ in range(8)]
+        # Every caller has joined the in-flight computation before it finishes
+        while cache.stats()["coalesced"] < 7:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["inflight"]) == (1, 7, 0)
+    assert cache.get_or_compute("key", lambda: "other") == "value"
+
+
+def test_failure_reaches_waiters_and_is_not_cached():
+    cache = CoalescingLRUCache()
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        owner = pool.submit(cache.get_or_compute, "key", compute)
+        while not cache.stats()["inflight"]:
+            threading.Event().wait(0.01)
+        waiter = pool.submit(cache.get_or_compute, "key", compute)
+        while not cache.stats()["coalesced"]:
+            threading.Event().wait(0.01)
+        release.set()
+        for future in (owner, waiter):
+            with pytest.raises(RuntimeError):
+                future.result(timeout=5)
+
+    assert cache.get_or_compute("key", lambda: "retry") == "retry"
+
+
+def test_least_recently_used_is_evicted():
+    cache = CoalescingLRUCache(maxsize=2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("c", lambda: 3)
+
+    assert cache.get_or_compute("a", lambda: "recomputed") == 1
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+    assert cache.stats()["evictions"] == 2
@@ -0,0 +1,78 @@
+import operator
+from typing import Annotated, List, TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from src.core.memory_manager import SessionMemory
+
+pytest.importorskip("langgraph.checkpoint.sqlite")
+
+
+class _State(TypedDict):
+    steps: Annotated[List[str], operator.add]
+
+
+def make_graph(memory: SessionMemory):
+    workflow = StateGraph(_State)
+    workflow.add_node("first", lambda state: {"steps": ["first"]})
+    workflow.add_node("second", lambda state: {"steps": ["second"]})
+    workflow.add_edge(START, "first")
+    workflow.add_edge("first", "second")
+    workflow.add_edge("second", END)
+    # Interrupting before "second" leaves a run unfinished, as after a crash
+    return workflow.compile(checkpointer=memory.get_checkpointer(), interrupt_before=["second"])
+
+
+def run(graph, memory: SessionMemory, thread_id: str, finish: bool = True) -> None:
+    config = memory.create_thread_config(thread_id)
+    graph.invoke({"steps": []}, config)
+    if finish:
+        graph.invoke(None, config)
+        memory.mark_finished(thread_id)
+
+
+def thread_ids(memory: SessionMemory):
+    conn, _ = memory._sqlite()
+    return {row[0] for row in conn.execute("SELECT DISTINCT thread_id FROM checkpoints")}
+
+
+@pytest.fixture
+def memory(tmp_path):
+    return SessionMemory.sqlite(str(tmp_path / "checkpoints.sqlite"), max_threads=2, prune_every=1000)
+
+
+def test_compact_thread_keeps_only_final_checkpoint(memory):
+    graph = make_graph(memory)
+    run(graph, memory, "done")
+
+    conn, _ = memory._sqlite()
+    assert conn.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = 'done'").fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(*) FROM writes WHERE thread_id = 'done'").fetchone()[0] == 0
+    snapshot = graph.get_state(memory.create_thread_config("done"))
+    assert snapshot.values["steps"] == ["first", "second"] and not snapshot.next
+
+
+def test_prune_skips_unfinished_threads(memory):
+    graph = make_graph(memory)
+    run(graph, memory, "unfinished", finish=False)
+    for thread_id in ("old", "middle", "new"):
+        run(graph, memory, thread_id)
+
+    assert memory.prune() == 1
+    assert thread_ids(memory) == {"unfinished", "middle", "new"}
+    # The interrupted run can still be resumed
+    config = memory.create_thread_config("unfinished")
+    assert graph.get_state(config).next == ("second",)
+    assert graph.invoke(None, config)["steps"] == ["first", "second"]
+
+
+def test_prune_orders_by_finish_time(memory):
+    graph = make_graph(memory)
+    for thread_id in ("a", "b", "c"):
+        run(graph, memory, thread_id)
+    # Finishing "a" again makes it the most recent
+    memory.mark_finished("a")
+
+    memory.prune()
+    assert thread_ids(memory) == {"a", "c"}
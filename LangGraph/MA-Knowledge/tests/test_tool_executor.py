@@ -0,0 +1,80 @@
+import threading
+import time
+
+from langchain_core.tools import StructuredTool
+
+from src.tools.tool_executor import CANCEL_EVENT_KEY, ToolCallCancelled, ToolExecutor
+
+
+def make_tool(name, func):
+    return StructuredTool.from_function(func, name=name, description=name)
+
+
+def test_outcomes_follow_call_order():
+    def echo(query: str, delay: float) -> str:
+        time.sleep(delay)
+        return query
+
+    registry = {"echo": make_tool("echo", echo)}
+    executor = ToolExecutor(concurrency_limits={"echo": 3})
+    calls = [("echo", {"query": str(i), "delay": delay}) for i, delay in enumerate([0.2, 0.0, 0.1])]
+
+    outcomes = executor.run(registry, calls)
+
+    assert outcomes == [(True, "0"), (True, "1"), (True, "2")]
+
+
+def test_failures_are_returned_not_raised():
+    def fail(query: str) -> str:
+        raise ValueError(query)
+
+    registry = {"fail": make_tool("fail", fail), "ok": make_tool("ok", lambda query: query)}
+    outcomes = ToolExecutor().run(registry, [("fail", {"query": "bad"}), ("ok", {"query": "good"})])
+
+    assert not outcomes[0][0] and isinstance(outcomes[0][1], ValueError)
+    assert outcomes[1] == (True, "good")
+
+
+def test_timed_out_call_releases_its_slot():
+    release = threading.Event()
+
+    def hang_on_a(query: str) -> str:
+        if query == "a":
+            release.wait(5)
+        return query
+
+    registry = {"slow": make_tool("slow", hang_on_a)}
+    executor = ToolExecutor(concurrency_limits={"slow": 1}, timeouts={"slow": 0.1})
+    try:
+        (ok, error), = executor.run(registry, [("slow", {"query": "a"})])
+        assert not ok and isinstance(error, TimeoutError)
+
+        # "a" still hangs, but no longer holds the only slot
+        assert executor.run(registry, [("slow", {"query": "b"})]) == [(True, "b")]
+        assert not release.is_set()
+    finally:
+        release.set()
+
+
+def test_cancel_stops_waiting_for_calls_in_flight():
+    release = threading.Event()
+
+    def hang(query: str) -> str:
+        release.wait(5)
+        return query
+
+    registry = {"slow": make_tool("slow", hang)}
+    executor = ToolExecutor(concurrency_limits={"slow": 1})
+    cancel = threading.Event()
+    config = {"configurable": {CANCEL_EVENT_KEY: cancel}}
+    try:
+        threading.Timer(0.1, cancel.set).start()
+        start = time.monotonic()
+        outcomes = executor.run(registry, [("slow", {"query": "a"}), ("slow", {"query": "b"})], config)
+
+        assert time.monotonic() - start < 1.0
+        assert all(not ok and isinstance(error, ToolCallCancelled) for ok, error in outcomes)
+        # Already cancelled: nothing is submitted
+        assert executor.run(registry, [("slow", {"query": "c"})], config)[0][0] is False
+    finally:
+        release.set()
@@ -0,0 +1,164 @@
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import hashlib
+import numpy as np
+import sqlite3
+import threading
+
+
+class EmbeddingCache:
+  """
+  Cache embeddings trên đĩa (SQLite): sha256(model + loại + text) -> vector float32.
+
+  Dùng chung cho mọi collection trong cùng db_path; model nằm trong key nên
+  đổi embedding model không dùng nhầm vector cũ.
+  """
+
+  def __init__(self, path: str):
+    self.path = path
+    self._lock = threading.Lock()
+    # Query engine có thể chạy trong thread khác thread tạo cache
+    self._conn = sqlite3.connect(path, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+  @staticmethod
+  def key(model_name: str, kind: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+  def get_many(self, keys: List[str], chunk_size: int = 500) -> Dict[str, List[float]]:
+    found = {}
+    with self._lock:
+      # Giới hạn số tham số của một câu SQL
+      for i in range(0, len(keys), chunk_size):
+        chunk = keys[i:i + chunk_size]
+        rows = self._conn.execute(
+            f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+        for key, blob in rows:
+          found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+    return found
+
+  def put_many(self, items: Dict[str, List[float]]) -> None:
+    with self._lock, self._conn:
+      self._conn.executemany(
+          "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+          [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()])
+
+  def __len__(self) -> int:
+    with self._lock:
+      return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+  def close(self) -> None:
+    self._conn.close()
+
+
+class CachedEmbedding(BaseEmbedding):
+  """
+  Bọc một embedding model với EmbeddingCache.
+
+  - Text (chunk khi ingest): tra cache theo lô, chỉ embed các chunk chưa có.
+  - Query: LRU trong RAM cho các câu hỏi hay gặp, sau đó mới tới SQLite.
+  Số hit/miss theo từng loại được đếm để báo cáo hit ratio.
+  """
+
+  _embed_model: BaseEmbedding = PrivateAttr()
+  _cache: EmbeddingCache = PrivateAttr()
+  _queries: OrderedDict = PrivateAttr()
+  _query_lru_size: int = PrivateAttr()
+  _report_every: int = PrivateAttr()
+  _stats: Dict[str, Dict[str, int]] = PrivateAttr()
+
+  def __init__(
+      self,
+      embed_model: BaseEmbedding,
+      cache: EmbeddingCache,
+      query_lru_size: int = 1024,
+      report_every: int = 100,
+      **kwargs,
+  ) -> None:
+    super().__init__(
+        model_name=embed_model.model_name,
+        embed_batch_size=embed_model.embed_batch_size,
+        **kwargs,
+    )
+    self._embed_model = embed_model
+    self._cache = cache
+    self._queries = OrderedDict()
+    self._query_lru_size = query_lru_size
+    self._report_every = report_every
+    self._stats = {kind: {"hits": 0, "misses": 0} for kind in ("text", "query")}
+
+  @classmethod
+  def class_name(cls) -> str:
+    return "CachedEmbedding"
+
+  def stats(self, kind: str = "text") -> Dict[str, float]:
+    hits, misses = self._stats[kind]["hits"], self._stats[kind]["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": hits / total if total else 0.0}
+
+  def _key(self, kind: str, text: str) -> str:
+    return EmbeddingCache.key(self.model_name, kind, text)
+
+  def _lookup_query(self, query: str) -> Optional[List[float]]:
+    key = self._key("query", query)
+    embedding = self._queries.get(key)
+    if embedding is None:
+      embedding = self._cache.get_many([key]).get(key)
+    if embedding is None:
+      self._stats["query"]["misses"] += 1
+      return None
+    self._stats["query"]["hits"] += 1
+    self._remember_query(key, embedding)
+    return embedding
+
+  def _remember_query(self, key: str, embedding: List[float]) -> None:
+    self._queries[key] = embedding
+    self._queries.move_to_end(key)
+    if len(self._queries) > self._query_lru_size:
+      self._queries.popitem(last=False)
+
+    stats = self._stats["query"]
+    if (stats["hits"] + stats["misses"]) % self._report_every == 0:
+      ratio = self.stats("query")["hit_ratio"]
+      print(f"🗄️ Query embedding cache: {stats['hits']}/{stats['hits'] + stats['misses']} hit ({ratio:.0%})")
+
+  def _store_query(self, query: str, embedding: List[float]) -> List[float]:
+    key = self._key("query", query)
+    self._cache.put_many({key: embedding})
+    self._remember_query(key, embedding)
+    return embedding
+
+  def _get_query_embedding(self, query: str) -> List[float]:
+    embedding = self._lookup_query(query)
+    if embedding is None:
+      embedding = self._store_query(query, self._embed_model.get_query_embedding(query))
+    return embedding
+
+  async def _aget_query_embedding(self, query: str) -> List[float]:
+    embedding = self._lookup_query(query)
+    if embedding is None:
+      embedding = self._store_query(query, await self._embed_model.aget_query_embedding(query))
+    return embedding
+
+  def _get_text_embedding(self, text: str) -> List[float]:
+    return self._get_text_embeddings([text])[0]
+
+  def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+    keys = [self._key("text", text) for text in texts]
+    found = self._cache.get_many(list(set(keys)))
+
+    # Chunk trùng nhau trong cùng một lô chỉ embed một lần
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    if missing:
+      embeddings = self._embed_model.get_text_embedding_batch(list(missing.values()))
+      computed = dict(zip(missing.keys(), embeddings))
+      self._cache.put_many(computed)
+      found.update(computed)
+
+    self._stats["text"]["hits"] += len(texts) - len(missing)
+    self._stats["text"]["misses"] += len(missing)
+    return [found[key] for key in keys]
@@ -1,63 +1,281 @@
-from llama_index.readers.file import PDFReader
-from typing import Union, List, Literal
+from llama_index.core import Document
+from typing import Iterable, Iterator, Union, List, Literal, Optional, Tuple
+from collections import Counter, deque
+from functools import partial
 import glob
+import re
 from tqdm import tqdm
 import multiprocessing
 import os
+import pypdf
 
 # from langchain_community.document_loaders import PyPDFLoader
 # from langchain_text_splitters import RecursiveCharacterTextSplitter
 pdf_dir = "../../data_source"
 
+# Ký tự hay gặp trong PDF -> ASCII tương đương, trước khi bỏ phần không phải ASCII
+_ASCII_FOLD = str.maketrans({
+    "\ufb00": "ff", "\ufb01": "fi", "\ufb02": "fl", "\ufb03": "ffi", "\ufb04": "ffl",
+    "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+    "\u2010": "-", "\u2011": "-", "\u2013": "-", "\u2014": "-", "\u2212": "-",
+    "\u2022": "-", "\u2026": "...", "\u00a0": " ", "\u00ad": "",
+})
+_DIGITS = str.maketrans("0123456789", "#" * 10)
+_PAGE_NUMBER = re.compile(r"(page\s*)?#+(\s*(of|/)\s*#+)?", re.IGNORECASE)
+_NON_ASCII = re.compile(r"[^\x00-\x7f]+")
+# Bắt đầu bằng ký tự cố định để regex tìm nhanh, rồi mới kiểm tra chữ đứng trước
+_HYPHEN_BREAK = re.compile(r"-\n(?<=\w-\n)(?=[a-z])")
+
+
+def imap_bounded(pool, func, iterable: Iterable, max_pending: int) -> Iterator:
+  """
+  Như pool.imap nhưng chỉ đọc trước tối đa max_pending phần tử của iterable.
+
+  pool.imap đọc hết iterable và giữ mọi kết quả chưa được lấy; ở đây phần tử
+  tiếp theo chỉ được gửi đi khi kết quả cũ nhất đã được lấy ra.
+  """
+  pending = deque()
+  for item in iterable:
+    pending.append(pool.apply_async(func, (item,)))
+    if len(pending) >= max_pending:
+      yield pending.popleft().get()
+  while pending:
+    yield pending.popleft().get()
+
+
+class DocumentNormalizer:
+  """
+  Chuẩn hoá text các trang PDF của một file trước khi index.
+
+  Chỉ dùng các thao tác chạy ở tốc độ C (translate, encode, split/join, regex):
+  - Đổi ligature/dấu nháy/gạch ngang sang ASCII, bỏ ký tự không phải ASCII.
+  - Bỏ header/footer: dòng đầu/cuối trang lặp lại trên ít nhất min_repeat_ratio
+    số trang (so sánh sau khi thay chữ số bằng #) và dòng chỉ có số trang.
+    Khi chỉ chuẩn hoá một phần của file, truyền vào repeated_edges tính trên
+    cả file để mọi phần bỏ cùng header/footer.
+  - Nối từ bị ngắt bằng gạch nối cuối dòng.
+  - Gộp khoảng trắng và dòng trống liên tiếp.
+  """
+
+  def __init__(self, edge_lines: int = 2, min_repeat_ratio: float = 0.5, min_pages: int = 3):
+    self.edge_lines = edge_lines
+    self.min_repeat_ratio = min_repeat_ratio
+    self.min_pages = min_pages
+
+  @staticmethod
+  def _fold(match) -> str:
+    return match.group().translate(_ASCII_FOLD).encode("ascii", "ignore").decode("ascii")
+
+  @staticmethod
+  def to_ascii(text: str) -> str:
+    # translate chỉ chạy trên các đoạn không phải ASCII (thường rất ngắn)
+    return text if text.isascii() else _NON_ASCII.sub(DocumentNormalizer._fold, text)
+
+  def _edge_indices(self, lines: List[str]) -> List[int]:
+    # Chỉ duyệt vài dòng đầu/cuối trang, không duyệt cả trang bằng Python
+    head, tail = [], []
+    for i, line in enumerate(lines):
+      if len(head) == self.edge_lines:
+        break
+      if line.strip():
+        head.append(i)
+    for i in range(len(lines) - 1, (head[-1] if head else -1), -1):
+      if len(tail) == self.edge_lines:
+        break
+      if lines[i].strip():
+        tail.append(i)
+    return head + tail
+
+  def repeated_edges(self, texts: List[str]) -> set:
+    """Chữ ký (chữ số thay bằng #) của các dòng header/footer lặp lại trong texts"""
+    return self._repeated_edges([self.to_ascii(text).split("\n") for text in texts])
+
+  def _repeated_edges(self, pages: List[List[str]]) -> set:
+    if len(pages) < self.min_pages:
+      return set()
+    counts = Counter()
+    for lines in pages:
+      counts.update({lines[i].strip().translate(_DIGITS) for i in self._edge_indices(lines)})
+    threshold = max(2, self.min_repeat_ratio * len(pages))
+    return {signature for signature, count in counts.items() if count >= threshold}
+
+  def _strip_edges(self, lines: List[str], repeated: set) -> None:
+    for i in self._edge_indices(lines):
+      signature = lines[i].strip().translate(_DIGITS)
+      if signature in repeated or _PAGE_NUMBER.fullmatch(signature):
+        lines[i] = ""
+
+  def normalize_pages(self, texts: List[str], repeated: Optional[set] = None) -> List[str]:
+    pages = [self.to_ascii(text).split("\n") for text in texts]
+    if repeated is None:
+      repeated = self._repeated_edges(pages)
+    normalized = []
+    for lines in pages:
+      self._strip_edges(lines, repeated)
+      # split()/join() gộp khoảng trắng trong dòng và bỏ khoảng trắng đầu/cuối dòng
+      text = "\n".join([" ".join(line.split()) for line in lines])
+      if "-\n" in text:
+        text = _HYPHEN_BREAK.sub("", text)
+      while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+      normalized.append(text.strip())
+    return normalized
+
+  def __call__(self, documents: List, repeated: Optional[set] = None) -> List:
+    """Chuẩn hoá tại chỗ các document (các trang của cùng một file)"""
+    for doc, text in zip(documents, self.normalize_pages([doc.text for doc in documents], repeated)):
+      doc.set_content(text)
+    return documents
+
+
 class PDFLoader():
-  def __init__(self, pdf_files: Union[str, List[str]]):
+  def __init__(self, pdf_files: Union[str, List[str]], normalizer: DocumentNormalizer = None,
+               edge_sample_pages: int = 32):
     """
     Khởi tạo PDFLoader với danh sách file PDF.
+
+    :param normalizer: Bước chuẩn hoá text cho mỗi file, mặc định DocumentNormalizer()
+    :param edge_sample_pages: Số trang (rải đều trên file) dùng để tìm header/footer
+        của file được chia thành nhiều shard
     """
 
     self.pdf_files = pdf_files
+    self.normalizer = normalizer or DocumentNormalizer()
+    self.edge_sample_pages = edge_sample_pages
+    # File không đọc được (hoặc có shard lỗi) trong lần iter_documents gần nhất
+    self.failed_files = set()
 
   @staticmethod
   def remove_non_utf8_characters(text: str) -> str:
     """
-    Loại bỏ các ký tự không phải ASCII (dùng ord(char) < 128).
+    Loại bỏ các ký tự không phải ASCII (ligature, dấu nháy... được đổi sang ASCII trước).
     """
-    return ''.join(char for char in text if ord(char) < 128)
+    return DocumentNormalizer.to_ascii(text)
 
-  def load_pdf(self, pdf_file: str) -> str:
+  @staticmethod
+  def count_pages(pdf_file: str) -> Optional[int]:
+    """Số trang của file PDF, None nếu không đọc được"""
+    try:
+      return len(pypdf.PdfReader(pdf_file).pages)
+    except Exception as e:
+      print(f"Lỗi khi đọc {pdf_file}: {e}")
+      return None
+
+  def _file_shards(self, pdf_file: str, pages_per_shard: int) -> Tuple[str, Optional[List[Tuple]]]:
     """
-    Load một file PDF sử dụng PDFReader của llama_index.
+    (pdf_file, các shard của file), None nếu không đọc được file.
 
-    :param pdf_file: Đường dẫn file PDF
-    :return: Danh sách document được load từ file PDF.
+    File nhiều hơn một shard được quét header/footer một lần trên tối đa
+    edge_sample_pages trang rải đều, rồi kết quả đi kèm mọi shard của file.
     """
     try:
-      loader = PDFReader()
-      documents = loader.load_data(pdf_file)
-
+      pdf = pypdf.PdfReader(pdf_file)
+      num_pages = len(pdf.pages)
+      repeated = None
+      if num_pages > pages_per_shard:
+        step = max(1, num_pages // self.edge_sample_pages)
+        repeated = self.normalizer.repeated_edges(
+            [pdf.pages[page].extract_text() for page in range(0, num_pages, step)])
     except Exception as e:
-      print(f"Lỗi khi load {pdf_file}: {e}")
+      print(f"Lỗi khi đọc {pdf_file}: {e}")
+      return pdf_file, None
+    return pdf_file, [
+        (pdf_file, start, min(start + pages_per_shard, num_pages), repeated)
+        for start in range(0, num_pages, pages_per_shard)
+    ]
+
+  def page_ranges(self, pages_per_shard: int = 16, pool=None) -> Iterator[Tuple[str, int, int, Optional[set]]]:
+    """
+    Chia các file PDF thành các shard (pdf_file, trang bắt đầu, trang kết thúc,
+    header/footer của file hoặc None nếu file chỉ có một shard).
+
+    :param pool: multiprocessing.Pool để quét các file song song (mặc định tuần tự)
+    """
+    scan = partial(self._file_shards, pages_per_shard=pages_per_shard)
+    for pdf_file, shards in (pool.imap(scan, self.pdf_files) if pool else map(scan, self.pdf_files)):
+      if shards is None:
+        self.failed_files.add(pdf_file)
+        continue
+      yield from shards
+
+  def load_pages(self, shard: Tuple) -> List[Document]:
+    """
+    Load một khoảng trang của file PDF (cùng metadata như PDFReader của llama_index).
+
+    :param shard: (đường dẫn file PDF, trang bắt đầu, trang kết thúc hoặc None = hết file,
+        tuỳ chọn header/footer của cả file như page_ranges trả về)
+    :return: Danh sách document, mỗi trang một document, đã chuẩn hoá.
+    """
+    return self._load_shard(shard)[1] or []
+
+  def _load_shard(self, shard: Tuple) -> Tuple[str, Optional[List[Document]]]:
+    """(pdf_file, documents), documents là None nếu shard bị lỗi"""
+    # Không có header/footer của file: tự tìm trong các trang của shard
+    pdf_file, start, end, repeated = (*shard, None)[:4]
+    try:
+      pdf = pypdf.PdfReader(pdf_file)
       documents = []
-    return documents
+      for page in range(start, len(pdf.pages) if end is None else end):
+        # file_path để VectorPipeline.sync biết node thuộc file nào
+        doc = Document(
+            text=pdf.pages[page].extract_text(),
+            metadata={
+                "page_label": pdf.page_labels[page],
+                "file_name": os.path.basename(pdf_file),
+                "file_path": pdf_file,
+            },
+        )
+        doc.excluded_embed_metadata_keys.append("file_path")
+        doc.excluded_llm_metadata_keys.append("file_path")
+        documents.append(doc)
+      documents = self.normalizer(documents, repeated)
 
-  def __call__(self, workers: int = 4) -> List:
+    except Exception as e:
+      print(f"Lỗi khi load {pdf_file} (trang {start}-{end}): {e}")
+      documents = None
+    return pdf_file, documents
+
+  def load_pdf(self, pdf_file: str) -> List[Document]:
     """
-    Sử dụng multiprocessing để load song song nhiều file PDF.
+    Load toàn bộ một file PDF.
+
+    :param pdf_file: Đường dẫn file PDF
+    :return: Danh sách document được load từ file PDF.
+    """
+    return self.load_pages((pdf_file, 0, None))
+
+  def iter_documents(self, workers: int = 4, pages_per_shard: int = 16, max_pending: int = None) -> Iterator[Document]:
+    """
+    Parse song song theo khoảng trang và yield document ngay khi từng shard xong.
+
+    File lớn được chia cho nhiều worker thay vì chiếm một worker. Chỉ có tối đa
+    max_pending shard (mặc định 2 * workers) đang parse hoặc chờ được đọc, nên
+    bộ nhớ không tăng theo kích thước corpus khi phía tiêu thụ chậm hơn.
 
     :param workers: Số lượng worker/processes sử dụng.
-    :return: Danh sách các document được load.
+    :param pages_per_shard: Số trang mỗi shard.
     """
     num_processes = min(multiprocessing.cpu_count(), workers)
-    docs_loaded = []
-    total_files = len(self.pdf_files)
+    self.failed_files = set()
 
     with multiprocessing.Pool(processes=num_processes) as pool:
-      with tqdm(total=total_files, desc="Loading PDFs", unit="file") as pbar:
-        for result in pool.imap_unordered(self.load_pdf, self.pdf_files):
-          docs_loaded.extend(result)
+      shards = list(self.page_ranges(pages_per_shard, pool))
+      with tqdm(total=len(shards), desc="Loading PDFs", unit="shard") as pbar:
+        for pdf_file, documents in imap_bounded(pool, self._load_shard, shards, max_pending or 2 * num_processes):
+          if documents is None:
+            self.failed_files.add(pdf_file)
+          else:
+            yield from documents
           pbar.update(1)
 
-    return docs_loaded
+  def __call__(self, workers: int = 4) -> List:
+    """
+    Sử dụng multiprocessing để load song song nhiều file PDF.
+
+    :param workers: Số lượng worker/processes sử dụng.
+    :return: Danh sách các document được load.
+    """
+    return list(self.iter_documents(workers=workers))
 
 class Loader:
   def __init__(self, pdf_dir: str, workers: int = 4):
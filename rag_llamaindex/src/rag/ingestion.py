@@ -0,0 +1,169 @@
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from src.rag.file_loader import imap_bounded
+from collections import defaultdict
+from itertools import islice
+from tqdm import tqdm
+import multiprocessing
+import time
+import uuid
+
+# SentenceSplitter của từng worker process, tạo một lần trong initializer
+_splitter = None
+
+
+def node_id(i, document):
+  """
+  Node id cố định theo file, trang, nội dung trang và vị trí chunk (thay vì uuid4),
+  nên ingest lại cùng một trang sẽ upsert đè lên các node cũ.
+  """
+  metadata = document.metadata
+  key = f"{metadata.get('file_path', '')}|{metadata.get('page_label', '')}|{document.hash}|{i}"
+  return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+def _init_splitter(chunk_size, chunk_overlap):
+  global _splitter
+  _splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, id_func=node_id)
+
+
+def _split_documents(documents):
+  return _splitter.get_nodes_from_documents(documents)
+
+
+def _batched(iterable, size):
+  iterator = iter(iterable)
+  while batch := list(islice(iterator, size)):
+    yield batch
+
+
+class IngestionEngine:
+  """
+  Split + embed + ghi node vào Chroma theo lô.
+
+  - Split bằng SentenceSplitter trên nhiều worker process (mỗi task là một
+    nhóm document để giảm chi phí pickle).
+  - Embed trong process chính theo lô embed_batch_size (model chỉ load một lần).
+  - Upsert vào collection theo lô upsert_batch_size; node id cố định (node_id)
+    nên chạy lại với cùng document không tạo node trùng.
+  """
+
+  def __init__(
+      self,
+      embedding,
+      chroma_collection,
+      chunk_size=300,
+      chunk_overlap=0,
+      split_workers=4,
+      split_batch_size=32,
+      embed_batch_size=256,
+      upsert_batch_size=4096,
+  ) -> None:
+    self.embedding = embedding
+    self.chroma_collection = chroma_collection
+    self.chunk_size = chunk_size
+    self.chunk_overlap = chunk_overlap
+    self.split_workers = split_workers
+    self.split_batch_size = split_batch_size
+    self.embed_batch_size = embed_batch_size
+    self.upsert_batch_size = upsert_batch_size
+
+  def _split(self, documents):
+    """
+    Yield từng nhóm node ngay khi worker split xong.
+
+    documents được đọc theo từng nhóm split_batch_size và chỉ vài nhóm được
+    đọc trước, nên có thể truyền vào một generator (vd. PDFLoader.iter_documents).
+    """
+    batches = _batched(documents, self.split_batch_size)
+    num_processes = min(multiprocessing.cpu_count(), self.split_workers)
+    if num_processes <= 1:
+      _init_splitter(self.chunk_size, self.chunk_overlap)
+      yield from map(_split_documents, batches)
+      return
+
+    with multiprocessing.Pool(
+        processes=num_processes,
+        initializer=_init_splitter,
+        initargs=(self.chunk_size, self.chunk_overlap),
+    ) as pool:
+      yield from imap_bounded(pool, _split_documents, batches, 2 * num_processes)
+
+  def _embed(self, nodes):
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    embeddings = self.embedding.get_text_embedding_batch(texts)
+    for node, embedding in zip(nodes, embeddings):
+      node.embedding = embedding
+
+  def _upsert(self, nodes):
+    self.chroma_collection.upsert(
+        ids=[node.node_id for node in nodes],
+        embeddings=[node.embedding for node in nodes],
+        metadatas=[node_to_metadata_dict(node, remove_text=True, flat_metadata=True) for node in nodes],
+        documents=[node.get_content(metadata_mode=MetadataMode.NONE) for node in nodes],
+    )
+
+  def run(self, documents):
+    """
+    Ingest documents vào collection.
+
+    :param documents: Iterable các document (llama_index Document)
+    :return: Thống kê thời gian/throughput và node ids theo metadata file_path
+    """
+    start = time.perf_counter()
+    timings = {"split_s": 0.0, "embed_s": 0.0, "upsert_s": 0.0}
+    node_ids = defaultdict(list)
+    num_nodes = 0
+    pending, to_upsert = [], []
+
+    def embed(batch):
+      t = time.perf_counter()
+      self._embed(batch)
+      timings["embed_s"] += time.perf_counter() - t
+      to_upsert.extend(batch)
+
+    def flush():
+      t = time.perf_counter()
+      for i in range(0, len(to_upsert), self.upsert_batch_size):
+        self._upsert(to_upsert[i:i + self.upsert_batch_size])
+      timings["upsert_s"] += time.perf_counter() - t
+      to_upsert.clear()
+
+    with tqdm(desc="Ingesting", unit="node") as pbar:
+      t = time.perf_counter()
+      for nodes in self._split(documents):
+        timings["split_s"] += time.perf_counter() - t
+        for node in nodes:
+          node_ids[node.metadata.get("file_path")].append(node.node_id)
+        num_nodes += len(nodes)
+        pending.extend(nodes)
+
+        while len(pending) >= self.embed_batch_size:
+          embed(pending[:self.embed_batch_size])
+          del pending[:self.embed_batch_size]
+          if len(to_upsert) >= self.upsert_batch_size:
+            flush()
+        pbar.update(len(nodes))
+        pbar.set_postfix(embeddings=num_nodes - len(pending))
+        t = time.perf_counter()
+
+      if pending:
+        embed(pending)
+      if to_upsert:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "num_nodes": num_nodes,
+        "node_ids": dict(node_ids),
+        **timings,
+        "elapsed_s": elapsed,
+        "nodes_per_s": num_nodes / elapsed if elapsed else 0.0,
+        "embeddings_per_s": num_nodes / timings["embed_s"] if timings["embed_s"] else 0.0,
+    }
+    print(
+        f"⚡ Ingest {num_nodes} nodes trong {elapsed:.1f}s "
+        f"({stats['nodes_per_s']:.1f} nodes/s, {stats['embeddings_per_s']:.1f} embeddings/s; "
+        f"split {timings['split_s']:.1f}s, embed {timings['embed_s']:.1f}s, upsert {timings['upsert_s']:.1f}s)")
+    return stats
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Tuple
+
+
+class DocumentManifest:
+  """
+  Danh sách các file đã ingest, lưu cạnh collection (JSON).
+
+  Mỗi file: size, mtime, sha256 của nội dung và node ids trong vector store.
+  File có size/mtime không đổi được coi là không đổi (không cần hash lại);
+  nếu mtime đổi nhưng hash giống thì chỉ cập nhật mtime.
+  """
+
+  def __init__(self, path: str):
+    self.path = path
+    self.exists = os.path.exists(path)
+    self.entries: Dict[str, dict] = {}
+    # key -> (size, mtime, sha256) đã tính trong diff(), dùng lại khi record()
+    self._pending: Dict[str, Tuple[int, float, str]] = {}
+    if self.exists:
+      with open(path, "r", encoding="utf-8") as f:
+        self.entries = json.load(f)
+
+  @staticmethod
+  def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+      for block in iter(lambda: f.read(chunk_size), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+  def diff(self, files: Dict[str, str]) -> Tuple[List[str], List[str], List[str]]:
+    """
+    So sánh các file hiện có với manifest.
+
+    :param files: key (đường dẫn tương đối) -> đường dẫn file
+    :return: (mới hoặc đã thay đổi, đã bị xoá, không đổi) theo key
+    """
+    changed, unchanged = [], []
+    for key, path in files.items():
+      stat = os.stat(path)
+      entry = self.entries.get(key)
+      if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        unchanged.append(key)
+        continue
+
+      sha256 = self.file_hash(path)
+      if entry and entry["sha256"] == sha256:
+        # Chỉ bị touch / copy lại: giữ nguyên vectors
+        entry["mtime"] = stat.st_mtime
+        unchanged.append(key)
+      else:
+        self._pending[key] = (stat.st_size, stat.st_mtime, sha256)
+        changed.append(key)
+
+    deleted = [key for key in self.entries if key not in files]
+    return changed, deleted, unchanged
+
+  def node_ids(self, key: str) -> List[str]:
+    return list(self.entries.get(key, {}).get("node_ids", []))
+
+  def record(self, key: str, node_ids: List[str]) -> None:
+    size, mtime, sha256 = self._pending.pop(key)
+    self.entries[key] = {"size": size, "mtime": mtime, "sha256": sha256, "node_ids": node_ids}
+
+  def remove(self, key: str) -> List[str]:
+    """Xoá file khỏi manifest, trả về node ids của nó"""
+    return self.entries.pop(key, {}).get("node_ids", [])
+
+  def save(self) -> None:
+    # Ghi ra file tạm rồi replace để manifest không bị hỏng nếu crash giữa chừng
+    tmp_path = self.path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+      json.dump(self.entries, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, self.path)
+    self.exists = True
@@ -1,20 +1,27 @@
-from llama_index.core.ingestion import IngestionPipeline
-from llama_index.core.node_parser import SentenceSplitter
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.vector_stores.chroma import ChromaVectorStore
 import chromadb
 from llama_index.core import VectorStoreIndex
+from src.rag.embedding_cache import CachedEmbedding, EmbeddingCache
 from src.rag.file_loader import PDFLoader
-import asyncio
+from src.rag.ingestion import IngestionEngine
+from src.rag.manifest import DocumentManifest
+import glob
+import os
+import time
 
 class VectorPipeline:
   def __init__(
       self,
-      documents,
+      documents=None,
       embedding_model_name="BAAI/bge-small-en-v1.5",
       chunk_overlap=0,
       db_path="./alfred_chroma_db",
       collection_name="alfred",
+      split_workers=4,
+      embed_batch_size=256,
+      upsert_batch_size=4096,
+      query_cache_size=1024,
   ) -> None:
 
     self.documents = documents
@@ -22,10 +29,6 @@ class VectorPipeline:
     self.db_path = db_path
     self.collection_name = collection_name
 
-    # Embedding
-    self.embedding = HuggingFaceEmbedding(
-        model_name=self.embedding_model_name)
-
     # Setup Chroma
     self.chroma_client = chromadb.PersistentClient(path=self.db_path)
     self.chroma_collection = self.chroma_client.get_or_create_collection(
@@ -34,19 +37,36 @@ class VectorPipeline:
     self.vector_store = ChromaVectorStore(
         chroma_collection=self.chroma_collection)
 
+    # Embedding, có cache trên đĩa dùng chung cho ingest và query
+    self.embedding_cache = EmbeddingCache(
+        os.path.join(self.db_path, "embedding_cache.sqlite3"))
+    self.embedding = CachedEmbedding(
+        HuggingFaceEmbedding(
+            model_name=self.embedding_model_name,
+            embed_batch_size=embed_batch_size),
+        self.embedding_cache,
+        query_lru_size=query_cache_size,
+    )
+
+    # Manifest các file đã ingest, nằm cạnh collection
+    self.manifest = DocumentManifest(
+        os.path.join(self.db_path, f"{self.collection_name}_manifest.json"))
+
+    self.engine = IngestionEngine(
+        self.embedding,
+        self.chroma_collection,
+        chunk_size=300,
+        chunk_overlap=chunk_overlap,
+        split_workers=split_workers,
+        embed_batch_size=embed_batch_size,
+        upsert_batch_size=upsert_batch_size,
+    )
+
     # Check nếu cần ingest
-    if self._should_ingest():
+    if self.documents and self._should_ingest():
       print("📥 Ingesting documents into vector store...")
-      self.pipeline = IngestionPipeline(
-          transformations=[
-              SentenceSplitter(
-                  chunk_overlap=chunk_overlap, chunk_size=300),
-              self.embedding,
-          ],
-          vector_store=self.vector_store,
-      )
-      self._build_db()
-    else:
+      self._build_db(self.documents)
+    elif self.documents:
       print("✅ Vector DB already exists – skip ingest.")
 
   def _should_ingest(self):
@@ -56,8 +76,86 @@ class VectorPipeline:
       print(f"⚠️ Lỗi khi kiểm tra collection: {e}")
       return True
 
-  async def _build_db(self):
-    await self.pipeline.arun(documents=self.documents)
+  def _build_db(self, documents):
+    """Split + embed + ghi vào Chroma, trả về thống kê ingest"""
+    before = self.embedding.stats("text")
+    stats = self.engine.run(documents)
+    after = self.embedding.stats("text")
+    hits = after["hits"] - before["hits"]
+    total = hits + after["misses"] - before["misses"]
+    stats["embedding_cache_hit_ratio"] = hits / total if total else 0.0
+    print(f"🗄️ Embedding cache: {hits}/{total} chunk hit ({stats['embedding_cache_hit_ratio']:.0%})")
+    return stats
+
+  def _delete_file_nodes(self, path, node_ids, legacy=False):
+    if node_ids:
+      self.chroma_collection.delete(ids=node_ids)
+    # Node của lần ingest bị crash giữa chừng (chưa có trong manifest)
+    self.chroma_collection.delete(where={"file_path": path})
+    if legacy:
+      # DB tạo trước khi có manifest: node chỉ có file_name
+      self.chroma_collection.delete(where={"file_name": os.path.basename(path)})
+
+  def sync(self, data_dir, workers=2):
+    """
+    Đồng bộ vector store với các file PDF trong data_dir.
+
+    Chỉ file mới hoặc đã thay đổi (theo size/mtime, rồi sha256) được parse và
+    embed lại; vectors của file đã thay đổi hoặc đã bị xoá được xoá khỏi
+    collection. Manifest được ghi lại sau khi ingest xong; file parse lỗi hoặc
+    không tạo ra node nào không được ghi vào manifest nên được thử lại ở lần sync sau.
+
+    :return: Thống kê số file mới/thay đổi, đã xoá, không đổi và số node
+    """
+    start = time.perf_counter()
+    files = {
+        os.path.relpath(path, data_dir): path
+        for path in sorted(glob.glob(os.path.join(data_dir, "**", "*.pdf"), recursive=True))
+    }
+    legacy = not self.manifest.exists and not self._should_ingest()
+    if legacy:
+      print("⚠️ Collection chưa có manifest: ingest lại toàn bộ file PDF.")
+
+    changed, deleted, unchanged = self.manifest.diff(files)
+    for key in deleted:
+      self._delete_file_nodes(
+          os.path.join(data_dir, key), self.manifest.remove(key), legacy)
+    for key in changed:
+      self._delete_file_nodes(files[key], self.manifest.remove(key), legacy)
+
+    num_nodes = 0
+    failed = []
+    if changed:
+      print(f"📥 Ingesting {len(changed)} file PDF mới/thay đổi...")
+      loader = PDFLoader([files[key] for key in changed])
+      # Generator: document được split/embed/ghi ngay khi parse xong
+      stats = self._build_db(loader.iter_documents(workers=workers))
+      num_nodes = stats["num_nodes"]
+
+      node_ids = stats["node_ids"]
+      for key in changed:
+        ids = node_ids.get(files[key], [])
+        if files[key] in loader.failed_files or not ids:
+          # Node của lần này (nếu có) sẽ bị xoá theo file_path khi thử lại
+          failed.append(key)
+          continue
+        self.manifest.record(key, ids)
+      if failed:
+        print(f"⚠️ {len(failed)} file lỗi hoặc không có nội dung, sẽ thử lại lần sau: {failed}")
+
+    self.manifest.save()
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ Sync xong trong {elapsed:.1f}s: {len(changed)} mới/thay đổi, "
+        f"{len(deleted)} đã xoá, {len(unchanged)} không đổi ({num_nodes} nodes).")
+    return {
+        "changed": changed,
+        "deleted": deleted,
+        "unchanged": unchanged,
+        "failed": failed,
+        "num_nodes": num_nodes,
+        "elapsed_s": elapsed,
+    }
 
   def get_query_engine(self, llm, search_type="similarity", search_kwargs={"k": 10}, response_mode="tree_summarize"):
     # Dùng lại vector store và embedding model